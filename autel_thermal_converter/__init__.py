@@ -1,3 +1,26 @@
-from .converter import ThermalConverter
+import importlib
 
 __version__ = "0.1.0"
+
+# Public names and their modules. They are imported on first access, so
+# importing the package (e.g. for `autel-convert --help`) loads neither NumPy
+# nor the DLL.
+_EXPORTS = {
+    "ThermalConverter": ".converter",
+    "BackendConverter": ".backends",
+    "FixtureBackend": ".backends",
+    "SDKBackend": ".backends",
+}
+
+__all__ = list(_EXPORTS) + ["__version__"]
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
@@ -1,27 +1,301 @@
 import argparse
-import os
+import functools
 import json
+import sys
+import time
 from pathlib import Path
-from .converter import ThermalConverter
 
-def main():
-    parser = argparse.ArgumentParser(description="Autel Thermal JPG to TIFF Converter")
+from .discovery import (DEFAULT_INCLUDE, FIXTURE_INCLUDE, iter_inputs, iter_listed, output_path_for, parse_shard,
+                        shard_tag)
+
+# Heavy modules (NumPy, the DLL wrapper) are imported inside the commands that
+# need them, so `--help` and `submit` start instantly.
+
+# Kept in sync with backends.BACKENDS (checked by the tests)
+BACKEND_NAMES = ("sdk", "fixture")
+# Kept in sync with preview.COLORMAPS
+COLORMAP_NAMES = ("ironbow", "gray")
+
+def add_converter_arguments(parser, tiff_options: bool = True):
+    """Options that select and configure the converter (shared by convert, serve and query)."""
+    parser.add_argument("--backend", default="native", choices=("native",) + BACKEND_NAMES,
+                        help="native: DLL does decode and encoding (default); "
+                             "sdk: DLL decodes, NumPy encodes; fixture: read .npz fixtures (no SDK needed). "
+                             "NumPy-encoded TIFFs are uncompressed unless --compression is given, "
+                             "2-3x the size of the DLL's LZW files")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Cache decoded frames in this directory; repeat runs on the same images skip the SDK decode "
+                             "(the TIFFs are then NumPy-encoded: uncompressed unless --compression is given)")
+    parser.add_argument("--cache-size", type=int, default=2048,
+                        help="Maximum size of the decode cache in MB (default: 2048)")
+    if not tiff_options:
+        return
+    tiff_group = parser.add_argument_group("TIFF output options (any of these switches the encoding to NumPy, "
+                                           "whose TIFFs are uncompressed unless --compression is given)")
+    tiff_group.add_argument("--compression", default="none", choices=["none", "deflate", "lzw", "zstd"],
+                            help="TIFF compression (default: none, 2-3x the size of the DLL's LZW output; "
+                                 "'lzw --predictor' matches the DLL; zstd requires the 'zstandard' package; "
+                                 "lzw takes seconds per frame without the 'imagecodecs' package)")
+    tiff_group.add_argument("--predictor", action="store_true",
+                            help="Apply the horizontal predictor before compression")
+    tiff_group.add_argument("--tile", type=int, default=None, metavar="SIZE",
+                            help="Write tiled TIFFs with SIZE x SIZE tiles (multiple of 16)")
+    tiff_group.add_argument("--bigtiff", action="store_true", help="Write BigTIFF files")
+    tiff_group.add_argument("--thermal-only", action="store_true",
+                            help="Write only the encoded thermal band (single-band TIFF)")
+    tiff_group.add_argument("--overviews", nargs="?", const="2,4,8", default=None, metavar="FACTORS",
+                            help="Add reduced-resolution pages for viewers, e.g. 2,4,8 (the default without FACTORS)")
+    tiff_group.add_argument("--exif", action="store_true",
+                            help="Copy the EXIF, GPS and XMP metadata of each JPG into its TIFF (no exiftool needed)")
+    preview_group = parser.add_argument_group("Thumbnails (also switch the encoding to NumPy: "
+                                              "uncompressed TIFFs unless --compression is given)")
+    preview_group.add_argument("--thumbnails", nargs="?", type=int, const=160, default=None, metavar="SIZE",
+                               help="Write PNG thumbnails of the thermal band and RGB image to OUTPUT/thumbnails, "
+                                    "SIZE pixels on the longest edge (default: 160)")
+    preview_group.add_argument("--colormap", default="ironbow", choices=COLORMAP_NAMES,
+                               help="Colormap of the thermal thumbnails (default: ironbow)")
+    preview_group.add_argument("--thumbnail-range", type=float, nargs=2, default=None, metavar=("MIN", "MAX"),
+                               help="Fixed colormap range in °C (default: each frame's 1st-99th percentile)")
+
+def converter_factory(args, parser) -> tuple:
+    """Builds (factory, tiff_options) from the add_converter_arguments options."""
+    from .backends import create_converter
+    from .tiff import TiffOptions
+
+    tiff_options = None
+    previews = None
+    try:
+        if hasattr(args, "compression"):
+            overviews = [f for f in args.overviews.split(",") if f.strip()] if args.overviews else ()
+            tiff_options = TiffOptions(args.compression, args.predictor, args.tile, args.bigtiff, args.thermal_only,
+                                       overviews=overviews)
+            if args.thumbnails is not None:
+                from .preview import PreviewOptions
+                previews = PreviewOptions(args.thumbnails, args.colormap, args.thumbnail_range)
+    except ValueError as e:
+        parser.error(str(e))
+    factory = functools.partial(
+        create_converter, args.backend,
+        cache_dir=args.cache_dir, cache_bytes=args.cache_size * 1024 * 1024, tiff_options=tiff_options,
+        previews=previews, exif=getattr(args, "exif", False),
+    )
+    return factory, tiff_options
+
+def add_discovery_arguments(parser):
+    group = parser.add_argument_group("Input discovery (directory mode)")
+    group.add_argument("-r", "--recursive", action="store_true",
+                       help="Also convert images in subfolders; outputs mirror the folder structure")
+    group.add_argument("--include", action="append", default=None, metavar="PATTERN",
+                       help="Case-insensitive file pattern to convert (repeatable; default: *.jpg, *.jpeg). "
+                            "Patterns with a '/' match the path relative to INPUT")
+    group.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                       help="Case-insensitive file or folder pattern to skip (repeatable)")
+    group.add_argument("--paths-from", default=None, metavar="FILE",
+                       help="Only the files listed in FILE, one per line (e.g. the output of 'autel-convert locate'); "
+                            "replaces the folder scan")
+    group.add_argument("--shard", default=None, metavar="I/N",
+                       help="Only convert shard I of N (0 <= I < N), chosen by a stable hash of the relative path; "
+                            "combine the shards' metadata afterwards with 'autel-convert merge'")
+
+def discover(input_dir: Path, args, backend: str = None):
+    """Lazily yields (path, relative_path) of the inputs selected by the discovery options."""
+    include = args.include or (DEFAULT_INCLUDE + (FIXTURE_INCLUDE if backend == "fixture" else ()))
+    shard = parse_shard(args.shard) if args.shard else None
+    if args.paths_from:
+        return iter_listed(input_dir, args.paths_from, shard=shard)
+    return iter_inputs(input_dir, recursive=args.recursive, include=include, exclude=args.exclude, shard=shard)
+
+def add_percentiles_argument(parser):
+    parser.add_argument("--percentiles", type=float, nargs=2, default=(1.0, 99.0), metavar=("LOW", "HIGH"),
+                        help="Normalized range: the LOW to HIGH percentile of all valid pixels of the dataset "
+                             "(default: 1 99)")
+
+def warn_slow_histogram(converter):
+    from .compression import has_fast_lzw
+
+    try:
+        rereads = getattr(converter, 'rereads_output_for_histogram', False)
+    except Exception:
+        return  # the DLL failed to load; every conversion reports it
+    if rereads and not has_fast_lzw():
+        print("⚠️  This DLL has no histogram export and 'imagecodecs' is not installed: the histogram is counted by "
+              "reading each LZW TIFF back, over a second per image (rebuild the DLL, or pip install imagecodecs).")
+
+def warn_slow_tiff_reads(output_dir: Path):
+    from .normalize import reads_lzw_slowly
+
+    if reads_lzw_slowly(output_dir):
+        print("⚠️  These TIFFs are LZW and 'imagecodecs' is not installed: reading each one back takes over a "
+              "second (pip install imagecodecs, or convert with --stack).")
+
+def write_normalized(output_dir: Path, histogram, bits: int, percentiles=None, temperature_range=None, jobs: int = 1):
+    """Scales the stored thermal bands of OUTPUT to one dataset-wide range (no SDK decode)."""
+    from .normalize import BandNormalizer, encoded_value, normalize_outputs, normalize_stack, write_normalization
+    from .stack import HEADER_NAME
+
+    if temperature_range:
+        low, high = (encoded_value(t) for t in temperature_range)
+        source = {"range": list(temperature_range)}
+    else:
+        low, high = histogram.percentile_range(*percentiles)
+        source = {"percentiles": list(percentiles), "pixels": histogram.valid_pixels}
+    normalizer = BandNormalizer(low, high, bits)
+    info = normalizer.describe()
+    print(f"\n🎨 Normalizing to {bits}-bit over {info['low']} °C to {info['high']} °C")
+
+    if (output_dir / "stack" / HEADER_NAME).exists():
+        path = normalize_stack(output_dir / "stack", normalizer)
+        print(f"🗂️  Saved normalized stack to: {path}")
+    count = success_count = 0
+    for result in normalize_outputs(output_dir, normalizer, jobs=jobs):
+        count += 1
+        success_count += result.success
+        if not result.success:
+            print(f"❌ {Path(result.input_path).name}: {result.error}")
+    if count:
+        print(f"🖼️  Normalized {success_count} of {count} TIFFs into: {output_dir / 'normalized'}")
+    path = write_normalization(output_dir, normalizer, **source)
+    print(f"📄 Saved range and formula to: {path}")
+
+def write_spatial_index(path: Path, positions, root=None, fov=None, cell_size: float = None):
+    """Builds and saves the spatial index of (name, position) pairs."""
+    from .spatial import DEFAULT_FOV, SpatialIndex
+
+    index = SpatialIndex.build(positions, fov=fov or DEFAULT_FOV, cell_size=cell_size, root=root)
+    missing = len(positions) - len(index)
+    index.save(path)
+    print(f"🗺️  Saved spatial index of {len(index)} frames to: {path}"
+          + (f" ({missing} without a GPS position)" if missing else ""))
+
+def write_stack(found, output_dir, args, factory):
+    """Directory mode with --stack: all frames into one memory-mapped dataset.
+
+    `found` holds (path, relative path) pairs; frames are named by relative path.
+    """
+    from .metadata_writer import MetadataWriter
+    from .stack import StackWriter
+
+    stack_dir = output_dir / "stack"
+    found = list(found)
+    files = [path for path, _ in found]
+    names = [relative for _, relative in found]
+    success_count = 0
+    with StackWriter(stack_dir, files, include_rgb=args.stack_rgb, names=names) as writer, \
+            MetadataWriter(output_dir, append=False) as metadata:
+        for name, result in zip(names, writer.write_frames(jobs=args.jobs, converter_factory=factory)):
+            if result.success:
+                success_count += 1
+                print(f"✅ {name}")
+                metadata.append(name, result.metadata)
+            else:
+                print(f"❌ {name}")
+    print(f"\n🗂️  Saved stack of {len(files)} frames to: {stack_dir}")
+    if args.histogram or args.normalize:
+        from .normalize import HISTOGRAM_NAME, stack_histogram
+
+        # The stack is the stored encoded data: count it from the memory map, no decode
+        histogram = stack_histogram(stack_dir)
+        histogram.save(output_dir / HISTOGRAM_NAME)
+        print(f"📊 Saved thermal histogram to: {output_dir / HISTOGRAM_NAME}")
+        if args.normalize:
+            write_normalized(output_dir, histogram, args.normalize, args.percentiles)
+    print(f"\n🎉 Finished. Processed {len(files)} images, {success_count} successful.")
+
+def finish_profile(profiler, args):
+    profiler.stop()
+    if args.profile:
+        print(f"\n⏱️  Profile:\n{profiler.report()}")
+    if args.metrics_file:
+        profiler.write_metrics(args.metrics_file)
+        print(f"📈 Saved metrics to: {args.metrics_file}")
+
+def convert_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="autel-convert",
+        description="Autel Thermal JPG to TIFF Converter",
+        epilog="Other commands: serve, submit, merge, normalize, query, index, locate, watch, hotspots "
+               "(e.g. 'autel-convert serve --help')",
+    )
     parser.add_argument("input", help="Path to a single JPG file or a directory of JPGs")
     parser.add_argument("output", help="Directory to save output TIFFs and JSON")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes for directory mode (0 = one per CPU, default: 1)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reconvert every input, even if the manifest says its TIFF is up to date")
+    parser.add_argument("--hash", action="store_true",
+                        help="Also record a SHA-256 of each input so touched-but-unchanged files are skipped")
+    add_converter_arguments(parser)
+    add_discovery_arguments(parser)
+    parser.add_argument("--stack", action="store_true",
+                        help="Directory mode: write one memory-mapped (N, 512, 640) thermal stack to OUTPUT/stack "
+                             "instead of per-image TIFFs")
+    parser.add_argument("--stack-rgb", action="store_true",
+                        help="With --stack, also store the RGB images as an (N, 512, 640, 3) stack")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Directory mode: overlap prefetch, decode, encode and write in one process "
+                             "(for slow storage; prints per-stage utilization). The TIFFs are NumPy-encoded: "
+                             "uncompressed, 2-3x the DLL's size, unless --compression is given")
+    parser.add_argument("--queue-depth", type=int, default=8,
+                        help="With --pipeline, images buffered between stages (default: 8)")
+    parser.add_argument("--batch-size", type=int, default=1, metavar="N",
+                        help="Directory mode: convert N images per call into the DLL (ConvertBatch, buffers reused "
+                             "across the batch); no effect when the NumPy writer encodes (default: 1)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print per-stage p50/p95/max times, images/s and MB/s at the end of the run")
+    parser.add_argument("--metrics-file", default=None, metavar="PATH",
+                        help="Write the profile in Prometheus text format to PATH (e.g. for node_exporter)")
+    parser.add_argument("--no-aggregate-json", action="store_true",
+                        help="Directory mode: skip the final dataset_metadata.json compaction "
+                             "(dataset_metadata.jsonl and dataset_stats.csv/.npy are always written)")
+    parser.add_argument("--histogram", action="store_true",
+                        help="Directory mode: count the encoded thermal values of every image while converting "
+                             "(dataset_histogram.npy), for 'autel-convert normalize'")
+    parser.add_argument("--normalize", type=int, choices=(8, 16), default=None, metavar="BITS",
+                        help="Directory mode: after converting, also write 8- or 16-bit thermal images scaled to "
+                             "one dataset-wide range (OUTPUT/normalized); implies --histogram")
+    add_percentiles_argument(parser)
+    parser.add_argument("--spatial-index", action="store_true",
+                        help="Directory mode: record each image's GPS position and attitude in its metadata and "
+                             "build OUTPUT/spatial_index.npz, for 'autel-convert locate'")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.pipeline and args.jobs != 1:
+        parser.error("--pipeline runs in a single process; it cannot be combined with --jobs")
+    if args.queue_depth < 1:
+        parser.error("--queue-depth must be at least 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.pipeline and args.batch_size != 1:
+        parser.error("--pipeline converts image by image; it cannot be combined with --batch-size")
+    if args.shard:
+        try:
+            parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
     
     input_path = Path(args.input)
     output_dir = Path(args.output)
+
+    factory, tiff_options = converter_factory(args, parser)
+    collect_histogram = args.histogram or args.normalize is not None
+    if collect_histogram:
+        factory = functools.partial(factory, histogram=True)
+    from .batch import convert_atomic, convert_batch
+    from .manifest import Manifest
+    from .metadata_writer import MetadataWriter
+    from .pipeline import ConversionPipeline
+    from .profiling import Profiler
     
     try:
-        converter = ThermalConverter()
+        converter = factory()
     except Exception as e:
         print(f"Failed to initialize converter: {e}")
         return
+    if collect_histogram:
+        warn_slow_histogram(converter)
 
     output_dir.mkdir(parents=True, exist_ok=True)
-    full_metadata = {}
+    profiler = Profiler()
     
     if input_path.is_file():
         # Single File Mode
@@ -29,17 +303,23 @@ def main():
         # Construct output path
         output_file = output_dir / f"{input_path.stem}.tif"
         
-        success = converter.convert_image(str(input_path), str(output_file))
+        try:
+            success, meta = convert_atomic(converter, str(input_path), str(output_file))
+            error = None
+        except Exception as e:
+            # Reported like a failed file in directory mode instead of a traceback
+            success, meta, error = False, None, str(e)
         if success:
+            profiler.add(converter.last_timings)
             print(f"✅ Converted: {output_file.name}")
-            meta = converter.get_metadata(str(input_path))
             if meta:
                 json_name = f"{input_path.stem}_meta.json"
                 with open(output_dir / json_name, 'w') as f:
                     json.dump(meta, f, indent=4)
                 print(f"📄 Saved metadata: {json_name}")
         else:
-            print(f"❌ Failed to convert {input_path.name}")
+            print(f"❌ Failed to convert {input_path.name}" + (f": {error}" if error else ""))
+        finish_profile(profiler, args)
             
     elif input_path.is_dir():
         # Directory Mode
@@ -47,36 +327,618 @@ def main():
         count = 0
         success_count = 0
         
-        # Match case-insensitive .jpg
-        files = []
-        for ext in ['*.jpg', '*.JPG', '*.jpeg', '*.JPEG']:
-            files.extend(input_path.glob(ext))
-        files = sorted(list(set(files))) # Unique files
+        found = discover(input_path, args, args.backend)
         
-        for file in files:
-            count += 1
-            output_file = output_dir / f"{file.stem}.tif"
-            
-            if converter.convert_image(str(file), str(output_file)):
-                success_count += 1
-                print(f"✅ {file.name}")
-                meta = converter.get_metadata(str(file))
-                if meta:
-                    full_metadata[file.name] = meta
-            else:
-                print(f"❌ {file.name}")
+        if args.stack:
+            write_stack(found, output_dir, args, factory)
+            return
+
+        from .manifest import MANIFEST_NAME
+        from .metadata_writer import iter_records, tagged_name
+        from .spatial import SPATIAL_INDEX_NAME, positions_from_records, read_position
+
+        # Shards may share an output folder, so each keeps its own manifest and metadata files
+        tag = shard_tag(parse_shard(args.shard)) if args.shard else None
+        manifest = Manifest(output_dir, use_hash=args.hash, name=tagged_name(MANIFEST_NAME, tag))
+        if args.force:
+            manifest.entries.clear()
+
+        def make_pairs():
+            made = {output_dir}
+            for path, relative in found:
+                output_file = output_path_for(output_dir, relative)
+                if output_file.parent not in made:
+                    output_file.parent.mkdir(parents=True, exist_ok=True)
+                    made.add(output_file.parent)
+                yield path, output_file
+
+        histogram = None
+        if collect_histogram:
+            from .normalize import HISTOGRAM_NAME, DatasetHistogram
+
+            # Extended across resumed runs: skipped images were counted when they were converted
+            histogram_path = output_dir / tagged_name(HISTOGRAM_NAME, tag)
+            resumed_histogram = histogram_path.exists() and not args.force
+            histogram = DatasetHistogram.load(histogram_path) if resumed_histogram else DatasetHistogram()
+
+        pairs = make_pairs()
+        pipeline = None
+        if args.pipeline:
+            pipeline = ConversionPipeline(converter, queue_depth=args.queue_depth, tiff_options=tiff_options)
+            results = pipeline.run(pairs, manifest=manifest)
+        else:
+            results = convert_batch(pairs, jobs=args.jobs, converter_factory=factory, manifest=manifest,
+                                    batch_size=args.batch_size)
+        skipped_count = 0
+        # Metadata is streamed to disk as images finish; on a resumed run the
+        # records of skipped images are already in the files from the earlier run.
+        with manifest, MetadataWriter(output_dir, append=not args.force, tag=tag) as writer:
+            for result in results:
+                count += 1
+                # Relative path, so images in different subfolders never share a name
+                name = Path(result.input_path).relative_to(input_path).as_posix()
+                profiler.add(result.timings)
+                if histogram is not None:
+                    histogram.add(result.histogram)
+                if result.success:
+                    success_count += 1
+                    if result.skipped:
+                        skipped_count += 1
+                    else:
+                        print(f"✅ {name}")
+                    if result.metadata:
+                        if args.spatial_index:
+                            result.metadata["position"] = read_position(result.input_path)
+                        writer.append(name, result.metadata)
+                else:
+                    print(f"❌ {name}")
+        manifest.compact()
+        if skipped_count:
+            print(f"⏭️  Skipped {skipped_count} unchanged images (use --force to reconvert).")
+        if pipeline is not None:
+            print(f"\n⏱️  Pipeline stages:\n{pipeline.stats.report()}")
+        finish_profile(profiler, args)
         
-        # Save aggregated JSON
-        if full_metadata:
-            json_path = output_dir / "dataset_metadata.json"
-            with open(json_path, 'w') as f:
-                json.dump(full_metadata, f, indent=4)
-            print(f"\n📚 Saved aggregated metadata to: {json_path}")
+        print(f"\n📚 Saved metadata to: {writer.jsonl_path} (stats index: {writer.npy_path.name})")
+
+        # Optional compaction into the aggregated JSON
+        if not args.no_aggregate_json:
+            json_path = writer.compact()
+            print(f"📚 Saved aggregated metadata to: {json_path}")
+
+        if histogram is not None:
+            histogram.save(histogram_path)
+            print(f"📊 Saved thermal histogram to: {histogram_path}")
+            if skipped_count and not resumed_histogram:
+                print("⚠️  Skipped images are not in the histogram; "
+                      "run 'autel-convert normalize OUTPUT --rebuild-histogram' to count them from their TIFFs.")
+            if args.normalize and tag:
+                print("ℹ️  Sharded run: normalize after 'autel-convert merge', once every shard has finished.")
+            elif args.normalize:
+                warn_slow_tiff_reads(output_dir)
+                write_normalized(output_dir, histogram, args.normalize, args.percentiles, jobs=args.jobs)
+
+        if args.spatial_index and tag:
+            print("ℹ️  Sharded run: 'autel-convert merge' builds the spatial index once every shard has finished.")
+        elif args.spatial_index:
+            # From the JSONL, so images skipped on a resumed run keep their recorded positions
+            write_spatial_index(output_dir / SPATIAL_INDEX_NAME, positions_from_records(iter_records(writer.jsonl_path)),
+                                root=input_path.resolve())
             
         print(f"\n🎉 Finished. Processed {count} images, {success_count} successful.")
         
     else:
         print("❌ Invalid input path.")
 
+def serve_main(argv):
+    from .server import DEFAULT_ADDRESS, ConversionServer
+
+    parser = argparse.ArgumentParser(
+        prog="autel-convert serve",
+        description="Keep a warm pool of converters and accept jobs from 'autel-convert submit'",
+    )
+    parser.add_argument("--address", default=DEFAULT_ADDRESS,
+                        help=f"host:port or unix:/path/to.sock to listen on (default: {DEFAULT_ADDRESS})")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of warm worker processes (0 = one per CPU, default: 1)")
+    add_converter_arguments(parser)
+    args = parser.parse_args(argv)
+    factory, _ = converter_factory(args, parser)
+
+    try:
+        server = ConversionServer(args.address, jobs=args.jobs, converter_factory=factory, backend=args.backend)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot listen on {args.address}: {e}")
+        return 1
+    print(f"🚀 Serving on {args.address} with {server.jobs} warm workers (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print("👋 Server stopped.")
+    return 0
+
+def submit_main(argv):
+    from .server import DEFAULT_ADDRESS, ConversionClient
+
+    parser = argparse.ArgumentParser(
+        prog="autel-convert submit",
+        description="Convert images through a running 'autel-convert serve'",
+    )
+    parser.add_argument("input", help="Path to a single JPG file or a directory of JPGs")
+    parser.add_argument("output", help="Directory to save output TIFFs and JSON")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS,
+                        help=f"Server address, host:port or unix:/path/to.sock (default: {DEFAULT_ADDRESS})")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print each result as soon as the server finishes it (default: wait for the whole job)")
+    parser.add_argument("--no-aggregate-json", action="store_true",
+                        help="Directory mode: skip the final dataset_metadata.json compaction")
+    parser.add_argument("--shutdown", action="store_true", help="Stop the server instead of submitting a job")
+    add_discovery_arguments(parser)
+    args = parser.parse_args(argv)
+
+    client = ConversionClient(args.address)
+    try:
+        if args.shutdown:
+            client.shutdown()
+            print("👋 Server stopped.")
+            return 0
+        info = client.ping()
+    except OSError as e:
+        print(f"❌ No server at {args.address}: {e}")
+        return 1
+
+    input_path = Path(args.input).resolve()
+    output_dir = Path(args.output).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if input_path.is_file():
+        pairs = [(input_path, output_dir / f"{input_path.stem}.tif")]
+    elif input_path.is_dir():
+        pairs = []
+        for path, relative in discover(input_path, args, info.get("backend")):
+            pairs.append((path, output_path_for(output_dir, relative)))
+            pairs[-1][1].parent.mkdir(parents=True, exist_ok=True)
+    else:
+        print("❌ Invalid input path.")
+        return 1
+
+    results = client.convert_stream(pairs) if args.stream else client.convert(pairs)
+    if input_path.is_file():
+        result = next(iter(results))
+        if not result.success:
+            print(f"❌ Failed to convert {input_path.name}: {result.error}")
+            return 1
+        print(f"✅ Converted: {Path(result.output_path).name}")
+        if result.metadata:
+            json_name = f"{input_path.stem}_meta.json"
+            with open(output_dir / json_name, 'w') as f:
+                json.dump(result.metadata, f, indent=4)
+            print(f"📄 Saved metadata: {json_name}")
+        return 0
+
+    from .metadata_writer import MetadataWriter
+
+    success_count = 0
+    tag = shard_tag(parse_shard(args.shard)) if args.shard else None
+    with MetadataWriter(output_dir, tag=tag) as writer:
+        for result in results:
+            name = Path(result.input_path).relative_to(input_path).as_posix()
+            if result.success:
+                success_count += 1
+                print(f"✅ {name}")
+                if result.metadata:
+                    writer.append(name, result.metadata)
+            else:
+                print(f"❌ {name}")
+    if not args.no_aggregate_json:
+        writer.compact()
+    print(f"\n🎉 Finished. Processed {len(pairs)} images, {success_count} successful.")
+    return 0
+
+def merge_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="autel-convert merge",
+        description="Combine the metadata of every '--shard I/N' run in OUTPUT into one dataset index",
+    )
+    parser.add_argument("output", help="Output folder shared by the shards")
+    parser.add_argument("--no-aggregate-json", action="store_true",
+                        help="Skip writing the aggregated dataset_metadata.json")
+    args = parser.parse_args(argv)
+
+    from .metadata_writer import merge_shards
+
+    try:
+        count = merge_shards(args.output, compact=not args.no_aggregate_json)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"📚 Merged {count} records into {Path(args.output) / 'dataset_metadata.jsonl'}")
+    return 0
+
+def normalize_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="autel-convert normalize",
+        description="Scale the converted thermal bands in OUTPUT to 8/16-bit over one dataset-wide temperature range "
+                    "(reads the stored TIFFs or stack; nothing is decoded again)",
+    )
+    parser.add_argument("output", help="Output folder of a directory-mode run")
+    parser.add_argument("--bits", type=int, choices=(8, 16), default=8, help="Output bit depth (default: 8)")
+    add_percentiles_argument(parser)
+    parser.add_argument("--range", type=float, nargs=2, default=None, metavar=("MIN", "MAX"),
+                        help="Fixed range in °C instead of percentiles (like GLOBAL_TEMP_MIN/MAX of the legacy tool)")
+    parser.add_argument("--rebuild-histogram", action="store_true",
+                        help="Recount dataset_histogram.npy from the stored TIFFs or stack "
+                             "(for outputs converted without --histogram). Reading the DLL's LZW TIFFs "
+                             "needs the 'imagecodecs' package to be fast")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes (0 = one per CPU, default: 1)")
+    args = parser.parse_args(argv)
+    if args.range and args.range[0] >= args.range[1]:
+        parser.error("--range MIN must be below MAX")
+
+    output_dir = Path(args.output)
+    if not output_dir.is_dir():
+        print("❌ Invalid output path.")
+        return 1
+
+    from .normalize import HISTOGRAM_NAME, DatasetHistogram, build_histogram, find_outputs, stack_histogram
+    from .stack import HEADER_NAME
+
+    if not (output_dir / "stack" / HEADER_NAME).exists():
+        warn_slow_tiff_reads(output_dir)
+    histogram = None
+    histogram_path = output_dir / HISTOGRAM_NAME
+    if not args.range:
+        if histogram_path.exists() and not args.rebuild_histogram:
+            histogram = DatasetHistogram.load(histogram_path)
+        else:
+            print("📊 Counting the stored thermal values...")
+            if (output_dir / "stack" / HEADER_NAME).exists():
+                histogram = stack_histogram(output_dir / "stack")
+            else:
+                histogram = build_histogram([path for path, _ in find_outputs(output_dir)], jobs=args.jobs)
+            histogram.save(histogram_path)
+            print(f"📊 Saved thermal histogram to: {histogram_path}")
+    try:
+        write_normalized(output_dir, histogram, args.bits, args.percentiles, args.range, jobs=args.jobs)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+def _coordinates(text: str, count: int = None) -> list:
+    values = [float(v) for v in text.replace(",", " ").split()]
+    if count is not None and len(values) != count:
+        raise ValueError(f"'{text}': expected {count} numbers")
+    return values
+
+def query_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="autel-convert query",
+        description="Temperature value, min, max and mean of points, rectangles and polygons across many images",
+        epilog='Region file example: [{"name": "valve", "point": [120, 80]}, {"rect": [0, 0, 63, 31]}, '
+               '{"name": "roof", "polygon": [[300, 200], [340, 210], [320, 260]]}]',
+    )
+    parser.add_argument("input", help="A JPG, a folder of JPGs (or of TIFFs, with --include '*.tif'), "
+                                      "or a stack folder written with --stack")
+    parser.add_argument("--regions", default=None, metavar="FILE", help="JSON list of regions (see below)")
+    parser.add_argument("--point", action="append", default=[], metavar="X,Y", help="A pixel (repeatable)")
+    parser.add_argument("--rect", action="append", default=[], metavar="X0,Y0,X1,Y1",
+                        help="A rectangle, both corners included (repeatable)")
+    parser.add_argument("--polygon", action="append", default=[], metavar="'X,Y X,Y X,Y ...'",
+                        help="A polygon of 3 or more vertices (repeatable)")
+    parser.add_argument("-o", "--output", default=None, metavar="CSV",
+                        help="Write the results to this CSV file (default: print them)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes (0 = one per CPU, default: 1)")
+    add_converter_arguments(parser, tiff_options=False)
+    add_discovery_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from .query import Point, Polygon, Rect, RegionMasks, load_regions, query_images, query_stack
+    from .stack import HEADER_NAME
+
+    try:
+        regions = load_regions(args.regions) if args.regions else []
+        regions += [Point(*(int(v) for v in _coordinates(p, 2))) for p in args.point]
+        regions += [Rect(*(int(v) for v in _coordinates(r, 4))) for r in args.rect]
+        for polygon in args.polygon:
+            values = _coordinates(polygon)
+            regions.append(Polygon(list(zip(values[::2], values[1::2]))))
+        if not regions:
+            parser.error("Give at least one --point, --rect, --polygon or --regions file")
+        masks = RegionMasks(regions)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        parser.error(f"Invalid regions: {e}")
+
+    input_path = Path(args.input)
+    stack_dir = next((d for d in (input_path, input_path / "stack") if (d / HEADER_NAME).exists()), None)
+    if stack_dir is not None:
+        result = query_stack(stack_dir, masks)
+    else:
+        if input_path.is_file():
+            paths = [input_path]
+        elif input_path.is_dir():
+            paths = [path for path, _ in discover(input_path, args, args.backend)]
+        else:
+            print("❌ Invalid input path.")
+            return 1
+        factory, _ = converter_factory(args, parser)
+        result = query_images(paths, masks, jobs=args.jobs, converter_factory=factory)
+
+    for frame, error in result.errors.items():
+        print(f"❌ {Path(frame).name}: {error}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            result.write_csv(f)
+        print(f"📄 Saved {len(result.regions)} regions x {int(result.valid.sum())} frames to: {args.output}")
+    else:
+        result.write_csv(sys.stdout)
+    return 0
+
+def hotspots_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="autel-convert hotspots",
+        description="Detect regions above a temperature or above their surroundings; write one table of hotspots "
+                    "(and, with --tiffs, TIFFs of the frames that have any)",
+    )
+    parser.add_argument("input", help="A JPG or a folder of JPGs")
+    parser.add_argument("output", help="Directory for hotspots.csv (and the TIFFs)")
+    parser.add_argument("--threshold", type=float, default=None, metavar="CELSIUS",
+                        help="Hot pixels are at least this temperature")
+    parser.add_argument("--delta", type=float, default=None, metavar="CELSIUS",
+                        help="Hot pixels are at least this much above their local background (with --threshold, "
+                             "both must hold)")
+    parser.add_argument("--window", type=int, default=31, metavar="PIXELS",
+                        help="Side of the box the local background is averaged over (default: 31)")
+    parser.add_argument("--min-area", type=int, default=4, metavar="PIXELS",
+                        help="Ignore hotspots smaller than this (default: 4)")
+    parser.add_argument("--connectivity", type=int, choices=(4, 8), default=8,
+                        help="Pixels touching by an edge (4) or also by a corner (8, default) form one hotspot")
+    parser.add_argument("--tiffs", action="store_true",
+                        help="Also convert the frames that contain hotspots (TIFF options below apply)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes (0 = one per CPU, default: 1)")
+    add_converter_arguments(parser)
+    add_discovery_arguments(parser)
+    args = parser.parse_args(argv)
+
+    import csv
+
+    from .hotspots import CSV_COLUMNS, HOTSPOTS_NAME, HotspotOptions, find_hotspots, write_csv_rows
+
+    try:
+        options = HotspotOptions(args.threshold, args.delta, args.window, args.min_area, args.connectivity)
+    except ValueError as e:
+        parser.error(str(e))
+
+    input_path = Path(args.input)
+    output_dir = Path(args.output)
+    if input_path.is_file():
+        found = [(input_path, input_path.name)]
+    elif input_path.is_dir():
+        found = list(discover(input_path, args, args.backend))
+    else:
+        print("❌ Invalid input path.")
+        return 1
+    factory, _ = converter_factory(args, parser)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    names = {str(path): relative for path, relative in found}
+
+    def make_pairs():
+        for path, relative in found:
+            output_file = output_path_for(output_dir, relative)
+            if args.tiffs:
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+            yield path, output_file
+
+    frames = with_hotspots = count = tiffs = 0
+    csv_path = output_dir / HOTSPOTS_NAME
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for result in find_hotspots(make_pairs(), options, jobs=args.jobs, converter_factory=factory,
+                                    write_tiffs=args.tiffs):
+            frames += 1
+            name = names[result.input_path]
+            if not result.success:
+                print(f"❌ {name}: {result.error}")
+            if len(result.hotspots):
+                with_hotspots += 1
+                count += len(result.hotspots)
+                tiffs += result.output_path is not None
+                print(f"🔥 {name}: {len(result.hotspots)} hotspots, peak {result.hotspots['peak'].max():.1f} °C")
+                write_csv_rows(writer, name, result.hotspots)
+    print(f"\n📄 Saved {count} hotspots from {with_hotspots} of {frames} frames to: {csv_path}")
+    if args.tiffs:
+        print(f"🖼️  Wrote {tiffs} TIFFs (frames without hotspots were not converted)")
+    return 0
+
+def index_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="autel-convert index",
+        description="Build a spatial index of the frames in INPUT from their GPS/XMP headers, without converting",
+    )
+    parser.add_argument("input", help="Folder of JPGs")
+    parser.add_argument("-o", "--output", default=None, metavar="FILE",
+                        help="Index file to write (default: INPUT/spatial_index.npz)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes (0 = one per CPU, default: 1)")
+    parser.add_argument("--fov", type=float, nargs=2, default=None, metavar=("H", "V"),
+                        help="Horizontal and vertical field of view of the camera in degrees (default: 33 26.5)")
+    parser.add_argument("--cell-size", type=float, default=None, metavar="METERS",
+                        help="Grid cell size (default: about one footprint)")
+    add_discovery_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from .spatial import SPATIAL_INDEX_NAME, scan_positions
+
+    input_path = Path(args.input)
+    if not input_path.is_dir():
+        print("❌ Invalid input path.")
+        return 1
+    positions = scan_positions(discover(input_path, args), jobs=args.jobs)
+    output = Path(args.output) if args.output else input_path / SPATIAL_INDEX_NAME
+    write_spatial_index(output, positions, root=input_path.resolve(), fov=args.fov, cell_size=args.cell_size)
+    return 0
+
+def locate_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="autel-convert locate",
+        description="List the frames that cover a point or an area, from a spatial index",
+        epilog="The paths can be fed back with '--paths-from FILE', e.g. "
+               "'autel-convert locate OUT --point=-33.86,151.21 -o hits.txt' then "
+               "'autel-convert query FLIGHT --paths-from hits.txt --point 320,256'",
+    )
+    parser.add_argument("index", help="spatial_index.npz, or a folder containing it")
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--point", default=None, metavar="LAT,LON",
+                       help="Frames whose footprint contains the point (write --point=LAT,LON for a negative LAT)")
+    where.add_argument("--bbox", default=None, metavar="SOUTH,WEST,NORTH,EAST",
+                       help="Frames whose footprint intersects the box")
+    where.add_argument("--near", default=None, metavar="LAT,LON,METERS",
+                       help="Frames taken within METERS of the point, nearest first")
+    parser.add_argument("--root", default=None,
+                        help="Folder the frame names are relative to (default: the input folder the index was built "
+                             "from)")
+    parser.add_argument("--names", action="store_true", help="Print the relative names instead of paths")
+    parser.add_argument("-o", "--output", default=None, metavar="FILE", help="Write the list to FILE")
+    args = parser.parse_args(argv)
+
+    from .spatial import SpatialIndex
+
+    try:
+        index = SpatialIndex.load(args.index)
+        if args.point:
+            frames = index.covering(*_coordinates(args.point, 2))
+        elif args.bbox:
+            frames = index.within(*_coordinates(args.bbox, 4))
+        else:
+            frames = index.near(*_coordinates(args.near, 3))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    lines = list(index.frames["name"][frames]) if args.names else [str(p) for p in index.paths(frames, args.root)]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.writelines(line + "\n" for line in lines)
+        print(f"📍 {len(lines)} of {len(index)} frames saved to: {args.output}")
+    else:
+        for line in lines:
+            print(line)
+        print(f"📍 {len(lines)} of {len(index)} frames", file=sys.stderr)
+    return 0
+
+def watch_main(argv):
+    from .watch import DEFAULT_INTERVAL, DEFAULT_SETTLE
+
+    parser = argparse.ArgumentParser(
+        prog="autel-convert watch",
+        description="Convert images as they land in a folder (e.g. card offloads), with warm workers",
+        epilog="Runs until Ctrl+C (or --idle-exit); conversions in flight are finished first. "
+               "Already converted images are skipped, so the watcher can be restarted at any time.",
+    )
+    parser.add_argument("input", help="Landing folder to watch")
+    parser.add_argument("output", help="Directory to save output TIFFs and metadata")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of warm worker processes (0 = one per CPU, default: 1)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE, metavar="SECONDS",
+                        help=f"A file is converted once its size and mtime have not changed for SECONDS "
+                             f"(default: {DEFAULT_SETTLE:g})")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, metavar="SECONDS",
+                        help=f"Time between folder scans (default: {DEFAULT_INTERVAL:g})")
+    parser.add_argument("--idle-exit", type=float, default=None, metavar="SECONDS",
+                        help="Stop after SECONDS without new, copying or converting files")
+    parser.add_argument("--status-every", type=float, default=10.0, metavar="SECONDS",
+                        help="Print queue depth and latency every SECONDS while busy (default: 10; 0 = never)")
+    parser.add_argument("--metrics-file", default=None, metavar="PATH",
+                        help="Keep queue depth, counts and latency in Prometheus text format in PATH "
+                             "(updated on every scan)")
+    parser.add_argument("--quiet", action="store_true", help="Do not print a line per converted image")
+    add_converter_arguments(parser)
+    add_discovery_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.paths_from:
+        parser.error("--paths-from lists a fixed set of files; it cannot be watched")
+    if args.settle < 0 or args.interval <= 0:
+        parser.error("--settle must be >= 0 and --interval > 0")
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    input_path = Path(args.input)
+    output_dir = Path(args.output)
+    if not input_path.is_dir():
+        print("❌ Invalid input path.")
+        return 1
+    factory, _ = converter_factory(args, parser)
+
+    from .manifest import MANIFEST_NAME, Manifest
+    from .metadata_writer import MetadataWriter, tagged_name
+    from .watch import ArrivalScanner, FolderIngest, WatchStats
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    include = args.include or (DEFAULT_INCLUDE + (FIXTURE_INCLUDE if args.backend == "fixture" else ()))
+    scanner = ArrivalScanner(input_path, settle=args.settle, recursive=args.recursive, include=include,
+                             exclude=args.exclude, shard=shard)
+    tag = shard_tag(shard) if shard else None
+    last_status = [time.monotonic(), WatchStats().status_line()]  # time and text of the last status line
+
+    def on_result(relative, result):
+        if not args.quiet:
+            print(f"✅ {relative}" if result.success else f"❌ {relative}")
+
+    def on_poll(stats):
+        if args.metrics_file:
+            stats.write_metrics(args.metrics_file)
+        now = time.monotonic()
+        line = stats.status_line()
+        if args.status_every and now - last_status[0] >= args.status_every and line != last_status[1]:
+            print(line)
+            last_status[:] = [now, line]
+
+    with Manifest(output_dir, name=tagged_name(MANIFEST_NAME, tag)) as manifest, \
+            MetadataWriter(output_dir, append=True, tag=tag) as writer:
+        try:
+            ingest = FolderIngest(input_path, output_dir, factory, jobs=args.jobs, scanner=scanner,
+                                  manifest=manifest, writer=writer)
+        except Exception as e:
+            print(f"Failed to initialize converter: {e}")
+            return 1
+        print(f"👀 Watching {input_path} with {ingest.jobs} workers (settle {args.settle:g}s); Ctrl+C to stop")
+        with ingest:
+            try:
+                ingest.run(args.interval, idle_exit=args.idle_exit, on_result=on_result, on_poll=on_poll)
+            except KeyboardInterrupt:
+                print("\n🛑 Stopping.")
+        on_poll(ingest.stats)
+        print(ingest.stats.status_line())
+        manifest.compact()
+    print(f"📚 Metadata in: {writer.jsonl_path}")
+    return 0
+
+COMMANDS = {
+    "serve": serve_main,
+    "submit": submit_main,
+    "merge": merge_main,
+    "normalize": normalize_main,
+    "query": query_main,
+    "index": index_main,
+    "locate": locate_main,
+    "watch": watch_main,
+    "hotspots": hotspots_main,
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+    return convert_main(argv)
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""Pluggable decode backends and a converter that encodes in NumPy.
+
+A backend turns an input file into a DecodedFrame (temperature grid, RGB image
+and metadata). Everything after decode - band encoding, band assembly and the
+TIFF write - is done by `encoding` and `tiff`, so the same pipeline runs with
+the Autel SDK on Windows or with fixtures on any platform.
+"""
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from . import encoding
+from .converter import ThermalConverter, sdk_dll_path
+from .profiling import StageTimer, TimingHooks, file_size
+from .tiff import TiffOptions, write_tiff
+
+@dataclass
+class DecodedFrame:
+    """Output of a decode backend."""
+    temperature: np.ndarray  # (H, W) float32 °C, as returned by the SDK (not sanitized)
+    rgb: np.ndarray          # (H, W, 3) uint8, R, G, B order
+    metadata: dict           # {"stats": {...}, "metadata": {...}}
+
+def compute_stats(temperature: np.ndarray) -> dict:
+    """Computes min/max/avg and their pixel positions, in the GetMetadataJSON layout.
+
+    Invalid pixels (see encoding.sanitize_temperature) are ignored.
+    """
+    temps = np.asarray(temperature, dtype=np.float32)
+    valid = np.isfinite(temps) & (temps < encoding.INVALID_THRESHOLD)
+    if not valid.any():
+        point = {"x": 0, "y": 0}
+        return {"min": 0.0, "max": 0.0, "avg": 0.0, "min_point": point, "max_point": dict(point)}
+
+    lo = np.where(valid, temps, np.inf)
+    hi = np.where(valid, temps, -np.inf)
+    min_y, min_x = np.unravel_index(np.argmin(lo), temps.shape)
+    max_y, max_x = np.unravel_index(np.argmax(hi), temps.shape)
+    return {
+        "min": float(lo[min_y, min_x]),
+        "max": float(hi[max_y, max_x]),
+        "avg": float(temps[valid].mean(dtype=np.float64)),
+        "min_point": {"x": int(min_x), "y": int(min_y)},
+        "max_point": {"x": int(max_x), "y": int(max_y)},
+    }
+
+class DecodeBackend:
+    """Base class for decode backends."""
+
+    name = None
+
+    @property
+    def cache_token(self) -> str:
+        """Identifies the decoder for cache keys; must change whenever decoded output could."""
+        return self.name
+
+    def decode(self, input_path: str) -> DecodedFrame:
+        """Decodes `input_path`. Returns None if the file cannot be decoded."""
+        raise NotImplementedError
+
+class SDKBackend(DecodeBackend):
+    """Radiometric decode through the Autel SDK (DecodeFrame export of ir_converter.dll)."""
+
+    name = "sdk"
+
+    def __init__(self, converter: ThermalConverter = None):
+        self._converter = converter
+
+    @property
+    def converter(self) -> ThermalConverter:
+        # Created on first use so the backend can be pickled into worker processes
+        if self._converter is None:
+            self._converter = ThermalConverter()
+        return self._converter
+
+    def __getstate__(self):
+        return {"_converter": None}
+
+    @property
+    def cache_token(self) -> str:
+        # The SDK exposes no version, so identify it by its DLL file
+        st = os.stat(sdk_dll_path())
+        return f"{self.name}:{st.st_size}:{st.st_mtime_ns}"
+
+    def decode(self, input_path: str) -> DecodedFrame:
+        decoded = self.converter.decode_frame(str(input_path))
+        if decoded is None:
+            return None
+        temperature, rgb, metadata = decoded
+        return DecodedFrame(temperature, rgb, metadata)
+
+def fixture_path(input_path) -> Path:
+    """Maps an input path to its fixture: the file itself if it is a .npz, else a .npz sidecar."""
+    path = Path(input_path)
+    if path.suffix.lower() == '.npz':
+        return path
+    return path.with_suffix('.npz')
+
+def save_fixture(path, temperature: np.ndarray, rgb: np.ndarray, metadata: dict = None):
+    """Writes a fixture readable by FixtureBackend."""
+    arrays = {
+        "temperature": np.asarray(temperature, dtype=np.float32),
+        "rgb": np.asarray(rgb, dtype=np.uint8),
+    }
+    if metadata is not None:
+        arrays["metadata"] = np.array(json.dumps(metadata))
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+class FixtureBackend(DecodeBackend):
+    """Reads pre-decoded frames from .npz fixtures; needs neither Windows nor the SDK.
+
+    A fixture holds `temperature` (H, W) float32, `rgb` (H, W, 3) uint8 and an
+    optional `metadata` JSON string. Without metadata, stats are computed from
+    the temperature grid.
+    """
+
+    name = "fixture"
+
+    def decode(self, input_path: str) -> DecodedFrame:
+        path = fixture_path(input_path)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            temperature = data["temperature"].astype(np.float32, copy=False)
+            rgb = data["rgb"].astype(np.uint8, copy=False)
+            metadata = json.loads(str(data["metadata"])) if "metadata" in data.files else None
+        if metadata is None:
+            metadata = {"stats": compute_stats(temperature), "metadata": {}}
+        return DecodedFrame(temperature, rgb, metadata)
+
+BACKENDS = {
+    SDKBackend.name: SDKBackend,
+    FixtureBackend.name: FixtureBackend,
+}
+
+class BackendConverter(TimingHooks):
+    """Drop-in alternative to ThermalConverter that decodes with a backend and encodes in NumPy.
+
+    Output TIFFs have the same band layout and pixel values as ConvertToTiff.
+    With `histogram`, convert_with_metadata keeps the 65536-bin histogram of
+    the encoded thermal band in `last_histogram` (see normalize). With
+    PreviewOptions as `previews`, it renders PNG thumbnails from the bands in
+    memory into `last_thumbnails` (written next to the final TIFF by
+    batch.convert_atomic). With `exif`, the EXIF, GPS and XMP metadata of the
+    source JPG are written into the TIFF (see exif).
+    """
+
+    last_histogram = None
+    last_thumbnails = None
+
+    def __init__(self, backend: DecodeBackend = None, cache=None, tiff_options: TiffOptions = None,
+                 histogram: bool = False, previews=None, exif: bool = False):
+        backend = backend if backend is not None else SDKBackend()
+        if cache is not None:
+            from .cache import CachedBackend
+            backend = CachedBackend(backend, cache)
+        self.backend = backend
+        self.tiff_options = tiff_options or TiffOptions()
+        self.collect_histogram = histogram
+        self.previews = previews
+        self.exif = exif
+
+    def decode(self, input_path: str) -> DecodedFrame:
+        """Decodes a file with the backend (through the cache, if any)."""
+        return self.backend.decode(str(input_path))
+
+    def encode(self, frame: DecodedFrame) -> np.ndarray:
+        """Encodes a decoded frame into the TIFF bands.
+
+        (H, W, 4) uint16 by default, or the (H, W) thermal band alone in
+        thermal-only mode (the RGB bands are then never built).
+        """
+        if self.tiff_options.thermal_only:
+            return encoding.encode_temperature(frame.temperature)
+        return encoding.encode_frame(frame.temperature, frame.rgb)
+
+    def convert_with_metadata(self, input_path: str, output_path: str) -> tuple:
+        """Converts a file to TIFF. Returns (success, metadata), like ThermalConverter.
+
+        Per-stage timings go to `last_timings` and the timing hooks.
+        """
+        self.last_timings = None
+        self.last_histogram = None
+        self.last_thumbnails = None
+        timer = StageTimer()
+        with timer.stage("decode"):
+            frame = self.decode(input_path)
+        if frame is None:
+            return False, None
+        return self.convert_frame(frame, input_path, output_path, timer)
+
+    def convert_frame(self, frame: DecodedFrame, input_path: str, output_path: str, timer: StageTimer = None) -> tuple:
+        """Writes the TIFF of an already decoded frame. Returns (True, metadata).
+
+        This is convert_with_metadata without the decode. `input_path` is only read
+        for its EXIF and size.
+        """
+        self.last_timings = None
+        self.last_histogram = None
+        self.last_thumbnails = None
+        timer = timer or StageTimer()
+        with timer.stage("encode"):
+            bands = self.encode(frame)
+            histogram = None
+            if self.collect_histogram:
+                histogram = encoding.band_histogram(bands if bands.ndim == 2 else bands[..., 3])
+        thumbnails = None
+        if self.previews is not None:
+            from .preview import render_thumbnails
+            with timer.stage("preview"):
+                thumbnails = render_thumbnails(bands if bands.ndim == 2 else bands[..., 3], frame.rgb, self.previews)
+        extra_tags, sub_ifds = (), None
+        if self.exif:
+            from .exif import read_exif
+            with timer.stage("exif"):
+                exif = read_exif(input_path)
+            if exif:
+                extra_tags, sub_ifds = exif.tiff_tags()
+        with timer.stage("write"):
+            timer.output_bytes = write_tiff(output_path, bands, self.tiff_options, extra_tags=extra_tags,
+                                            sub_ifds=sub_ifds)
+        timer.input_bytes = file_size(input_path)
+        self.last_histogram = histogram
+        self.last_thumbnails = thumbnails
+        self._emit_timings(input_path, output_path, timer.as_dict())
+        return True, frame.metadata
+
+    def convert_image(self, input_path: str, output_path: str) -> bool:
+        success, _ = self.convert_with_metadata(input_path, output_path)
+        return success
+
+    def get_metadata(self, input_path: str) -> dict:
+        frame = self.decode(input_path)
+        return frame.metadata if frame is not None else None
+
+    def read_temperature(self, input_path: str, out: np.ndarray = None) -> np.ndarray:
+        """Returns the sanitized float32 temperature grid, like ThermalConverter.read_temperature."""
+        frame = self.decode(input_path)
+        if frame is None:
+            return None
+        return encoding.sanitize_temperature(frame.temperature, out=out)
+
+def create_converter(backend: str = "native", cache_dir=None, cache_bytes: int = None,
+                     tiff_options: TiffOptions = None, histogram: bool = False, previews=None,
+                     exif: bool = False):
+    """Builds a converter for a backend name.
+
+    "native" is the DLL's own ConvertWithMetadata path; any other name selects
+    a decode backend from BACKENDS and encodes in NumPy. With `cache_dir`,
+    decodes go through a DecodeCache in that directory. `tiff_options`
+    selects compression, tiling, BigTIFF and thermal-only output.
+    `histogram` makes the converter count encoded thermal values (see normalize)
+    and PreviewOptions as `previews` makes it render thumbnails (see preview).
+    `exif` copies the EXIF, GPS and XMP metadata of each JPG into its TIFF.
+    """
+    cache = None
+    if cache_dir is not None:
+        from .cache import DEFAULT_CACHE_BYTES, DecodeCache
+        cache = DecodeCache(cache_dir, cache_bytes or DEFAULT_CACHE_BYTES)
+
+    if backend == "native":
+        return ThermalConverter(cache=cache, tiff_options=tiff_options, histogram=histogram, previews=previews,
+                                exif=exif)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose from: native, {', '.join(BACKENDS)}")
+    return BackendConverter(BACKENDS[backend](), cache=cache, tiff_options=tiff_options, histogram=histogram,
+                            previews=previews, exif=exif)
@@ -0,0 +1,281 @@
+import collections
+import functools
+import multiprocessing
+import os
+import threading
+
+from .converter import ThermalConverter
+from .encoding import compact_histogram
+from .fileutil import discard, partial_path
+from .manifest import STATUS_FAILED, STATUS_OK
+from .preview import write_thumbnails
+from .results import ConversionResult
+
+# Per-process converter instance, created once by the pool initializer.
+# The Autel SDK's thread-safety is unknown, so every worker gets its own
+# process and its own DLL handle instead of sharing one across threads.
+_worker_converter = None
+_worker_error = None
+
+def _init_worker(converter_factory):
+    global _worker_converter, _worker_error
+    try:
+        _worker_converter = converter_factory()
+        _worker_error = None
+    except Exception as e:
+        # Raising from a pool initializer makes the pool respawn workers forever,
+        # so keep the error and report it on every task instead.
+        _worker_converter = None
+        _worker_error = f"Failed to initialize converter: {e}"
+
+def _run_in_worker(task, item):
+    if _worker_converter is None:
+        raise RuntimeError(_worker_error or "Converter not initialized")
+    return task(_worker_converter, item)
+
+def convert_atomic(converter, input_path: str, output_path: str, frame=None) -> tuple:
+    """Runs `converter.convert_with_metadata` into a temporary file and renames it into place.
+
+    A crash or failure never leaves a partial TIFF under the final name.
+    Thumbnails rendered by the converter are then written next to it.
+    With an already decoded `frame`, `converter.convert_frame` writes it instead.
+    """
+    tmp = partial_path(output_path)
+    try:
+        if frame is not None:
+            success, meta = converter.convert_frame(frame, input_path, str(tmp))
+        else:
+            success, meta = converter.convert_with_metadata(input_path, str(tmp))
+        if success:
+            os.replace(tmp, output_path)
+            thumbnails = getattr(converter, 'last_thumbnails', None)
+            if thumbnails:
+                write_thumbnails(output_path, thumbnails)
+        return success, meta
+    finally:
+        discard(tmp)
+
+def convert_many_atomic(converter, pairs) -> list:
+    """`convert_atomic` for a batch: one `converter.convert_many` call into temporary files.
+
+    Each TIFF that was written is renamed into place; the others are removed.
+    Returns a (success, metadata) tuple per pair.
+    """
+    tmps = [partial_path(output_path) for _, output_path in pairs]
+    try:
+        outcomes = converter.convert_many([(input_path, str(tmp)) for (input_path, _), tmp in zip(pairs, tmps)])
+        for (_, output_path), tmp, (success, _) in zip(pairs, tmps, outcomes):
+            if success:
+                os.replace(tmp, output_path)
+        return outcomes
+    finally:
+        for tmp in tmps:
+            discard(tmp)
+
+def _result(input_path, output_path, success, meta, timings, histogram) -> ConversionResult:
+    if not success:
+        timings = histogram = None
+    if histogram is not None:
+        histogram = compact_histogram(histogram)  # a few KB instead of 65536 bins through the pool
+    return ConversionResult(input_path, output_path, success, meta, None if success else "Conversion failed",
+                            timings=timings, histogram=histogram)
+
+def _convert_task(converter, pair):
+    input_path, output_path = pair
+    try:
+        success, meta = convert_atomic(converter, input_path, output_path)
+    except Exception as e:
+        return ConversionResult(input_path, output_path, False, error=str(e))
+    return _result(input_path, output_path, success, meta,
+                   getattr(converter, 'last_timings', None), getattr(converter, 'last_histogram', None))
+
+def _skipped(pair) -> ConversionResult:
+    return ConversionResult(pair[0], pair[1], True, skipped=True)
+
+def _convert_or_skip_task(converter, item):
+    # Pairs already current (manifest) pass through the workers too, so results stay in input order
+    pair, current = item
+    return _skipped(pair) if current else _convert_task(converter, pair)
+
+def _convert_many_task(converter, items):
+    pairs = [pair for pair, current in items if not current]
+    converted = iter(_convert_pairs(converter, pairs))
+    return [_skipped(pair) if current else next(converted) for pair, current in items]
+
+def _convert_pairs(converter, pairs) -> list:
+    # Converters that cannot batch natively (NumPy encoding, older DLL) go file by file,
+    # which also keeps their per-file extras (thumbnails)
+    if not pairs:
+        return []
+    if not getattr(converter, 'batches_natively', False):
+        return [_convert_task(converter, pair) for pair in pairs]
+    try:
+        outcomes = convert_many_atomic(converter, pairs)
+    except Exception as e:
+        return [ConversionResult(i, o, False, error=str(e)) for i, o in pairs]
+    timings = converter.last_batch_timings
+    histograms = converter.last_histograms
+    return [_result(i, o, success, meta, timings[k], histograms[k])
+            for k, ((i, o), (success, meta)) in enumerate(zip(pairs, outcomes))]
+
+def _chunked(items, size: int, sizes: collections.deque):
+    # Lists of up to `size` items; each length is recorded in `sizes` as the list is handed out
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            sizes.append(len(chunk))
+            yield chunk
+            chunk = []
+    if chunk:
+        sizes.append(len(chunk))
+        yield chunk
+
+def _flatten(results, sizes: collections.deque):
+    # An exception for a whole chunk becomes one exception per item
+    for result in results:
+        size = sizes.popleft()
+        if isinstance(result, Exception):
+            yield from [result] * size
+        else:
+            yield from result
+
+class _SubmissionWindow:
+    """Keeps a lazy item iterator at most `size` items ahead of the results consumed.
+
+    Pool.imap reads its input from a handler thread as fast as it can, which
+    would pull a whole multi-million-file listing into memory. `feed` blocks
+    that thread until `done` is called for an earlier item; `close` lets it
+    finish (the consumer stopped early).
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._free = threading.Semaphore(size)
+        self._closed = False
+
+    def feed(self, items):
+        for item in items:
+            # Polls so an abandoned run (never closed) still lets the pool shut down at exit
+            while not self._free.acquire(timeout=0.1):
+                if not threading.main_thread().is_alive():
+                    self._closed = True
+                    break
+            if self._closed:
+                return
+            yield item
+
+    def done(self):
+        self._free.release()
+
+    def close(self):
+        self._closed = True
+        self._free.release(self.size)
+
+def window_size(jobs: int, chunksize: int) -> int:
+    """Items submitted ahead of the results: ~4 chunks per worker (at least one chunk more than in flight)."""
+    return jobs * chunksize * 4
+
+def _safe_task(task, item):
+    try:
+        return _run_in_worker(task, item)
+    except Exception as e:
+        return e
+
+def default_chunksize(count: int, jobs: int) -> int:
+    """Chunk size giving each worker ~4 chunks: few IPC round trips, balanced tail."""
+    if count <= 0:
+        return 8
+    return max(1, min(64, count // (jobs * 4)))
+
+def resolve_jobs(jobs: int) -> int:
+    """Maps jobs <= 0 to the number of CPUs."""
+    if jobs is None or jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def run_tasks(task, items, jobs: int = 1, converter_factory=ThermalConverter, chunksize: int = None):
+    """Runs `task(converter, item)` for every item and yields results in input order.
+
+    Each worker process builds its own converter with `converter_factory`.
+    With jobs == 1 everything runs in the calling process. Exceptions raised
+    by `task` are yielded as the exception object rather than raised, so one
+    bad item does not stop the batch.
+    """
+    jobs = resolve_jobs(jobs)
+
+    if jobs == 1:
+        _init_worker(converter_factory)
+        for item in items:
+            yield _safe_task(task, item)
+        return
+
+    if chunksize is None:
+        count = len(items) if hasattr(items, '__len__') else 0
+        chunksize = default_chunksize(count, jobs)
+
+    window = _SubmissionWindow(window_size(jobs, chunksize))
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(converter_factory,)) as pool:
+        try:
+            # imap streams results back in input order as soon as each chunk finishes
+            for result in pool.imap(functools.partial(_safe_task, task), window.feed(items), chunksize):
+                window.done()
+                yield result
+        finally:
+            # Unblocks the pool's task thread, which the pool joins on exit
+            window.close()
+
+def convert_batch(pairs, jobs: int = 1, converter_factory=ThermalConverter, chunksize: int = None, manifest=None,
+                  batch_size: int = 1):
+    """Converts (input_path, output_path) pairs in parallel.
+
+    Yields a ConversionResult per pair, in the order the pairs were given.
+    `pairs` may be any iterable, including a lazy generator: conversion starts
+    with the first pair, before the rest have been produced.
+    `converter_factory` must be picklable (a class or module-level function)
+    and return an object with a `convert_with_metadata(input, output)` method.
+
+    With a Manifest, pairs whose input is unchanged since its last successful
+    conversion are not converted again; they are yielded with skipped=True
+    (and no metadata: it was already written by the earlier run).
+    Every other outcome is recorded in the manifest as it arrives.
+
+    With `batch_size` > 1, each task converts up to that many pairs with one
+    `converter.convert_many` call (one crossing into the DLL, buffers reused
+    across the batch) when the converter `batches_natively`.
+    """
+    jobs = resolve_jobs(jobs)
+    if chunksize is None:
+        count = -(-len(pairs) // max(batch_size, 1)) if hasattr(pairs, '__len__') else 0
+        chunksize = default_chunksize(count, jobs)
+    # Every pair handed to the workers, in order. Current pairs go through the
+    # workers as well, so the window bounds this (and the listing read ahead)
+    # however many pairs a lazy `pairs` yields.
+    pending = collections.deque()
+    window = _SubmissionWindow(window_size(jobs, chunksize) * max(batch_size, 1))
+
+    def todo():
+        for i, o in window.feed(pairs):
+            pair = (str(i), str(o))
+            pending.append(pair)
+            yield pair, manifest is not None and manifest.is_current(*pair)
+
+    if batch_size > 1:
+        sizes = collections.deque()
+        tasks = run_tasks(_convert_many_task, _chunked(todo(), batch_size, sizes), jobs, converter_factory, chunksize)
+        results = _flatten(tasks, sizes)
+    else:
+        tasks = results = run_tasks(_convert_or_skip_task, todo(), jobs, converter_factory, chunksize)
+
+    try:
+        for result in results:
+            pair = pending.popleft()
+            window.done()
+            if isinstance(result, Exception):
+                result = ConversionResult(pair[0], pair[1], False, error=str(result))
+            if manifest is not None and not result.skipped:
+                manifest.record(result.input_path, result.output_path, STATUS_OK if result.success else STATUS_FAILED)
+            yield result
+    finally:
+        window.close()
+        tasks.close()
@@ -0,0 +1,162 @@
+"""Content-addressed cache of decoded frames.
+
+Decoding a JPG through the SDK is the expensive part of every call. The cache
+stores each DecodedFrame (temperature grid, RGB image and metadata) under a key
+made of the SHA-256 of the input file, the backend's `cache_token` (SDK
+identity) and `encoding.ENCODING_VERSION`. Identical content hits the cache
+whatever its path, and a new SDK or encoding invalidates old entries.
+
+Two layers:
+
+*   an in-memory LRU of recent frames, for repeat hits inside one process;
+*   an on-disk store of compressed .npz files, shared across processes and
+    runs, evicted least-recently-used once it grows past `max_bytes`.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from . import encoding
+from .backends import DecodeBackend, DecodedFrame
+from .fileutil import atomic_output, discard
+from .manifest import file_hash
+
+DEFAULT_CACHE_BYTES = 2 * 1024 ** 3
+DEFAULT_MEMORY_ITEMS = 16
+
+class DecodeCache:
+    """Two-level (memory + disk) LRU cache of DecodedFrames."""
+
+    def __init__(self, directory, max_bytes: int = DEFAULT_CACHE_BYTES, memory_items: int = DEFAULT_MEMORY_ITEMS):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        # (path, size, mtime_ns) -> content hash, so repeat lookups skip re-hashing
+        self._hashes = {}
+        self._disk_bytes = sum(p.stat().st_size for p in self._entries())
+        self.hits = 0
+        self.misses = 0
+
+    def _entries(self):
+        return self.directory.glob("*/*.npz")
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.npz"
+
+    def key(self, input_path, token: str) -> str:
+        """Cache key of an input file for a backend token."""
+        st = os.stat(input_path)
+        stamp = (str(Path(input_path).resolve()), st.st_size, st.st_mtime_ns)
+        content = self._hashes.get(stamp)
+        if content is None:
+            content = file_hash(input_path)
+            self._hashes[stamp] = content
+        material = f"{content}|{token}|{encoding.ENCODING_VERSION}"
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> DecodedFrame:
+        frame = self._memory.get(key)
+        if frame is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return frame
+
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                frame = DecodedFrame(
+                    data["temperature"],
+                    data["rgb"],
+                    json.loads(str(data["metadata"])),
+                )
+            os.utime(path)  # mtime doubles as the disk LRU clock
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            # Missing, evicted by another process, or truncated
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._remember(key, frame)
+        return frame
+
+    def put(self, key: str, frame: DecodedFrame):
+        self._remember(key, frame)
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        with atomic_output(path) as tmp:
+            with open(tmp, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    temperature=np.asarray(frame.temperature, dtype=np.float32),
+                    rgb=np.asarray(frame.rgb, dtype=np.uint8),
+                    metadata=np.array(json.dumps(frame.metadata)),
+                )
+        self._disk_bytes += path.stat().st_size
+        if self._disk_bytes > self.max_bytes:
+            self.evict()
+
+    def _remember(self, key: str, frame: DecodedFrame):
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = frame
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def evict(self):
+        """Deletes least-recently-used disk entries until the store is back under max_bytes."""
+        entries = []
+        for path in self._entries():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% so a full cache does not rescan on every put
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            discard(path)
+            total -= size
+        self._disk_bytes = total
+
+    def clear(self):
+        for path in self._entries():
+            discard(path)
+        self._memory.clear()
+        self._disk_bytes = 0
+
+class CachedBackend(DecodeBackend):
+    """Wraps a decode backend so every decode goes through a DecodeCache."""
+
+    def __init__(self, backend: DecodeBackend, cache: DecodeCache):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+
+    @property
+    def cache_token(self) -> str:
+        return self.backend.cache_token
+
+    def decode(self, input_path: str) -> DecodedFrame:
+        try:
+            key = self.cache.key(input_path, self.backend.cache_token)
+        except OSError:
+            return None
+        frame = self.cache.get(key)
+        if frame is not None:
+            return frame
+        frame = self.backend.decode(input_path)
+        if frame is not None and frame.metadata is not None:
+            self.cache.put(key, frame)
+        return frame
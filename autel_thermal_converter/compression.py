@@ -0,0 +1,206 @@
+"""TIFF compression codecs and the horizontal predictor.
+
+Deflate uses the standard library. ZSTD needs the optional `zstandard`
+package (or Python 3.14's `compression.zstd`). LZW is implemented here, so
+no external codec library is required, but in pure Python it takes over a
+second per 640x512 4-band frame in each direction. When `imagecodecs` is
+installed it is used for both, which makes LZW about as fast as Deflate.
+Reading the DLL's own TIFFs (LZW) is just as slow without it.
+"""
+import zlib
+
+import numpy as np
+
+# TIFF Compression tag values
+COMPRESSION_NONE = 1
+COMPRESSION_LZW = 5
+COMPRESSION_DEFLATE = 8        # "Adobe Deflate"
+COMPRESSION_DEFLATE_OLD = 32946
+COMPRESSION_ZSTD = 50000       # libtiff / GDAL extension
+
+COMPRESSION_CODES = {
+    "none": COMPRESSION_NONE,
+    "lzw": COMPRESSION_LZW,
+    "deflate": COMPRESSION_DEFLATE,
+    "zstd": COMPRESSION_ZSTD,
+}
+
+# TIFF Predictor tag values
+PREDICTOR_NONE = 1
+PREDICTOR_HORIZONTAL = 2
+
+_LZW_CLEAR = 256
+_LZW_EOI = 257
+_LZW_FIRST = 258
+_LZW_MAX_CODE = 4094
+
+def _zstd_module():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        pass
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd
+    except ImportError:
+        raise ImportError("ZSTD compression requires the 'zstandard' package (pip install zstandard)") from None
+
+def _fast_lzw_decode():
+    try:
+        from imagecodecs import lzw_decode
+        return lzw_decode
+    except ImportError:
+        return None
+
+def _fast_lzw_encode():
+    try:
+        from imagecodecs import lzw_encode
+        return lzw_encode
+    except ImportError:
+        return None
+
+def has_fast_lzw() -> bool:
+    """True if LZW goes through imagecodecs instead of the pure-Python codec."""
+    return _fast_lzw_decode() is not None
+
+def lzw_encode(data: bytes) -> bytes:
+    """TIFF-flavoured LZW: MSB-first codes of 9-12 bits, with libtiff's width switching."""
+    out = bytearray()
+    bit_buffer = 0
+    bit_count = 0
+    width = 9
+
+    table = {}
+    next_code = _LZW_FIRST
+
+    def emit(code):
+        nonlocal bit_buffer, bit_count
+        bit_buffer = (bit_buffer << width) | code
+        bit_count += width
+        while bit_count >= 8:
+            bit_count -= 8
+            out.append((bit_buffer >> bit_count) & 0xFF)
+        bit_buffer &= (1 << bit_count) - 1
+
+    emit(_LZW_CLEAR)
+    if not data:
+        emit(_LZW_EOI)
+        if bit_count:
+            out.append((bit_buffer << (8 - bit_count)) & 0xFF)
+        return bytes(out)
+
+    prefix = data[0]
+    for byte in memoryview(data)[1:]:
+        key = (prefix << 8) | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix)
+        table[key] = next_code
+        next_code += 1
+        if next_code == _LZW_MAX_CODE:
+            emit(_LZW_CLEAR)
+            table.clear()
+            next_code = _LZW_FIRST
+            width = 9
+        elif next_code > (1 << width) - 1:
+            width += 1
+        prefix = byte
+
+    emit(prefix)
+    # The decoder adds one more entry after this code, so it may read EOI wider
+    next_code += 1
+    if next_code == _LZW_MAX_CODE:
+        emit(_LZW_CLEAR)
+        width = 9
+    elif next_code > (1 << width) - 1:
+        width += 1
+    emit(_LZW_EOI)
+    if bit_count:
+        out.append((bit_buffer << (8 - bit_count)) & 0xFF)
+    return bytes(out)
+
+def lzw_decode(data: bytes) -> bytes:
+    """Inverse of lzw_encode; also reads LZW strips written by libtiff/OpenCV."""
+    out = bytearray()
+    table = [bytes([i]) for i in range(256)] + [b'', b'']
+    width = 9
+    position = 0
+    total_bits = len(data) * 8
+    previous = None
+
+    # Pad so reading the last code never runs off the end
+    padded = bytes(data) + b'\0\0\0'
+    while position + width <= total_bits:
+        byte_index = position >> 3
+        chunk = int.from_bytes(padded[byte_index:byte_index + 3], 'big')
+        code = (chunk >> (24 - width - (position & 7))) & ((1 << width) - 1)
+        position += width
+
+        if code == _LZW_EOI:
+            break
+        if code == _LZW_CLEAR:
+            del table[_LZW_FIRST:]
+            width = 9
+            previous = None
+            continue
+
+        if code < len(table):
+            entry = table[code]
+            if previous is not None:
+                table.append(previous + entry[:1])
+        elif previous is not None:
+            entry = previous + previous[:1]
+            table.append(entry)
+        else:
+            raise ValueError("Corrupt LZW stream")
+        out += entry
+        previous = entry
+
+        if len(table) >= (1 << width) - 1 and width < 12:
+            width += 1
+    return bytes(out)
+
+def compress(data: bytes, compression: int, level: int = 6) -> bytes:
+    if compression == COMPRESSION_NONE:
+        return data
+    if compression == COMPRESSION_DEFLATE:
+        return zlib.compress(data, level)
+    if compression == COMPRESSION_LZW:
+        fast = _fast_lzw_encode()
+        return fast(data) if fast is not None else lzw_encode(data)
+    if compression == COMPRESSION_ZSTD:
+        zstd = _zstd_module()
+        if zstd.__name__ == 'zstandard':
+            return zstd.ZstdCompressor(level=level).compress(data)
+        # compression.zstd: ZstdCompressor.compress() would leave the frame unflushed
+        return zstd.compress(data, level=level)
+    raise ValueError(f"Unsupported TIFF compression {compression}")
+
+def decompress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_NONE:
+        return data
+    if compression in (COMPRESSION_DEFLATE, COMPRESSION_DEFLATE_OLD):
+        return zlib.decompress(data)
+    if compression == COMPRESSION_LZW:
+        fast = _fast_lzw_decode()
+        return fast(data) if fast is not None else lzw_decode(data)
+    if compression == COMPRESSION_ZSTD:
+        zstd = _zstd_module()
+        if zstd.__name__ == 'zstandard':
+            return zstd.ZstdDecompressor().decompress(data)
+        return zstd.decompress(data)
+    raise ValueError(f"Unsupported TIFF compression {compression}")
+
+def predictor_encode(chunk: np.ndarray) -> np.ndarray:
+    """Horizontal differencing of an (rows, cols[, samples]) chunk, per sample, with wraparound."""
+    diff = chunk.copy()
+    diff[:, 1:] -= chunk[:, :-1]
+    return diff
+
+def predictor_decode(chunk: np.ndarray) -> np.ndarray:
+    """Undoes predictor_encode in place."""
+    np.cumsum(chunk, axis=1, dtype=chunk.dtype, out=chunk)
+    return chunk
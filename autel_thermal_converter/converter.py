@@ -4,11 +4,28 @@ import json
 from pathlib import Path
 import sys
 
+import numpy as np
+
+from .encoding import ENCODED_LEVELS, band_histogram
+from .profiling import StageTimer, TimingHooks, file_size
+
+# Radiometric resolution of the Autel thermal sensor
+THERMAL_WIDTH = 640
+THERMAL_HEIGHT = 512
+
+DLL_NAME = 'ir_converter.dll'
+SDK_DLL_NAME = 'AutelIrTempParserSDK.dll'
+# Names of the CMake build against the stub SDK (synthetic temperatures), used when present off Windows
+SO_NAME = 'libir_converter.so'
+SDK_SO_NAME = 'libAutelIrTempParserSDK.so'
+
 def _get_dll_path():
     # Helper to find the DLL within the package
     base_path = os.path.dirname(os.path.abspath(__file__))
     dll_dir = os.path.join(base_path, 'libs')
-    dll_path = os.path.join(dll_dir, 'ir_converter.dll')
+    dll_path = os.path.join(dll_dir, DLL_NAME)
+    if os.name != 'nt' and os.path.exists(os.path.join(dll_dir, SO_NAME)):
+        return os.path.join(dll_dir, SO_NAME)
     
     # On Windows, we need to add the directory to the DLL search path
     # so dependencies (Autel SDK, OpenCV) can be found.
@@ -23,30 +40,166 @@ def _get_dll_path():
 
     return dll_path
 
-class ThermalConverter:
-    def __init__(self):
+def sdk_dll_path():
+    """Path of the Autel SDK DLL shipped next to ir_converter.dll (or of the stub SDK next to the .so)."""
+    dll_path = _get_dll_path()
+    name = SDK_SO_NAME if dll_path.endswith(SO_NAME) else SDK_DLL_NAME
+    return os.path.join(os.path.dirname(dll_path), name)
+
+METADATA_BUFFER_SIZE = 1024 * 20 # 20KB
+
+def _parse_metadata(buffer) -> dict:
+    try:
+        return json.loads(buffer.value.decode('utf-8'))
+    except json.JSONDecodeError:
+        return None
+
+class _ConversionTimings(ctypes.Structure):
+    # Mirrors struct ConversionTimings in lib_ir_converter.cpp
+    _fields_ = [
+        ("read_ms", ctypes.c_double),
+        ("decode_ms", ctypes.c_double),
+        ("encode_ms", ctypes.c_double),
+        ("write_ms", ctypes.c_double),
+        ("metadata_ms", ctypes.c_double),
+        ("input_bytes", ctypes.c_int64),
+        ("output_bytes", ctypes.c_int64),
+    ]
+
+    def as_dict(self) -> dict:
+        stages = {name: getattr(self, f"{name}_ms") / 1e3 for name in ("read", "decode", "encode", "write", "metadata")}
+        return {"stages": stages, "input_bytes": self.input_bytes, "output_bytes": self.output_bytes}
+
+def _prepare_buffer(out, dtype, shape=(THERMAL_HEIGHT, THERMAL_WIDTH)):
+    # Allocate (or validate) the row-major buffer the DLL fills in place
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if out.shape != shape or out.dtype != dtype or not out.flags['C_CONTIGUOUS'] or not out.flags['WRITEABLE']:
+        raise ValueError(f"out must be a writeable C-contiguous {np.dtype(dtype).name} array of shape {shape}")
+    return out
+
+class ThermalConverter(TimingHooks):
+    # Encoded-value counts of the last convert_with_metadata, with collect_histogram
+    last_histogram = None
+    # PNG thumbnails of the last convert_with_metadata, with previews
+    last_thumbnails = None
+    # Per-file timings and histograms of the last convert_many (None where a file failed)
+    last_batch_timings = None
+    last_histograms = None
+
+    def __init__(self, cache=None, tiff_options=None, histogram: bool = False, previews=None, exif: bool = False):
+        """Locates the DLL; it is loaded on first use (see `lib`).
+
+        With a DecodeCache as `cache`, convert_image, convert_with_metadata,
+        get_metadata and read_temperature share decoded frames through it:
+        the SDK decodes each distinct file once and the band encoding runs in
+        NumPy (same output as the DLL).
+
+        With non-default TiffOptions as `tiff_options` (compression, tiling,
+        BigTIFF, thermal-only), the DLL only decodes and the TIFF is written
+        by the NumPy writer.
+
+        convert_with_metadata records per-stage timings in `last_timings` and
+        passes them to hooks added with `add_timing_hook` (see profiling).
+        With `histogram`, it also keeps the 65536-bin histogram of the encoded
+        thermal band in `last_histogram` (see normalize).
+
+        PreviewOptions as `previews` (thumbnails, see preview) also make the
+        DLL only decode: thumbnails are rendered from the bands in memory.
+        So does `exif`, which writes the EXIF, GPS and XMP metadata of the
+        source JPG into the TIFF (see exif); cv::imwrite cannot write them.
+        """
         self.dll_path = _get_dll_path()
         if not os.path.exists(self.dll_path):
             raise FileNotFoundError(f"DLL not found at {self.dll_path}")
+        self._lib = None
+        self._has_timed_convert = False
+        self._has_histogram_convert = False
+        self._has_batch_convert = False
+        self._exports = set()
+        self.collect_histogram = histogram
+        self.previews = previews
+        self.exif = exif
+
+        self.cache = cache
+        self.tiff_options = tiff_options
+        self._backend_converter = None
+        self._frame_writer = None
+        numpy_output = previews is not None or exif or (tiff_options is not None and not tiff_options.is_default)
+        if cache is not None or numpy_output:
+            from .backends import BackendConverter, SDKBackend
+            self._backend_converter = BackendConverter(SDKBackend(self), cache=cache, tiff_options=tiff_options,
+                                                       histogram=histogram, previews=previews, exif=exif)
+
+    @property
+    def lib(self):
+        """The ctypes handle of ir_converter.dll, loaded (with the SDK and OpenCV) on first access."""
+        if self._lib is None:
+            try:
+                # On Linux (or non-Windows), CDLL might behave differently, 
+                # but these DLLs are Windows binaries.
+                # If running via Wine or similar, this might work if configured correctly.
+                lib = ctypes.CDLL(self.dll_path)
+            except OSError as e:
+                raise OSError(f"Failed to load DLL: {e}. \nEnsure you are on Windows or have a compatible environment (Wine). \nDLL Path: {self.dll_path}") from e
+            self._setup_signatures(lib)
+            self._lib = lib
+        return self._lib
+
+    def _export(self, name: str):
+        """An optional export of the DLL, or a RuntimeError saying the DLL needs rebuilding."""
+        lib = self.lib
+        if name not in self._exports:
+            raise RuntimeError(f"{os.path.basename(self.dll_path)} does not export {name}: it is older than this "
+                               "package. Rebuild it from src/ (see 'Build the DLL' in the README).")
+        return getattr(lib, name)
+
+    def load(self):
+        """Loads the DLL now instead of on first use (e.g. to warm up a worker). Returns self."""
+        self.lib
+        return self
+
+    def _setup_signatures(self, lib):
+        lib.ConvertToTiff.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
+        lib.ConvertToTiff.restype = ctypes.c_int
         
-        try:
-            # On Linux (or non-Windows), CDLL might behave differently, 
-            # but these DLLs are Windows binaries.
-            # If running via Wine or similar, this might work if configured correctly.
-            self.lib = ctypes.CDLL(self.dll_path)
-            self._setup_signatures()
-        except OSError as e:
-            raise OSError(f"Failed to load DLL: {e}. \nEnsure you are on Windows or have a compatible environment (Wine). \nDLL Path: {self.dll_path}") from e
-
-    def _setup_signatures(self):
-        self.lib.ConvertToTiff.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
-        self.lib.ConvertToTiff.restype = ctypes.c_int
-        
-        self.lib.GetMetadataJSON.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
-        self.lib.GetMetadataJSON.restype = ctypes.c_int
+        lib.GetMetadataJSON.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        lib.GetMetadataJSON.restype = ctypes.c_int
+
+        # Exports added after the first release; an older DLL lacks some of them
+        optional = {
+            'ConvertWithMetadata': ([ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int], ctypes.c_int),
+            'GetTemperatureData': ([ctypes.c_char_p, ctypes.POINTER(ctypes.c_float), ctypes.c_int, ctypes.c_int], ctypes.c_int),
+            'GetRawTempBuffer': ([ctypes.c_char_p, ctypes.POINTER(ctypes.c_int16), ctypes.c_int, ctypes.c_int], ctypes.c_int),
+            'DecodeFrame': ([ctypes.c_char_p, ctypes.POINTER(ctypes.c_float), ctypes.POINTER(ctypes.c_uint8), ctypes.c_char_p, ctypes.c_int], ctypes.c_int),
+        }
+        self._exports = set()
+        for name, (argtypes, restype) in optional.items():
+            if hasattr(lib, name):
+                getattr(lib, name).argtypes = argtypes
+                getattr(lib, name).restype = restype
+                self._exports.add(name)
+
+        # Older builds of the DLL do not export the timed variant
+        self._has_timed_convert = hasattr(lib, 'ConvertWithMetadataTimed')
+        if self._has_timed_convert:
+            lib.ConvertWithMetadataTimed.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int, ctypes.POINTER(_ConversionTimings)]
+            lib.ConvertWithMetadataTimed.restype = ctypes.c_int
+        self._has_histogram_convert = hasattr(lib, 'ConvertWithMetadataHistogram')
+        if self._has_histogram_convert:
+            lib.ConvertWithMetadataHistogram.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int, ctypes.POINTER(_ConversionTimings), ctypes.POINTER(ctypes.c_uint32)]
+            lib.ConvertWithMetadataHistogram.restype = ctypes.c_int
+        self._has_batch_convert = hasattr(lib, 'ConvertBatch')
+        if self._has_batch_convert:
+            lib.ConvertBatch.argtypes = [ctypes.POINTER(ctypes.c_char_p), ctypes.POINTER(ctypes.c_char_p), ctypes.c_int,
+                                         ctypes.POINTER(ctypes.c_int), ctypes.c_char_p, ctypes.c_int,
+                                         ctypes.POINTER(_ConversionTimings), ctypes.POINTER(ctypes.c_uint32)]
+            lib.ConvertBatch.restype = ctypes.c_int
 
     def convert_image(self, input_path: str, output_path: str) -> bool:
         """Converts a single JPG to TIFF. Returns True on success."""
+        if self._backend_converter is not None:
+            return self._backend_converter.convert_image(input_path, output_path)
         if not os.path.exists(input_path):
             print(f"Error: File not found {input_path}")
             return False
@@ -59,17 +212,263 @@ class ThermalConverter:
 
     def get_metadata(self, input_path: str) -> dict:
         """Extracts metadata from JPG. Returns dict or None."""
+        if self._backend_converter is not None:
+            return self._backend_converter.get_metadata(input_path)
         if not os.path.exists(input_path):
             return None
             
         b_in = str(input_path).encode('utf-8')
-        buffer_size = 1024 * 20 # 20KB
-        buffer = ctypes.create_string_buffer(buffer_size)
+        buffer = ctypes.create_string_buffer(METADATA_BUFFER_SIZE)
         
-        res = self.lib.GetMetadataJSON(b_in, buffer, buffer_size)
+        res = self.lib.GetMetadataJSON(b_in, buffer, METADATA_BUFFER_SIZE)
         if res == 0:
-            try:
-                return json.loads(buffer.value.decode('utf-8'))
-            except json.JSONDecodeError:
-                return None
+            return _parse_metadata(buffer)
         return None
+
+    def convert_with_metadata(self, input_path: str, output_path: str) -> tuple:
+        """Converts a JPG to TIFF and extracts its metadata from a single SDK decode.
+
+        Returns (success, metadata). metadata is None if the conversion failed
+        or the JSON could not be produced.
+        """
+        if self._backend_converter is not None:
+            result = self._backend_converter.convert_with_metadata(input_path, output_path)
+            self.last_histogram = self._backend_converter.last_histogram
+            self.last_thumbnails = self._backend_converter.last_thumbnails
+            self._emit_timings(input_path, output_path, self._backend_converter.last_timings)
+            return result
+        self.last_timings = None
+        self.last_histogram = None
+        if not os.path.exists(input_path):
+            print(f"Error: File not found {input_path}")
+            return False, None
+
+        b_in = str(input_path).encode('utf-8')
+        b_out = str(output_path).encode('utf-8')
+        buffer = ctypes.create_string_buffer(METADATA_BUFFER_SIZE)
+
+        lib = self.lib
+        if self.collect_histogram and self._has_histogram_convert:
+            timings = _ConversionTimings()
+            histogram = np.empty(ENCODED_LEVELS, dtype=np.uint32)
+            res = lib.ConvertWithMetadataHistogram(b_in, b_out, buffer, METADATA_BUFFER_SIZE, ctypes.byref(timings),
+                                                   histogram.ctypes.data_as(ctypes.POINTER(ctypes.c_uint32)))
+            if res in (0, -4):
+                self.last_histogram = histogram
+                self._emit_timings(input_path, output_path, timings.as_dict())
+        elif self._has_timed_convert:
+            timings = _ConversionTimings()
+            res = lib.ConvertWithMetadataTimed(b_in, b_out, buffer, METADATA_BUFFER_SIZE, ctypes.byref(timings))
+            if res in (0, -4):
+                self._emit_timings(input_path, output_path, timings.as_dict())
+        else:
+            timer = StageTimer()
+            with timer.stage("convert"):
+                if 'ConvertWithMetadata' in self._exports:
+                    res = lib.ConvertWithMetadata(b_in, b_out, buffer, METADATA_BUFFER_SIZE)
+                else:
+                    res = self._convert_then_read_metadata(lib, b_in, b_out, buffer)
+            if res in (0, -4):
+                timer.input_bytes = file_size(input_path)
+                timer.output_bytes = file_size(output_path)
+                self._emit_timings(input_path, output_path, timer.as_dict())
+        if res in (0, -4) and self.collect_histogram and self.last_histogram is None:
+            self.last_histogram = self._fallback_histogram(input_path, output_path)
+        if res == 0:
+            return True, _parse_metadata(buffer)
+        if res == -4:
+            # TIFF was written but the JSON did not fit in the buffer
+            return True, None
+        return False, None
+
+    @staticmethod
+    def _convert_then_read_metadata(lib, b_in, b_out, buffer) -> int:
+        # The first DLL release: two calls, so the SDK decodes the file twice
+        res = lib.ConvertToTiff(b_in, b_out)
+        if res != 0:
+            return res
+        return 0 if lib.GetMetadataJSON(b_in, buffer, METADATA_BUFFER_SIZE) == 0 else -4
+
+    def _fallback_histogram(self, input_path: str, output_path: str) -> np.ndarray:
+        """Band histogram for an older DLL without the histogram export, counted from the TIFF it just wrote.
+
+        The TIFF is LZW: cheap to read back with imagecodecs, over a second
+        per frame with the pure-Python decoder (see `rereads_output_for_histogram`).
+        """
+        from .tiff import read_thermal_band
+        return band_histogram(read_thermal_band(output_path, mmap=True))
+
+    @property
+    def rereads_output_for_histogram(self) -> bool:
+        """True if `histogram` counts each TIFF by reading it back (DLL without ConvertWithMetadataHistogram)."""
+        if not self.collect_histogram or self._backend_converter is not None:
+            return False
+        self.lib  # the export check runs when the DLL is loaded
+        return not self._has_histogram_convert
+
+    @property
+    def batches_natively(self) -> bool:
+        """True if convert_many converts a whole batch in one DLL call (ConvertBatch).
+
+        False with the NumPy encoding (cache, TiffOptions, previews, exif) or
+        an older DLL; convert_many then converts file by file.
+        """
+        if self._backend_converter is not None:
+            return False
+        self.lib  # the export check runs when the DLL is loaded
+        return self._has_batch_convert
+
+    def convert_many(self, pairs) -> list:
+        """Converts (input_path, output_path) pairs with one call into the DLL.
+
+        ConvertBatch reuses one set of buffers for the whole batch and returns a
+        status per file, so a bad file only fails itself. Returns a
+        (success, metadata) tuple per pair, as convert_with_metadata does.
+        Per-file timings (also passed to the timing hooks) are kept in
+        `last_batch_timings` and, with `histogram`, the encoded-value counts in
+        `last_histograms`; both hold None for failed files.
+        """
+        pairs = [(str(i), str(o)) for i, o in pairs]
+        if not self.batches_natively:
+            results, timings, histograms = [], [], []
+            for input_path, output_path in pairs:
+                success, meta = self.convert_with_metadata(input_path, output_path)
+                results.append((success, meta))
+                timings.append(self.last_timings if success else None)
+                histograms.append(self.last_histogram if success else None)
+            self.last_batch_timings, self.last_histograms = timings, histograms
+            return results
+
+        count = len(pairs)
+        self.last_batch_timings = [None] * count
+        self.last_histograms = [None] * count
+        if count == 0:
+            return []
+        inputs = (ctypes.c_char_p * count)(*(i.encode('utf-8') for i, _ in pairs))
+        outputs = (ctypes.c_char_p * count)(*(o.encode('utf-8') for _, o in pairs))
+        statuses = (ctypes.c_int * count)()
+        buffer = ctypes.create_string_buffer(METADATA_BUFFER_SIZE * count)
+        timings = (_ConversionTimings * count)()
+        histograms = None
+        histogram_ptr = None
+        if self.collect_histogram:
+            histograms = np.empty((count, ENCODED_LEVELS), dtype=np.uint32)
+            histogram_ptr = histograms.ctypes.data_as(ctypes.POINTER(ctypes.c_uint32))
+
+        self.lib.ConvertBatch(inputs, outputs, count, statuses, buffer, METADATA_BUFFER_SIZE, timings, histogram_ptr)
+
+        raw = buffer.raw
+        results = []
+        for k, (input_path, output_path) in enumerate(pairs):
+            res = statuses[k]
+            if res not in (0, -4):
+                results.append((False, None))
+                continue
+            meta = None
+            if res == 0:
+                # Each document is NUL-terminated within its METADATA_BUFFER_SIZE slot
+                start = k * METADATA_BUFFER_SIZE
+                document = raw[start:raw.index(b'\0', start, start + METADATA_BUFFER_SIZE)]
+                try:
+                    meta = json.loads(document.decode('utf-8'))
+                except json.JSONDecodeError:
+                    meta = None
+            if histograms is not None:
+                self.last_histograms[k] = histograms[k]
+            self.last_batch_timings[k] = timings[k].as_dict()
+            self._emit_timings(input_path, output_path, self.last_batch_timings[k])
+            results.append((True, meta))
+        return results
+
+    def read_temperature(self, input_path: str, out: np.ndarray = None) -> np.ndarray:
+        """Decodes the temperature grid of a JPG into a (512, 640) float32 array in °C.
+
+        Invalid pixels (NaN, inf, >= 60000) are set to -273.15, as in the TIFF.
+        Pass a preallocated array as `out` to avoid allocating on every call.
+        Returns the filled array or None on failure.
+        """
+        if self._backend_converter is not None:
+            return self._backend_converter.read_temperature(input_path, out)
+        if not os.path.exists(input_path):
+            return None
+
+        out = _prepare_buffer(out, np.float32)
+        b_in = str(input_path).encode('utf-8')
+        ptr = out.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
+
+        res = self._export('GetTemperatureData')(b_in, ptr, THERMAL_WIDTH, THERMAL_HEIGHT)
+        return out if res == 0 else None
+
+    def read_raw(self, input_path: str, out: np.ndarray = None) -> np.ndarray:
+        """Reads the SDK's raw temperature data of a JPG into a (512, 640) int16 array.
+
+        Pass a preallocated array as `out` to avoid allocating on every call.
+        Returns the filled array or None on failure.
+        """
+        if not os.path.exists(input_path):
+            return None
+
+        out = _prepare_buffer(out, np.int16)
+        b_in = str(input_path).encode('utf-8')
+        ptr = out.ctypes.data_as(ctypes.POINTER(ctypes.c_int16))
+
+        res = self._export('GetRawTempBuffer')(b_in, ptr, THERMAL_WIDTH, THERMAL_HEIGHT)
+        return out if res == 0 else None
+
+    def decode_frame(self, input_path: str, temperature: np.ndarray = None, rgb: np.ndarray = None) -> tuple:
+        """Decodes a JPG once into (temperature, rgb, metadata) without writing anything.
+
+        temperature is the raw (512, 640) float32 SDK grid in °C (not sanitized),
+        rgb is the (512, 640, 3) uint8 visual image in R, G, B order, and metadata
+        is the GetMetadataJSON dict. Preallocated arrays may be passed in.
+        Returns None on failure.
+        """
+        if not os.path.exists(input_path):
+            return None
+
+        temperature = _prepare_buffer(temperature, np.float32)
+        rgb = _prepare_buffer(rgb, np.uint8, (THERMAL_HEIGHT, THERMAL_WIDTH, 3))
+        b_in = str(input_path).encode('utf-8')
+        buffer = ctypes.create_string_buffer(METADATA_BUFFER_SIZE)
+
+        res = self._export('DecodeFrame')(
+            b_in,
+            temperature.ctypes.data_as(ctypes.POINTER(ctypes.c_float)),
+            rgb.ctypes.data_as(ctypes.POINTER(ctypes.c_uint8)),
+            buffer,
+            METADATA_BUFFER_SIZE,
+        )
+        if res == 0:
+            return temperature, rgb, _parse_metadata(buffer)
+        if res == -4:
+            return temperature, rgb, None
+        return None
+
+    def convert_frame(self, frame, input_path: str, output_path: str) -> tuple:
+        """Writes the TIFF of a frame returned by `decode`, without decoding the file again.
+
+        The NumPy writer encodes it (same output as the DLL, and the same
+        tiff_options, previews and exif). Returns (True, metadata).
+        """
+        writer = self._backend_converter
+        if writer is None:
+            if self._frame_writer is None:
+                from .backends import BackendConverter, SDKBackend
+                self._frame_writer = BackendConverter(SDKBackend(self), tiff_options=self.tiff_options,
+                                                      histogram=self.collect_histogram)
+            writer = self._frame_writer
+        result = writer.convert_frame(frame, input_path, output_path)
+        self.last_histogram = writer.last_histogram
+        self.last_thumbnails = writer.last_thumbnails
+        self._emit_timings(input_path, output_path, writer.last_timings)
+        return result
+
+    def decode(self, input_path: str):
+        """Decodes a JPG once into a backends.DecodedFrame (temperature, rgb, metadata).
+
+        Goes through the decode cache when one is configured. Returns None on failure.
+        """
+        if self._backend_converter is not None:
+            return self._backend_converter.decode(input_path)
+        from .backends import SDKBackend
+        return SDKBackend(self).decode(input_path)
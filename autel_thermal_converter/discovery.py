@@ -0,0 +1,121 @@
+"""Streaming, recursive input discovery with deterministic sharding.
+
+`iter_inputs` walks a folder tree with os.scandir and yields matching files
+as it finds them, so conversion starts immediately even on archives with
+millions of files. Each directory's entries are sorted, which makes the
+order deterministic without ever sorting the whole tree.
+
+Patterns are case-insensitive fnmatch patterns. A pattern without a "/" is
+matched against the file name; one with a "/" against the path relative to
+the root (e.g. "mission_*/2024-*/*.jpg"). Excluded directories are not
+descended into.
+
+With `shard=(i, N)` only files whose relative path hashes to i (mod N) are
+yielded. The hash depends only on the relative path, so N machines given
+the same tree (mounted anywhere) split it into disjoint shards that cover
+everything, with no coordination.
+"""
+import fnmatch
+import hashlib
+import os
+from pathlib import Path
+
+DEFAULT_INCLUDE = ("*.jpg", "*.jpeg")
+FIXTURE_INCLUDE = ("*.npz",)
+
+def parse_shard(text: str) -> tuple:
+    """Parses "i/N" (0 <= i < N) into (i, N)."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{text}': expected i/N, e.g. 0/4") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{text}': need 0 <= i < N")
+    return index, count
+
+def shard_tag(shard: tuple) -> str:
+    """File name tag of a shard, e.g. "shard-0-of-4"."""
+    return f"shard-{shard[0]}-of-{shard[1]}"
+
+def shard_of(relative_path: str, count: int) -> int:
+    """Stable shard number of a relative path (POSIX separators)."""
+    digest = hashlib.blake2b(relative_path.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+def _matches(name: str, relative: str, patterns) -> bool:
+    name = name.lower()
+    relative = relative.lower()
+    for pattern in patterns:
+        target = relative if "/" in pattern else name
+        if fnmatch.fnmatchcase(target, pattern):
+            return True
+    return False
+
+def iter_inputs(root, recursive: bool = False, include=DEFAULT_INCLUDE, exclude=(), shard: tuple = None):
+    """Yields (path, relative_path) of every matching file under `root`, in a deterministic order.
+
+    `relative_path` uses "/" separators on every platform.
+    """
+    root = Path(root)
+    include = [p.lower() for p in include]
+    exclude = [p.lower() for p in exclude]
+    # Directories still to visit, as relative paths; popped depth-first
+    pending = [""]
+    while pending:
+        relative_dir = pending.pop()
+        try:
+            with os.scandir(root / relative_dir if relative_dir else root) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue  # unreadable or vanished directory
+
+        subdirs = []
+        for entry in entries:
+            relative = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if recursive and not _matches(entry.name, relative, exclude):
+                    subdirs.append(relative)
+                continue
+            if not _matches(entry.name, relative, include) or _matches(entry.name, relative, exclude):
+                continue
+            if shard is not None and shard_of(relative, shard[1]) != shard[0]:
+                continue
+            yield Path(entry.path), relative
+        # Files of a directory come before its subdirectories, which are visited in name order
+        pending.extend(reversed(subdirs))
+
+def iter_listed(root, list_file, shard: tuple = None):
+    """Yields (path, relative_path) of the files listed in `list_file`, one per line (e.g. from `locate`).
+
+    Relative lines are relative to `root`. Lines are normalised ("a/./b",
+    "a/../b"), and files that end up outside `root` (absolute or "../x") are
+    skipped, since outputs mirror their location under it.
+    """
+    root = Path(root)
+    resolved_root = root.resolve()
+    with open(list_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            path = Path(os.path.normpath(line))
+            if path.is_absolute():
+                try:
+                    path = path.relative_to(resolved_root)
+                except ValueError:
+                    continue
+            relative = path.as_posix()
+            if relative == '.' or relative == '..' or relative.startswith('../'):
+                continue
+            if shard is not None and shard_of(relative, shard[1]) != shard[0]:
+                continue
+            yield root / path, relative
+
+def output_path_for(output_dir, relative_path: str, suffix: str = ".tif") -> Path:
+    """Output file mirroring the input's relative location: a/b/IRX_1.JPG -> OUTPUT/a/b/IRX_1.tif."""
+    relative = Path(relative_path)
+    return Path(output_dir) / relative.parent / f"{relative.stem}{suffix}"
@@ -0,0 +1,113 @@
+"""Vectorized port of the band encoding done by ConvertToTiff in lib_ir_converter.cpp.
+
+Every function here produces output bit-identical to the C++ loop:
+
+    tempVal = sanitizeTemp(t)
+    encoded = clamp(tempVal * 100 + 10000, 0, 65535)
+    pixel   = (uint16)(encoded + 0.5)
+
+All arithmetic is done in float32, like the C++ code, so rounding matches.
+"""
+import numpy as np
+
+ENCODING_SCALE = np.float32(100.0)
+ENCODING_OFFSET = np.float32(10000.0)
+
+# sanitizeTemp(): NaN, inf and values >= 60000 are replaced with this
+INVALID_TEMPERATURE = np.float32(-273.15)
+INVALID_THRESHOLD = np.float32(60000.0)
+
+# Bump whenever the encoding changes, so cached or stored data is invalidated
+ENCODING_VERSION = 1
+
+def sanitize_temperature(temperature, out=None) -> np.ndarray:
+    """Vectorized sanitizeTemp(): returns float32 temperatures with invalid pixels set to -273.15."""
+    temperature = np.asarray(temperature)
+    if out is None:
+        out = np.array(temperature, dtype=np.float32, copy=True)
+    elif out is not temperature:
+        np.copyto(out, temperature, casting='same_kind')
+
+    invalid = ~np.isfinite(out)
+    invalid |= out >= INVALID_THRESHOLD
+    out[invalid] = INVALID_TEMPERATURE
+    return out
+
+def encode_temperature(temperature, out=None) -> np.ndarray:
+    """Encodes °C values into the uint16 thermal band: round((T * 100) + 10000), clamped to 0-65535."""
+    work = sanitize_temperature(temperature)
+    work *= ENCODING_SCALE
+    work += ENCODING_OFFSET
+    np.clip(work, np.float32(0.0), np.float32(65535.0), out=work)
+    work += np.float32(0.5)
+
+    if out is None:
+        return work.astype(np.uint16)
+    # Float -> uint16 conversion truncates, like static_cast<uint16_t>
+    np.copyto(out, work, casting='unsafe')
+    return out
+
+def decode_temperature(encoded, out=None, invalid_nan: bool = False) -> np.ndarray:
+    """Decodes the uint16 thermal band back to float32 °C: (pixel - 10000) / 100.
+
+    With `invalid_nan`, pixels encoded as 0 (the -273.15 sentinel, clamped)
+    are NaN instead of -100 °C.
+    """
+    encoded = np.asarray(encoded)
+    if out is None:
+        out = np.empty(encoded.shape, dtype=np.float32)
+    np.subtract(encoded, ENCODING_OFFSET, out=out, dtype=np.float32)
+    out /= ENCODING_SCALE
+    if invalid_nan:
+        out[encoded == 0] = np.nan
+    return out
+
+def scale_rgb(rgb, out=None) -> np.ndarray:
+    """Scales 8-bit RGB to 16-bit like convertTo(CV_16U, 257.0): 0-255 -> 0-65535."""
+    rgb = np.asarray(rgb)
+    if rgb.dtype != np.uint8:
+        raise ValueError(f"RGB data must be uint8, got {rgb.dtype}")
+    if out is None:
+        out = np.empty(rgb.shape, dtype=np.uint16)
+    np.multiply(rgb, np.uint16(257), out=out, dtype=np.uint16)
+    return out
+
+def assemble_bands(rgb, thermal_band, out=None) -> np.ndarray:
+    """Merges (H, W, 3) uint8 RGB and the (H, W) encoded thermal band into (H, W, 4) uint16.
+
+    Replaces the split -> convertTo -> merge sequence of the C++ code. The
+    RGB channels are expected in R, G, B order, which is the band order of the
+    TIFFs the DLL writes.
+    """
+    height, width = thermal_band.shape
+    if rgb.shape != (height, width, 3):
+        raise ValueError(f"RGB shape {rgb.shape} does not match thermal band shape {thermal_band.shape}")
+    if out is None:
+        out = np.empty((height, width, 4), dtype=np.uint16)
+    scale_rgb(rgb, out=out[..., :3])
+    out[..., 3] = thermal_band
+    return out
+
+def encode_frame(temperature, rgb, out=None) -> np.ndarray:
+    """Encodes a temperature array and an RGB array into the 4-band TIFF layout."""
+    return assemble_bands(rgb, encode_temperature(temperature), out=out)
+
+# Number of distinct encoded thermal values (bins of a full histogram)
+ENCODED_LEVELS = 65536
+
+def band_histogram(band) -> np.ndarray:
+    """Counts of every encoded value in a uint16 thermal band: an (65536,) int64 array."""
+    return np.bincount(np.asarray(band, dtype=np.uint16).ravel(), minlength=ENCODED_LEVELS)
+
+def compact_histogram(counts) -> tuple:
+    """Trims a full histogram to its occupied range: (first value, counts from there), or None if empty.
+
+    A thermal image occupies a few thousand of the 65536 bins, so this is what
+    crosses process boundaries.
+    """
+    counts = np.asarray(counts)
+    occupied = np.flatnonzero(counts)
+    if occupied.size == 0:
+        return None
+    first, last = int(occupied[0]), int(occupied[-1])
+    return first, counts[first:last + 1].astype(np.uint32)
@@ -0,0 +1,165 @@
+"""EXIF, GPS and XMP carryover from the source JPG into the output TIFF.
+
+The legacy `merge_thermal_with_exif.py` ran exiftool once per image to make a
+template TIFF, then rewrote its pixels with rasterio: two writes and a
+process per frame. Here the metadata is read from the JPG header in Python
+(only the APP segments before the image data are read) and handed to the
+TIFF writer, which puts it in the one write it already does:
+
+*   camera tags of IFD0 (Make, Model, DateTime, ...) go into the image IFD;
+*   the Exif IFD (34665) and GPS IFD (34853) are copied tag for tag, with
+    their original field types;
+*   the XMP packet (e.g. gimbal angles) goes into the XMP tag (700).
+
+Tags that only describe the JPG itself are left out: its thumbnail (IFD1),
+pixel dimensions and the interoperability IFD. The MakerNote is dropped too,
+as it usually holds offsets into the original file that would no longer be
+valid.
+"""
+import struct
+from dataclasses import dataclass, field
+
+from .tiff import BYTE, EXIF_IFD, GPS_IFD, XMP, _read_header, read_ifd_entries
+
+_SOI = b'\xff\xd8'
+_SOS = 0xDA
+_EOI = 0xD9
+_APP1 = 0xE1
+_EXIF_HEADER = b'Exif\0\0'
+_XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\0'
+
+# IFD0 tags carried over; the image structure tags are the writer's own
+IFD0_TAGS = {
+    270: "ImageDescription",
+    271: "Make",
+    272: "Model",
+    305: "Software",
+    306: "DateTime",
+    315: "Artist",
+    33432: "Copyright",
+}
+INTEROPERABILITY_IFD = 40965
+MAKER_NOTE = 37500
+PIXEL_X_DIMENSION = 40962
+PIXEL_Y_DIMENSION = 40963
+_DROPPED_EXIF_TAGS = {INTEROPERABILITY_IFD, MAKER_NOTE, PIXEL_X_DIMENSION, PIXEL_Y_DIMENSION, EXIF_IFD, GPS_IFD}
+
+# GPS IFD tags
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+GPS_ALTITUDE_REF = 5
+GPS_ALTITUDE = 6
+
+@dataclass
+class ExifData:
+    """Tags read from a JPG: {code: (type, values)} per IFD, and the raw XMP packet."""
+    image: dict = field(default_factory=dict)
+    exif: dict = field(default_factory=dict)
+    gps: dict = field(default_factory=dict)
+    xmp: bytes = None
+
+    def __bool__(self) -> bool:
+        return bool(self.image or self.exif or self.gps or self.xmp)
+
+    def tiff_tags(self) -> tuple:
+        """Returns (extra_tags, sub_ifds) for tiff.write_tiff."""
+        extra_tags = [(code, field_type, values) for code, (field_type, values) in sorted(self.image.items())]
+        if self.xmp:
+            extra_tags.append((XMP, BYTE, self.xmp))
+        sub_ifds = {}
+        if self.exif:
+            sub_ifds[EXIF_IFD] = _tag_list(self.exif)
+        if self.gps:
+            sub_ifds[GPS_IFD] = _tag_list(self.gps)
+        return extra_tags, sub_ifds
+
+    def gps_position(self) -> tuple:
+        """(latitude, longitude, altitude) in decimal degrees and meters, or None without a GPS fix.
+
+        South and west are negative; altitude is None if it was not recorded.
+        """
+        try:
+            latitude = _degrees(self.gps[GPS_LATITUDE][1], self.gps[GPS_LATITUDE_REF][1], b'S')
+            longitude = _degrees(self.gps[GPS_LONGITUDE][1], self.gps[GPS_LONGITUDE_REF][1], b'W')
+        except (KeyError, ZeroDivisionError):
+            return None
+        altitude = None
+        if GPS_ALTITUDE in self.gps:
+            numerator, denominator = self.gps[GPS_ALTITUDE][1][0]
+            if denominator:
+                altitude = numerator / denominator
+                below = self.gps.get(GPS_ALTITUDE_REF, (BYTE, (0,)))[1]
+                if below and below[0] == 1:
+                    altitude = -altitude
+        return latitude, longitude, altitude
+
+def _tag_list(entries: dict) -> list:
+    return [(code, field_type, values) for code, (field_type, values) in sorted(entries.items())]
+
+def _degrees(rationals, ref: bytes, negative: bytes) -> float:
+    degrees, minutes, seconds = (n / d for n, d in rationals)
+    value = degrees + minutes / 60 + seconds / 3600
+    return -value if ref[:1].upper() == negative else value
+
+def read_app_segments(path) -> list:
+    """Returns the (marker, payload) of the APPn segments of a JPEG, reading only its header.
+
+    Returns an empty list if the file is not a JPEG.
+    """
+    segments = []
+    with open(path, 'rb') as f:
+        if f.read(2) != _SOI:
+            return segments
+        while True:
+            head = f.read(2)
+            if len(head) < 2 or head[0] != 0xFF:
+                break
+            marker = head[1]
+            if marker == 0xFF:
+                f.seek(-1, 1)  # fill byte
+                continue
+            if marker in (_SOS, _EOI):
+                break
+            size = f.read(2)
+            if len(size) < 2:
+                break
+            length = struct.unpack('>H', size)[0] - 2
+            payload = f.read(length)
+            if 0xE0 <= marker <= 0xEF:
+                segments.append((marker, payload))
+    return segments
+
+def parse_exif(block: bytes) -> ExifData:
+    """Parses the TIFF structure of an APP1 Exif block (after the 'Exif\\0\\0' header)."""
+    byteorder, bigtiff, offset = _read_header(block)
+    ifd0, _ = read_ifd_entries(block, offset, byteorder, bigtiff)
+    data = ExifData(image={code: entry for code, entry in ifd0.items() if code in IFD0_TAGS})
+    for pointer, target in ((EXIF_IFD, "exif"), (GPS_IFD, "gps")):
+        if pointer not in ifd0:
+            continue
+        entries, _ = read_ifd_entries(block, ifd0[pointer][1][0], byteorder, bigtiff)
+        if target == "exif":
+            entries = {code: entry for code, entry in entries.items() if code not in _DROPPED_EXIF_TAGS}
+        setattr(data, target, entries)
+    return data
+
+def read_exif(path) -> ExifData:
+    """Reads the EXIF, GPS and XMP metadata of a JPG. Returns None if it has none (or is not a JPEG).
+
+    A damaged Exif block is ignored rather than failing the conversion.
+    """
+    data = ExifData()
+    for marker, payload in read_app_segments(path):
+        if marker != _APP1:
+            continue
+        if payload.startswith(_EXIF_HEADER) and not (data.image or data.exif or data.gps):
+            try:
+                exif = parse_exif(payload[len(_EXIF_HEADER):])
+            except (ValueError, struct.error, IndexError):
+                continue
+            data.image, data.exif, data.gps = exif.image, exif.exif, exif.gps
+        elif payload.startswith(_XMP_HEADER) and data.xmp is None:
+            data.xmp = payload[len(_XMP_HEADER):]
+    return data or None
@@ -0,0 +1,49 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+PARTIAL_MARKER = ".partial"
+
+def partial_path(path) -> Path:
+    """Temporary sibling of `path` used while it is being written.
+
+    The extension is kept (OpenCV picks the encoder from it) and the name is
+    hidden and tagged, so an unfinished file is never mistaken for output.
+    """
+    path = Path(path)
+    return path.with_name(f".{path.stem}.{os.getpid()}{PARTIAL_MARKER}{path.suffix}")
+
+def discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+@contextmanager
+def atomic_output(path):
+    """Yields a temporary path; renames it over `path` only if the block completes.
+
+    If the block raises, or never creates the file, `path` is left untouched.
+    """
+    tmp = partial_path(path)
+    try:
+        yield tmp
+    except BaseException:
+        discard(tmp)
+        raise
+    if os.path.exists(tmp):
+        os.replace(tmp, path)
+
+def open_append(path, **kwargs):
+    """Opens a line-oriented file for appending, first terminating a torn last line.
+
+    An interrupted run can leave a partial record without its newline; the next
+    record would otherwise be glued onto it and both would be lost.
+    """
+    path = Path(path)
+    if path.exists() and path.stat().st_size > 0:
+        with open(path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    return open(path, 'a', **kwargs)
@@ -0,0 +1,271 @@
+"""Hotspot extraction: per-frame detections instead of full TIFFs.
+
+    options = HotspotOptions(threshold=60.0)           # absolute, °C
+    options = HotspotOptions(delta=8.0, window=31)     # above the local background
+    for frame in find_hotspots(pairs, options, jobs=8):
+        frame.hotspots["peak"]                          # one row per hotspot
+
+A pixel is hot when it passes every criterion given: at least `threshold`
+°C, and/or at least `delta` °C above its local background (the mean of the
+valid pixels in a `window` x `window` box around it, from summed-area
+tables). Hot pixels are grouped into connected components (8- or
+4-connected) without a per-pixel loop: each row is reduced to runs of hot
+pixels, runs that touch in adjacent rows are paired with two searchsorted
+calls, and a vectorized union-find merges the pairs. Components smaller than
+`min_area` pixels are dropped.
+
+Each hotspot has its bounding box (inclusive), centroid, area, peak (and
+where it is), mean temperature and the mean local background. With
+`write_tiffs`, only frames with at least one hotspot get a TIFF, written
+from the same decode; the others cost a decode and the detection.
+"""
+import functools
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from . import encoding
+from .batch import convert_atomic, run_tasks
+from .converter import THERMAL_HEIGHT, THERMAL_WIDTH, ThermalConverter
+from .query import _invalid_to_nan
+
+HOTSPOTS_NAME = "hotspots.csv"
+
+HOTSPOT_DTYPE = np.dtype([
+    ("x0", np.int32), ("y0", np.int32), ("x1", np.int32), ("y1", np.int32),
+    ("cx", np.float32), ("cy", np.float32), ("area", np.int32),
+    ("peak", np.float32), ("peak_x", np.int32), ("peak_y", np.int32),
+    ("mean", np.float32), ("background", np.float32),
+])
+CSV_COLUMNS = ("frame", "id") + HOTSPOT_DTYPE.names
+
+@dataclass
+class HotspotOptions:
+    """What counts as a hotspot. Give `threshold`, `delta` or both."""
+    threshold: float = None  # °C
+    delta: float = None  # °C above the local background
+    window: int = 31  # side of the background box, pixels
+    min_area: int = 4  # pixels
+    connectivity: int = 8
+
+    def __post_init__(self):
+        if self.threshold is None and self.delta is None:
+            raise ValueError("Give a threshold, a delta above the background, or both")
+        if self.connectivity not in (4, 8):
+            raise ValueError("connectivity must be 4 or 8")
+        if self.window < 3:
+            raise ValueError("The background window must be at least 3 pixels")
+        if self.min_area < 1:
+            raise ValueError("min_area must be at least 1")
+
+def local_background(temperature: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the valid (non-NaN) pixels in the `window` x `window` box around each pixel.
+
+    Boxes are clipped at the image edges. NaN where a box has no valid pixel.
+    """
+    h, w = temperature.shape
+    valid = ~np.isnan(temperature)
+    r = window // 2
+    y0, y1 = np.clip(np.arange(h) - r, 0, h), np.clip(np.arange(h) + r + 1, 0, h)
+    x0, x1 = np.clip(np.arange(w) - r, 0, w), np.clip(np.arange(w) + r + 1, 0, w)
+
+    def box_sums(values):
+        # Separable: running sums down the columns, then along the rows
+        table = np.zeros((h + 1, w), dtype=np.float64)
+        np.cumsum(values, axis=0, dtype=np.float64, out=table[1:])
+        column_sums = table[y1] - table[y0]
+        table = np.zeros((h, w + 1), dtype=np.float64)
+        np.cumsum(column_sums, axis=1, out=table[:, 1:])
+        return table[:, x1] - table[:, x0]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (box_sums(np.where(valid, temperature, 0.0)) / box_sums(valid)).astype(np.float32)
+
+def hot_mask(temperature: np.ndarray, options: HotspotOptions) -> tuple:
+    """(mask, background) of a °C grid with NaN for invalid pixels; background is None without `delta`."""
+    with np.errstate(invalid='ignore'):
+        mask = ~np.isnan(temperature)
+        if options.threshold is not None:
+            mask &= temperature >= options.threshold
+        background = None
+        if options.delta is not None:
+            background = local_background(temperature, options.window)
+            mask &= temperature - background >= options.delta
+    return mask, background
+
+def _runs(mask: np.ndarray) -> tuple:
+    # (rows, starts, ends) of the runs of True in each row, ends exclusive, in raster order
+    h, w = mask.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+def _touching_runs(rows, starts, ends, width: int, connectivity: int) -> tuple:
+    # Pairs (a, b) of runs where b is in the row below a and touches it
+    stride = width + 2  # keys of different rows never overlap, even shifted by one column
+    k = 1 if connectivity == 8 else 0
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    below = (rows + 1) * stride
+    # Runs are disjoint within a row, so both key arrays are sorted
+    lo = np.searchsorted(end_keys, below + starts - k, side='right')
+    hi = np.searchsorted(start_keys, below + ends + k, side='left')
+    counts = np.maximum(hi - lo, 0)
+    a = np.repeat(np.arange(len(rows)), counts)
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    b = np.repeat(lo, counts) + np.arange(counts.sum()) - first
+    return a, b
+
+def _union_find(count: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Component of every node (the smallest node in it); vectorized hooking and pointer jumping
+    parent = np.arange(count)
+    while True:
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        ra, rb = parent[a], parent[b]
+        differ = ra != rb
+        if not differ.any():
+            return parent
+        ra, rb = ra[differ], rb[differ]
+        np.minimum.at(parent, np.maximum(ra, rb), np.minimum(ra, rb))
+
+def _run_components(rows, starts, ends, width: int, connectivity: int) -> tuple:
+    a, b = _touching_runs(rows, starts, ends, width, connectivity)
+    roots = _union_find(len(rows), a, b)
+    # Roots are the first run of each component, so the numbering follows raster order
+    _, components = np.unique(roots, return_inverse=True)
+    return components, int(components.max()) + 1
+
+def _run_pixels(rows, starts, ends) -> tuple:
+    # (ys, xs) of every pixel of the runs, run by run
+    lengths = ends - starts
+    first = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(rows, lengths), np.repeat(starts, lengths) + np.arange(int(lengths.sum())) - first
+
+def label_components(mask: np.ndarray, connectivity: int = 8) -> tuple:
+    """Connected components of a boolean image: (labels, count).
+
+    labels is an int32 image with 0 for background and 1..count for the
+    components, numbered in raster order of their first pixel.
+    """
+    rows, starts, ends = _runs(mask)
+    labels = np.zeros(mask.shape, dtype=np.int32)
+    if len(rows) == 0:
+        return labels, 0
+    components, count = _run_components(rows, starts, ends, mask.shape[1], connectivity)
+    ys, xs = _run_pixels(rows, starts, ends)
+    labels[ys, xs] = np.repeat(components, ends - starts) + 1
+    return labels, count
+
+def detect_hotspots(temperature: np.ndarray, options: HotspotOptions) -> np.ndarray:
+    """Hotspots of one (H, W) °C grid with NaN for invalid pixels, as a HOTSPOT_DTYPE array."""
+    mask, background = hot_mask(temperature, options)
+    rows, starts, ends = _runs(mask)
+    if len(rows) == 0:
+        return np.zeros(0, dtype=HOTSPOT_DTYPE)
+    components, count = _run_components(rows, starts, ends, mask.shape[1], options.connectivity)
+
+    # Every hot pixel, with its component
+    ys, xs = _run_pixels(rows, starts, ends)
+    labels = np.repeat(components, ends - starts)
+    temps = temperature[ys, xs]
+
+    area = np.bincount(labels, minlength=count)
+    out = np.zeros(count, dtype=HOTSPOT_DTYPE)
+    out["area"] = area
+    # Bounding boxes from the runs (fewer than the pixels)
+    height, width = mask.shape
+    for name, values, reduce, initial in (("x0", starts, np.minimum, width), ("y0", rows, np.minimum, height),
+                                          ("x1", ends - 1, np.maximum, -1), ("y1", rows, np.maximum, -1)):
+        bound = np.full(count, initial, dtype=np.int64)
+        reduce.at(bound, components, values)
+        out[name] = bound
+    out["cx"] = np.bincount(labels, xs, count) / area
+    out["cy"] = np.bincount(labels, ys, count) / area
+    out["mean"] = np.bincount(labels, temps, count) / area
+    # Sorted by component, then temperature: the last pixel of each component is its peak
+    peaks = np.lexsort((temps, labels))[np.cumsum(area) - 1]
+    out["peak"], out["peak_x"], out["peak_y"] = temps[peaks], xs[peaks], ys[peaks]
+    out["background"] = np.bincount(labels, background[ys, xs], count) / area if background is not None else np.nan
+    return out[area >= options.min_area]
+
+@dataclass
+class FrameHotspots:
+    """Detections of one input file."""
+    input_path: str
+    hotspots: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=HOTSPOT_DTYPE))
+    output_path: str = None  # the TIFF, if one was written
+    error: str = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+def write_csv_rows(writer, frame: str, hotspots: np.ndarray):
+    """Appends the rows of one frame to a csv.writer (CSV_COLUMNS order); temperatures in °C to 0.01."""
+    for i, spot in enumerate(hotspots):
+        row = [frame, i]
+        for name in HOTSPOT_DTYPE.names:
+            value = spot[name]
+            if np.issubdtype(HOTSPOT_DTYPE[name], np.integer):
+                row.append(int(value))
+            else:
+                row.append("" if np.isnan(value) else round(float(value), 2))
+        writer.writerow(row)
+
+class _HotspotWorker:
+    """Per-process options, temperature buffer and converter (created for the first file)."""
+
+    def __init__(self, converter_factory, options: HotspotOptions, write_tiffs: bool):
+        self.converter_factory = converter_factory
+        self.options = options
+        self.write_tiffs = write_tiffs
+        self.converter = None
+        self.buffer = np.empty((THERMAL_HEIGHT, THERMAL_WIDTH), dtype=np.float32)
+
+    def run(self, input_path: str, output_path: str) -> FrameHotspots:
+        if self.converter is None:
+            self.converter = self.converter_factory()
+        if not self.write_tiffs:
+            # The temperature grid alone (no RGB decode)
+            temperature = self.converter.read_temperature(input_path, out=self.buffer)
+            if temperature is None:
+                return FrameHotspots(input_path, error="Decode failed")
+            return FrameHotspots(input_path, detect_hotspots(_invalid_to_nan(temperature), self.options))
+
+        frame = self.converter.decode(input_path)
+        if frame is None:
+            return FrameHotspots(input_path, error="Decode failed")
+        temperature = encoding.sanitize_temperature(frame.temperature, out=self.buffer)
+        hotspots = detect_hotspots(_invalid_to_nan(temperature), self.options)
+        if len(hotspots) == 0:
+            return FrameHotspots(input_path, hotspots)
+        success, _ = convert_atomic(self.converter, input_path, output_path, frame=frame)
+        if not success:
+            return FrameHotspots(input_path, hotspots, error="TIFF write failed")
+        return FrameHotspots(input_path, hotspots, output_path)
+
+def _hotspot_task(worker, pair):
+    return worker.run(*pair)
+
+def find_hotspots(pairs, options: HotspotOptions, jobs: int = 1, converter_factory=ThermalConverter,
+                  write_tiffs: bool = False, chunksize: int = None):
+    """Detects hotspots in every (input_path, output_path) pair; yields a FrameHotspots per pair, in order.
+
+    Each file is decoded once, in `jobs` worker processes. With `write_tiffs`,
+    frames with at least one hotspot are converted to `output_path` (the
+    converter's TIFF options, thumbnails and EXIF apply). Without it,
+    output_path is ignored and only the temperature grid is decoded.
+    """
+    pairs = [(str(i), str(o) if o is not None else None) for i, o in pairs]
+    factory = functools.partial(_HotspotWorker, converter_factory, options, write_tiffs)
+    for (input_path, _), result in zip(pairs, run_tasks(_hotspot_task, pairs, jobs, factory, chunksize)):
+        if isinstance(result, Exception):
+            result = FrameHotspots(input_path, error=str(result))
+        yield result
@@ -0,0 +1,133 @@
+"""Persistent record of converted inputs, used to skip unchanged files on re-runs.
+
+The manifest is an append-only JSON Lines file in the output directory. Each
+line describes one conversion attempt; when an input appears more than once
+the last line wins. Appending keeps every update O(1) and crash-safe: a run
+that dies at image 4,000 has already recorded the first 3,999. Finished runs
+compact the file to one line per input.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from .fileutil import atomic_output, open_append
+
+MANIFEST_NAME = ".autel_manifest.jsonl"
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+def file_hash(path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class Manifest:
+    """Tracks size, mtime and (optionally) content hash of every converted input."""
+
+    def __init__(self, output_dir, use_hash: bool = False, name: str = MANIFEST_NAME):
+        self.path = Path(output_dir) / name
+        self.use_hash = use_hash
+        self.entries = {}
+        self.lines = 0  # lines in the file, including superseded ones
+        self._fh = None
+        # The pipeline's feeder (is_current, which may record) and its consumer record concurrently
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(input_path) -> str:
+        return str(Path(input_path).resolve())
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn last line from an interrupted run
+                    continue
+                self.entries[entry["input"]] = entry
+                self.lines += 1
+
+    def fingerprint(self, input_path) -> dict:
+        st = os.stat(input_path)
+        fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        if self.use_hash:
+            fp["sha256"] = file_hash(input_path)
+        return fp
+
+    def is_current(self, input_path, output_path) -> bool:
+        """True if `input_path` was converted successfully to `output_path` and has not changed since.
+
+        Only a stat() is needed for unchanged files. With use_hash, a file
+        whose mtime changed but whose content did not (e.g. re-copied from the
+        card) is still considered current.
+        """
+        entry = self.entries.get(self.key(input_path))
+        if entry is None or entry.get("status") != STATUS_OK:
+            return False
+        if entry.get("output") != str(output_path) or not os.path.exists(output_path):
+            return False
+
+        try:
+            st = os.stat(input_path)
+        except OSError:
+            return False
+        if st.st_size != entry.get("size"):
+            return False
+        if st.st_mtime_ns == entry.get("mtime_ns"):
+            return True
+        if self.use_hash and entry.get("sha256"):
+            if file_hash(input_path) == entry["sha256"]:
+                self.record(input_path, output_path, STATUS_OK)
+                return True
+        return False
+
+    def record(self, input_path, output_path, status: str):
+        """Appends the outcome of one conversion."""
+        entry = {"input": self.key(input_path), "output": str(output_path), "status": status}
+        try:
+            entry.update(self.fingerprint(input_path))
+        except OSError:
+            pass
+        with self._lock:
+            self.entries[entry["input"]] = entry
+            if self._fh is None:
+                self._fh = open_append(self.path, encoding='utf-8')
+            self._fh.write(json.dumps(entry) + "\n")
+            self._fh.flush()
+            self.lines += 1
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def compact(self):
+        """Rewrites the manifest with one line per input, if it has superseded lines.
+
+        Called at the end of a run, so re-runs do not grow the file by one line per input each time.
+        """
+        self.close()
+        if self.lines == len(self.entries):
+            return
+        with atomic_output(self.path) as tmp:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+        self.lines = len(self.entries)
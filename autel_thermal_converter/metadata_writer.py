@@ -0,0 +1,237 @@
+"""Streaming, bounded-memory metadata output for directory mode.
+
+Every finished image is appended to:
+
+*   `dataset_metadata.jsonl`: one JSON record per line ({"name": ..., "stats": ..., "metadata": ...}).
+*   `dataset_stats.csv`: one row of `stats` per image.
+
+Both are flushed per record, so a crashed run keeps everything it finished.
+When the writer is closed, the CSV is turned into `dataset_stats.npy`, a
+structured array that loads in milliseconds even for 100k+ images. The
+aggregated `dataset_metadata.json` is built from the JSONL by
+`compact_to_json`, which streams records instead of holding them in memory.
+
+If an image appears more than once (e.g. reconverted after a change), the
+last record wins everywhere.
+
+A sharded run (see discovery) tags its files, e.g.
+`dataset_metadata.shard-0-of-4.jsonl`, so shards can share an output folder;
+`merge_shards` combines them into the untagged dataset files.
+"""
+import csv
+import functools
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .fileutil import atomic_output, open_append
+
+JSONL_NAME = "dataset_metadata.jsonl"
+STATS_CSV_NAME = "dataset_stats.csv"
+STATS_NPY_NAME = "dataset_stats.npy"
+AGGREGATE_NAME = "dataset_metadata.json"
+
+STATS_COLUMNS = ("min", "max", "avg", "min_x", "min_y", "max_x", "max_y")
+_STATS_TYPES = ("f4", "f4", "f4", "i4", "i4", "i4", "i4")
+
+def tagged_name(name: str, tag: str = None) -> str:
+    """Inserts a tag before the extension: dataset_stats.csv -> dataset_stats.shard-0-of-4.csv."""
+    if not tag:
+        return name
+    stem, dot, ext = name.rpartition(".")
+    return f"{stem}.{tag}{dot}{ext}"
+
+def stats_row(stats: dict) -> list:
+    """Flattens a `stats` dict into STATS_COLUMNS order."""
+    min_point = stats.get("min_point") or {}
+    max_point = stats.get("max_point") or {}
+    return [
+        stats.get("min"), stats.get("max"), stats.get("avg"),
+        min_point.get("x"), min_point.get("y"), max_point.get("x"), max_point.get("y"),
+    ]
+
+def stats_dtype(name_length: int) -> np.dtype:
+    return np.dtype([("name", f"U{max(1, name_length)}")] + list(zip(STATS_COLUMNS, _STATS_TYPES)))
+
+def _read_stats_csv(csv_path) -> np.ndarray:
+    rows = {}
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for row in reader:
+            if len(row) != len(STATS_COLUMNS) + 1:
+                continue  # torn last line
+            rows.pop(row[0], None)  # keep last-wins rows in last-seen order
+            rows[row[0]] = row[1:]
+
+    name_length = max((len(name) for name in rows), default=1)
+    index = np.zeros(len(rows), dtype=stats_dtype(name_length))
+    index["name"] = list(rows)
+    for col, column in enumerate(STATS_COLUMNS):
+        values = [row[col] for row in rows.values()]
+        index[column] = [v if v != '' else -1 for v in values]
+    return index
+
+def load_stats_index(output_dir) -> np.ndarray:
+    """Loads the columnar stats index of a directory-mode run as a structured array.
+
+    Uses `dataset_stats.npy` when it is up to date, otherwise parses the CSV.
+    """
+    output_dir = Path(output_dir)
+    npy_path = output_dir / STATS_NPY_NAME
+    csv_path = output_dir / STATS_CSV_NAME
+    if npy_path.exists() and (not csv_path.exists() or npy_path.stat().st_mtime_ns >= csv_path.stat().st_mtime_ns):
+        return np.load(npy_path)
+    return _read_stats_csv(csv_path)
+
+def iter_records(jsonl_path):
+    """Yields records from a metadata JSONL file, skipping a torn last line."""
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+def compact_to_json(jsonl_path, json_path):
+    """Writes the aggregated {name: metadata} JSON from a metadata JSONL file.
+
+    The output matches what directory mode used to `json.dump(..., indent=4)`.
+    Records are streamed: only the byte offset of each name's last record is
+    kept in memory.
+    """
+    offsets = {}
+    with open(jsonl_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            try:
+                name = json.loads(line)["name"]
+            except (json.JSONDecodeError, KeyError):
+                name = None
+            if name is not None:
+                offsets.pop(name, None)
+                offsets[name] = offset
+            offset += len(line)
+
+    with open(jsonl_path, 'rb') as src, atomic_output(json_path) as tmp:
+        with open(tmp, 'w', encoding='utf-8') as dst:
+            dst.write("{")
+            for i, (name, offset) in enumerate(offsets.items()):
+                src.seek(offset)
+                record = json.loads(src.readline())
+                record.pop("name")
+                body = json.dumps(record, indent=4).replace("\n", "\n    ")
+                dst.write(("," if i else "") + f"\n    {json.dumps(name)}: {body}")
+            dst.write("\n}" if offsets else "}")
+    return len(offsets)
+
+def merge_shards(output_dir, compact: bool = True) -> int:
+    """Combines the tagged metadata files of every shard into the dataset files.
+
+    Writes dataset_metadata.jsonl, dataset_stats.csv/.npy, (with
+    `compact`) dataset_metadata.json and, if the shards collected them, the
+    summed dataset_histogram.npy and the spatial_index.npz of the recorded
+    positions. Shard files are read in a streaming fashion and left in
+    place. Returns the number of merged records.
+    """
+    output_dir = Path(output_dir)
+    jsonl_shards = sorted(output_dir.glob(tagged_name(JSONL_NAME, "shard-*")))
+    if not jsonl_shards:
+        raise FileNotFoundError(f"No shard metadata ({tagged_name(JSONL_NAME, 'shard-*')}) in {output_dir}")
+
+    count = 0
+    with atomic_output(output_dir / JSONL_NAME) as tmp:
+        with open(tmp, 'wb') as dst:
+            for shard in jsonl_shards:
+                with open(shard, 'rb') as src:
+                    for line in src:
+                        if line.endswith(b"\n"):  # skip a torn last line
+                            dst.write(line)
+                            count += 1
+
+    csv_path = output_dir / STATS_CSV_NAME
+    with atomic_output(csv_path) as tmp:
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(("name",) + STATS_COLUMNS)
+            for shard in sorted(output_dir.glob(tagged_name(STATS_CSV_NAME, "shard-*"))):
+                with open(shard, 'r', newline='', encoding='utf-8') as src:
+                    reader = csv.reader(src)
+                    next(reader, None)  # header
+                    writer.writerows(row for row in reader if len(row) == len(STATS_COLUMNS) + 1)
+    with atomic_output(output_dir / STATS_NPY_NAME) as tmp:
+        np.save(tmp, _read_stats_csv(csv_path))
+
+    from .normalize import HISTOGRAM_NAME, DatasetHistogram
+
+    histogram_shards = sorted(output_dir.glob(tagged_name(HISTOGRAM_NAME, "shard-*")))
+    if histogram_shards:
+        histogram = DatasetHistogram()
+        for shard in histogram_shards:
+            histogram.add(np.load(shard))
+        histogram.save(output_dir / HISTOGRAM_NAME)
+
+    from .spatial import SPATIAL_INDEX_NAME, SpatialIndex, positions_from_records
+
+    positions = positions_from_records(iter_records(output_dir / JSONL_NAME))
+    if any(position for _, position in positions):
+        # Shards may have run on machines with different mounts: no root folder is recorded
+        SpatialIndex.build(positions).save(output_dir / SPATIAL_INDEX_NAME)
+
+    if compact:
+        compact_to_json(output_dir / JSONL_NAME, output_dir / AGGREGATE_NAME)
+    return count
+
+class MetadataWriter:
+    """Appends per-image metadata to JSONL and the stats CSV as images finish.
+
+    With a `tag` (e.g. a shard tag), every file name carries it.
+    """
+
+    def __init__(self, output_dir, append: bool = True, tag: str = None):
+        self.output_dir = Path(output_dir)
+        self.tag = tag
+        self.jsonl_path = self.output_dir / tagged_name(JSONL_NAME, tag)
+        self.csv_path = self.output_dir / tagged_name(STATS_CSV_NAME, tag)
+        self.npy_path = self.output_dir / tagged_name(STATS_NPY_NAME, tag)
+        opener = open_append if append else functools.partial(open, mode='w')
+
+        self._jsonl = opener(self.jsonl_path, encoding='utf-8')
+        new_csv = not append or not self.csv_path.exists() or self.csv_path.stat().st_size == 0
+        self._csv_file = opener(self.csv_path, newline='', encoding='utf-8')
+        self._csv = csv.writer(self._csv_file)
+        if new_csv:
+            self._csv.writerow(("name",) + STATS_COLUMNS)
+        self.count = 0
+
+    def append(self, name: str, metadata: dict):
+        record = {"name": name}
+        record.update(metadata)
+        self._jsonl.write(json.dumps(record) + "\n")
+        self._jsonl.flush()
+        self._csv.writerow([name] + stats_row(metadata.get("stats") or {}))
+        self._csv_file.flush()
+        self.count += 1
+
+    def close(self):
+        """Closes the streams and rebuilds the .npy stats index."""
+        if self._jsonl.closed:
+            return
+        self._jsonl.close()
+        self._csv_file.close()
+        index = _read_stats_csv(self.csv_path)
+        with atomic_output(self.npy_path) as tmp:
+            np.save(tmp, index)
+
+    def compact(self, json_path=None) -> Path:
+        """Optional final step: writes the aggregated JSON. Returns its path."""
+        json_path = Path(json_path) if json_path else self.output_dir / tagged_name(AGGREGATE_NAME, self.tag)
+        compact_to_json(self.jsonl_path, json_path)
+        return json_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,240 @@
+"""Dataset-wide temperature normalization from stored encoded data.
+
+The TIFFs keep absolute temperatures (band 4 = T * 100 + 10000), so every
+image has its own contrast when it is viewed as is. A consistent colormap
+across a flight needs one temperature range for all frames, which used to be
+hard-coded (GLOBAL_TEMP_MIN/MAX in the legacy batch_ir2tif).
+
+Here the range comes from the data, without a second decode:
+
+1.  While converting, every converter counts the encoded values of the band
+    it writes (`collect_histogram`; in C++ for the DLL path). The counts are
+    summed into a DatasetHistogram and saved as `dataset_histogram.npy`:
+    65536 bins, 512 KB, whatever the number of frames.
+2.  `percentile_range` reads the range from the histogram (e.g. the 1st-99th
+    percentile of all valid pixels of the flight).
+3.  BandNormalizer maps stored bands (TIFF band 4 or a stack) to 8- or 16-bit
+    through a 65536-entry lookup table: one gather per pixel. The SDK is
+    never involved.
+
+Invalid pixels (encoded 0) map to 0, like values below the range.
+"""
+import functools
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from . import encoding
+from .batch import ConversionResult, run_tasks
+from .discovery import iter_inputs, output_path_for
+from .fileutil import atomic_output, discard, partial_path
+from .compression import COMPRESSION_LZW, has_fast_lzw
+from .tiff import TiffOptions, read_thermal_band, tiff_compression, write_tiff
+
+HISTOGRAM_NAME = "dataset_histogram.npy"
+NORMALIZATION_NAME = "normalization.json"
+NORMALIZED_DIR = "normalized"
+STACK_NORMALIZED_NAME = "thermal_{bits}bit.npy"
+
+DEFAULT_PERCENTILES = (1.0, 99.0)
+
+class DatasetHistogram:
+    """Counts of every encoded thermal value over a dataset (bin 0 = invalid pixels)."""
+
+    def __init__(self, counts: np.ndarray = None):
+        if counts is None:
+            counts = np.zeros(encoding.ENCODED_LEVELS, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        if self.counts.shape != (encoding.ENCODED_LEVELS,):
+            raise ValueError(f"A histogram has {encoding.ENCODED_LEVELS} bins, got shape {self.counts.shape}")
+
+    def add(self, histogram):
+        """Adds a full histogram or a compact (first value, counts) pair (see encoding.compact_histogram)."""
+        if histogram is None:
+            return
+        if isinstance(histogram, tuple):
+            first, counts = histogram
+            self.counts[first:first + len(counts)] += counts
+        else:
+            self.counts += histogram
+
+    def add_band(self, band):
+        self.counts += encoding.band_histogram(band)
+
+    @property
+    def valid_pixels(self) -> int:
+        return int(self.counts[1:].sum())
+
+    def percentile_range(self, low: float = DEFAULT_PERCENTILES[0], high: float = DEFAULT_PERCENTILES[1]) -> tuple:
+        """Encoded values at the `low` and `high` percentiles of the valid pixels: (low, high), low < high."""
+        if not 0 <= low < high <= 100:
+            raise ValueError("Percentiles must satisfy 0 <= low < high <= 100")
+        cumulative = np.cumsum(self.counts[1:])
+        total = int(cumulative[-1])
+        if total == 0:
+            raise ValueError("The histogram has no valid pixels")
+        # Value v is at index v - 1; the first value whose cumulative count reaches the target
+        lo, hi = (int(np.searchsorted(cumulative, max(1, int(np.ceil(p / 100 * total))))) + 1 for p in (low, high))
+        return lo, max(hi, lo + 1)
+
+    def save(self, path):
+        with atomic_output(path) as tmp:
+            np.save(tmp, self.counts)
+
+    @classmethod
+    def load(cls, path) -> "DatasetHistogram":
+        return cls(np.load(path))
+
+def encoded_value(temperature: float) -> int:
+    """Encoded band value of a temperature in °C."""
+    return int(encoding.encode_temperature(np.float32(temperature)))
+
+def temperature_of(value: int) -> float:
+    """Temperature in °C of an encoded band value."""
+    return round(float(encoding.decode_temperature(np.uint16(value))), 2)
+
+def normalization_lut(low: int, high: int, bits: int = 8) -> np.ndarray:
+    """Lookup table mapping every encoded value to 0..2**bits - 1 over [low, high]."""
+    if bits not in (8, 16):
+        raise ValueError("bits must be 8 or 16")
+    if not 0 < low < high < encoding.ENCODED_LEVELS:
+        raise ValueError(f"Invalid encoded range {low}..{high}")
+    top = (1 << bits) - 1
+    values = np.arange(encoding.ENCODED_LEVELS, dtype=np.float64)
+    lut = np.clip((values - low) / (high - low), 0.0, 1.0) * top + 0.5
+    lut = lut.astype(np.uint8 if bits == 8 else np.uint16)
+    lut[0] = 0  # invalid pixels
+    return lut
+
+class BandNormalizer:
+    """Scales encoded thermal bands to `bits` over the encoded range [low, high].
+
+    Picklable and cheap to build, so each worker process builds its own
+    lookup table (used as the "converter" of batch.run_tasks).
+    """
+
+    def __init__(self, low: int, high: int, bits: int = 8, tiff_options: TiffOptions = None):
+        self.low = low
+        self.high = high
+        self.bits = bits
+        self.tiff_options = tiff_options or TiffOptions()
+        self.lut = normalization_lut(low, high, bits)
+
+    def normalize(self, band, out: np.ndarray = None) -> np.ndarray:
+        return np.take(self.lut, band, out=out)
+
+    def normalize_file(self, tiff_path, output_path) -> int:
+        """Writes the normalized band of a converted TIFF as a grayscale TIFF. Returns its size."""
+        tmp = partial_path(output_path)
+        try:
+            size = write_tiff(tmp, self.normalize(read_thermal_band(tiff_path, mmap=True)), self.tiff_options)
+            os.replace(tmp, output_path)
+        finally:
+            discard(tmp)
+        return size
+
+    def describe(self) -> dict:
+        """The range and the formula back to °C, as stored in normalization.json."""
+        low, high = temperature_of(self.low), temperature_of(self.high)
+        top = (1 << self.bits) - 1
+        return {
+            "bits": self.bits,
+            "low": low,
+            "high": high,
+            "low_encoded": self.low,
+            "high_encoded": self.high,
+            "formula": f"temp_celsius = {low} + value / {top} * {round(high - low, 2)} (0 = at or below low, or invalid)",
+        }
+
+class _StoredBands:
+    """Worker object of `build_histogram`: reads bands back, decodes nothing."""
+
+    def histogram(self, path):
+        return encoding.compact_histogram(encoding.band_histogram(read_thermal_band(path, mmap=True)))
+
+def _histogram_task(reader, path):
+    return reader.histogram(path)
+
+def _normalize_task(normalizer, pair):
+    tiff_path, output_path = pair
+    normalizer.normalize_file(tiff_path, output_path)
+    return True
+
+def find_outputs(output_dir):
+    """Yields (path, relative_path) of the converted TIFFs under `output_dir`."""
+    return iter_inputs(output_dir, recursive=True, include=("*.tif", "*.tiff"),
+                       exclude=(".*", NORMALIZED_DIR, "stack"))
+
+def reads_lzw_slowly(output_dir) -> bool:
+    """True if the TIFFs in `output_dir` are LZW (the DLL's output) and imagecodecs is not installed.
+
+    Each one then goes through the pure-Python decoder, over a second per
+    frame: normalizing or recounting them takes longer than converting did.
+    """
+    if has_fast_lzw():
+        return False
+    for path, _ in find_outputs(output_dir):
+        try:
+            return tiff_compression(path) == COMPRESSION_LZW
+        except (OSError, ValueError):
+            return False  # not a TIFF; the read reports it
+    return False
+
+def build_histogram(paths, jobs: int = 1) -> DatasetHistogram:
+    """Histogram of the thermal bands of existing TIFFs (for outputs converted without one)."""
+    histogram = DatasetHistogram()
+    for result in run_tasks(_histogram_task, [str(p) for p in paths], jobs, converter_factory=_StoredBands):
+        if not isinstance(result, Exception):
+            histogram.add(result)
+    return histogram
+
+def stack_histogram(stack_dir, chunk: int = 64) -> DatasetHistogram:
+    """Histogram of a thermal stack (see stack), read in chunks of frames from the memory map."""
+    from .stack import StackReader
+
+    reader = StackReader(stack_dir)
+    histogram = DatasetHistogram()
+    valid = np.flatnonzero(reader.index["valid"])
+    for start in range(0, valid.size, chunk):
+        histogram.add_band(reader[valid[start:start + chunk]])
+    return histogram
+
+def normalize_outputs(output_dir, normalizer: BandNormalizer, jobs: int = 1):
+    """Writes OUTPUT/normalized/<relative path>.tif for every converted TIFF. Yields a ConversionResult each."""
+    output_dir = Path(output_dir)
+    pairs = []
+    for path, relative in find_outputs(output_dir):
+        target = output_path_for(output_dir / NORMALIZED_DIR, relative)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        pairs.append((str(path), str(target)))
+    # Workers rebuild the normalizer (and its lookup table) instead of unpickling one per task
+    factory = functools.partial(BandNormalizer, normalizer.low, normalizer.high, normalizer.bits, normalizer.tiff_options)
+    for (tiff_path, target), result in zip(pairs, run_tasks(_normalize_task, pairs, jobs, converter_factory=factory)):
+        if isinstance(result, Exception):
+            yield ConversionResult(tiff_path, target, False, error=str(result))
+        else:
+            yield ConversionResult(tiff_path, target, True)
+
+def normalize_stack(stack_dir, normalizer: BandNormalizer, chunk: int = 64) -> Path:
+    """Writes stack/thermal_<bits>bit.npy, the normalized (N, H, W) stack. Returns its path."""
+    from .stack import StackReader
+
+    reader = StackReader(stack_dir)
+    path = Path(stack_dir) / STACK_NORMALIZED_NAME.format(bits=normalizer.bits)
+    with atomic_output(path) as tmp:
+        out = np.lib.format.open_memmap(tmp, mode='w+', dtype=normalizer.lut.dtype, shape=reader.thermal.shape)
+        for start in range(0, len(reader), chunk):
+            normalizer.normalize(reader[start:start + chunk], out=out[start:start + chunk])
+        out.flush()
+        del out
+    return path
+
+def write_normalization(output_dir, normalizer: BandNormalizer, **extra) -> Path:
+    """Saves the range used (see BandNormalizer.describe) as normalization.json."""
+    path = Path(output_dir) / NORMALIZATION_NAME
+    with atomic_output(path) as tmp:
+        with open(tmp, 'w') as f:
+            json.dump(dict(normalizer.describe(), **extra), f, indent=4)
+    return path
@@ -0,0 +1,232 @@
+"""Streaming conversion pipeline with overlapping stages.
+
+    prefetch -> decode -> encode -> write
+
+Each stage runs in its own thread, connected by bounded queues. While the SDK
+decodes image N, the prefetch stage is already reading image N+1.. from slow
+storage (SD-card readers, SMB shares) into the OS page cache, and the write
+stage is still flushing image N-1. Full queues block the upstream stage
+(backpressure), so memory stays bounded by the queue depth.
+
+Decode runs on a single thread because the SDK's thread-safety is unknown.
+The SDK and the NumPy/zlib encoding release the GIL for most of their work.
+"""
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+
+from . import encoding
+from .batch import ConversionResult
+from .exif import read_exif
+from .fileutil import discard, partial_path
+from .manifest import STATUS_FAILED, STATUS_OK
+from .preview import render_thumbnails, write_thumbnails
+from .tiff import TiffOptions, write_tiff
+
+_DONE = object()
+_READ_CHUNK = 1024 * 1024
+
+STAGES = ("prefetch", "decode", "encode", "write")
+
+@dataclass
+class StageStats:
+    items: int = 0
+    busy: float = 0.0
+    max_queue: int = 0
+
+@dataclass
+class PipelineStats:
+    """Per-stage busy time and queue occupancy of one pipeline run."""
+    stages: dict = field(default_factory=lambda: {name: StageStats() for name in STAGES})
+    wall: float = 0.0
+
+    def utilization(self, stage: str) -> float:
+        return self.stages[stage].busy / self.wall if self.wall else 0.0
+
+    def report(self) -> str:
+        lines = [f"{'stage':<10} {'items':>6} {'busy s':>8} {'util':>6} {'max queue':>10}"]
+        for name in STAGES:
+            st = self.stages[name]
+            lines.append(f"{name:<10} {st.items:>6} {st.busy:>8.2f} {self.utilization(name):>6.0%} {st.max_queue:>10}")
+        lines.append(f"wall time: {self.wall:.2f} s")
+        return "\n".join(lines)
+
+def prefetch_file(path) -> int:
+    """Reads a file once so the decode stage finds it in the OS page cache. Returns its size."""
+    size = 0
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            chunk = f.read(_READ_CHUNK)
+            if not chunk:
+                return size
+            size += len(chunk)
+
+class ConversionPipeline:
+    """Converts (input, output) pairs through overlapping prefetch/decode/encode/write stages.
+
+    `converter` must provide `decode(input_path)` (ThermalConverter or
+    BackendConverter). TIFFs are written by the NumPy writer with
+    `tiff_options` (default: the converter's own options, if any), and
+    thumbnails with the converter's preview options, if any. With the
+    converter's `exif` set, JPG metadata is copied into each TIFF.
+    """
+
+    def __init__(self, converter, queue_depth: int = 8, tiff_options: TiffOptions = None):
+        if queue_depth < 1:
+            raise ValueError("queue_depth must be at least 1")
+        self.converter = converter
+        self.queue_depth = queue_depth
+        self.tiff_options = tiff_options or getattr(converter, 'tiff_options', None) or TiffOptions()
+        self.previews = getattr(converter, 'previews', None)
+        self.exif = getattr(converter, 'exif', False)
+        self.stats = PipelineStats()
+        self._stop = threading.Event()
+        self._feed_error = None
+
+    def _put(self, q, item) -> bool:
+        # Blocks while the queue is full, but gives up once the run is cancelled
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _stage(self, name, func, inbox, outbox):
+        stats = self.stats.stages[name]
+        while not self._stop.is_set():
+            try:
+                job = inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if job is _DONE:
+                self._put(outbox, _DONE)
+                return
+            stats.max_queue = max(stats.max_queue, inbox.qsize() + 1)
+            if job.error is None:
+                start = time.perf_counter()
+                try:
+                    func(job)
+                except Exception as e:
+                    job.error = str(e)
+                elapsed = time.perf_counter() - start
+                job.timings["stages"][name] = elapsed
+                stats.busy += elapsed
+                stats.items += 1
+            self._put(outbox, job)
+
+    def _prefetch(self, job):
+        job.timings["input_bytes"] = prefetch_file(job.input_path)
+        if self.exif:
+            job.exif = read_exif(job.input_path)  # the header was just read, so this hits the page cache
+
+    def _decode(self, job):
+        job.frame = self.converter.decode(job.input_path)
+        if job.frame is None:
+            job.error = "Decode failed"
+
+    def _encode(self, job):
+        frame = job.frame
+        if self.tiff_options.thermal_only:
+            job.bands = encoding.encode_temperature(frame.temperature)
+        else:
+            job.bands = encoding.encode_frame(frame.temperature, frame.rgb)
+        if getattr(self.converter, 'collect_histogram', False):
+            thermal = job.bands if job.bands.ndim == 2 else job.bands[..., 3]
+            job.histogram = encoding.compact_histogram(encoding.band_histogram(thermal))
+        if self.previews is not None:
+            thermal = job.bands if job.bands.ndim == 2 else job.bands[..., 3]
+            job.thumbnails = render_thumbnails(thermal, frame.rgb, self.previews)
+
+    def _write(self, job):
+        tmp = partial_path(job.output_path)
+        try:
+            extra_tags, sub_ifds = job.exif.tiff_tags() if job.exif else ((), None)
+            job.timings["output_bytes"] = write_tiff(tmp, job.bands, self.tiff_options, extra_tags=extra_tags,
+                                                     sub_ifds=sub_ifds)
+            os.replace(tmp, job.output_path)
+        finally:
+            discard(tmp)
+        if job.thumbnails:
+            write_thumbnails(job.output_path, job.thumbnails)
+        job.bands = None
+        job.thumbnails = None
+        job.exif = None
+
+    def run(self, pairs, manifest=None):
+        """Yields a ConversionResult per pair, in input order, as the write stage finishes them.
+
+        With a Manifest, unchanged inputs are skipped (yielded with skipped=True)
+        and every outcome is recorded.
+        """
+        self._stop.clear()
+        self._feed_error = None
+        self.stats = PipelineStats()
+        queues = [queue.Queue(maxsize=self.queue_depth) for _ in range(len(STAGES) + 1)]
+        funcs = (self._prefetch, self._decode, self._encode, self._write)
+        threads = [
+            threading.Thread(target=self._stage, args=(name, func, queues[i], queues[i + 1]), daemon=True)
+            for i, (name, func) in enumerate(zip(STAGES, funcs))
+        ]
+        feeder = threading.Thread(target=self._feed, args=(pairs, manifest, queues[0]), daemon=True)
+
+        start = time.perf_counter()
+        for t in threads + [feeder]:
+            t.start()
+        try:
+            while True:
+                job = queues[-1].get()
+                if job is _DONE:
+                    if self._feed_error is not None:
+                        raise self._feed_error
+                    break
+                result = job.result()
+                if manifest is not None and not result.skipped:
+                    manifest.record(result.input_path, result.output_path,
+                                    STATUS_OK if result.success else STATUS_FAILED)
+                yield result
+        finally:
+            self._stop.set()
+            self.stats.wall = time.perf_counter() - start
+
+    def _feed(self, pairs, manifest, inbox):
+        try:
+            for input_path, output_path in pairs:
+                job = _Job(str(input_path), str(output_path))
+                if manifest is not None and manifest.is_current(job.input_path, job.output_path):
+                    job.skipped = True
+                    job.error = ""  # bypasses every stage
+                if not self._put(inbox, job):
+                    return
+        except Exception as e:
+            # Raised by run() once the jobs already fed are through
+            self._feed_error = e
+        finally:
+            self._put(inbox, _DONE)
+
+class _Job:
+    __slots__ = ("input_path", "output_path", "frame", "bands", "error", "skipped", "timings", "histogram",
+                 "thumbnails", "exif")
+
+    def __init__(self, input_path: str, output_path: str):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.frame = None
+        self.bands = None
+        self.error = None
+        self.skipped = False
+        self.histogram = None
+        self.thumbnails = None
+        self.exif = None
+        self.timings = {"stages": {}, "input_bytes": 0, "output_bytes": 0}
+
+    def result(self) -> ConversionResult:
+        if self.skipped:
+            return ConversionResult(self.input_path, self.output_path, True, skipped=True)
+        if self.error is not None:
+            return ConversionResult(self.input_path, self.output_path, False, error=self.error)
+        return ConversionResult(self.input_path, self.output_path, True, self.frame.metadata, timings=self.timings,
+                                histogram=self.histogram)
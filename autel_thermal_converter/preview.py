@@ -0,0 +1,155 @@
+"""Reduced-resolution data for viewers: overview levels and thumbnails.
+
+Both are made from the bands already in memory during conversion, so a frame
+is never decoded again for its previews:
+
+*   Overviews (TiffOptions.overviews, e.g. (2, 4, 8)) are extra pages of the
+    TIFF itself, flagged as reduced-resolution images (NewSubfileType = 1),
+    the layout GDAL and most viewers read as internal overviews.
+*   Thumbnails (PreviewOptions) are small 8-bit PNGs: the thermal band
+    through a colormap, and the RGB image. They are written to a
+    `thumbnails` folder next to the TIFF.
+
+Downsampling averages blocks of pixels; invalid thermal pixels (encoded 0)
+are left out of the average, and a block with no valid pixel stays 0.
+"""
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .fileutil import atomic_output
+
+THUMBNAIL_DIR = "thumbnails"
+
+# Anchor colors of the colormaps, from the coldest to the hottest value
+_COLORMAP_ANCHORS = {
+    "ironbow": [(0, 0, 0), (32, 0, 140), (140, 0, 160), (220, 40, 90), (250, 120, 0), (255, 200, 20), (255, 255, 255)],
+    "gray": [(0, 0, 0), (255, 255, 255)],
+}
+COLORMAPS = tuple(_COLORMAP_ANCHORS)
+
+@dataclass
+class PreviewOptions:
+    """Thumbnail options.
+
+    size: longest edge of the thumbnails in pixels (reached by an integer
+        downsampling factor, so it may come out slightly smaller).
+    colormap: colormap of the thermal thumbnail, one of COLORMAPS.
+    temperature_range: fixed (min, max) °C of the colormap; default: each
+        frame's own 1st-99th percentile.
+    rgb: also write a thumbnail of the RGB image.
+    """
+    size: int = 160
+    colormap: str = "ironbow"
+    temperature_range: tuple = None
+    rgb: bool = True
+
+    def __post_init__(self):
+        if self.size < 1:
+            raise ValueError("Thumbnail size must be positive")
+        if self.colormap not in _COLORMAP_ANCHORS:
+            raise ValueError(f"Unknown colormap '{self.colormap}'. Choose from: {', '.join(COLORMAPS)}")
+
+def colormap_lut(name: str) -> np.ndarray:
+    """(256, 3) uint8 lookup table of a colormap."""
+    anchors = np.array(_COLORMAP_ANCHORS[name], dtype=np.float64)
+    positions = np.linspace(0, 255, len(anchors))
+    levels = np.arange(256)
+    return np.stack([np.interp(levels, positions, anchors[:, c]) for c in range(3)], axis=1).round().astype(np.uint8)
+
+def _blocks(image: np.ndarray, factor: int) -> np.ndarray:
+    # (H, W, ...) -> (H/f, f, W/f, f, ...), edge-padded to a multiple of `factor`
+    height, width = image.shape[:2]
+    pad_h, pad_w = -height % factor, -width % factor
+    if pad_h or pad_w:
+        image = np.pad(image, [(0, pad_h), (0, pad_w)] + [(0, 0)] * (image.ndim - 2), mode='edge')
+    return image.reshape(image.shape[0] // factor, factor, image.shape[1] // factor, factor, *image.shape[2:])
+
+def downsample(image: np.ndarray, factor: int) -> np.ndarray:
+    """Block average of an (H, W) or (H, W, S) image, keeping its dtype."""
+    if factor == 1:
+        return image
+    return _blocks(image, factor).mean(axis=(1, 3)).round().astype(image.dtype)
+
+def downsample_thermal(band: np.ndarray, factor: int) -> np.ndarray:
+    """Block average of an encoded thermal band, ignoring invalid (0) pixels."""
+    if factor == 1:
+        return band
+    blocks = _blocks(band, factor)
+    counts = np.count_nonzero(blocks, axis=(1, 3))
+    sums = blocks.sum(axis=(1, 3), dtype=np.uint64)
+    out = np.zeros(counts.shape, dtype=band.dtype)
+    np.divide(sums + counts // 2, counts, out=out, where=counts > 0, casting='unsafe')
+    return out
+
+def downsample_bands(bands: np.ndarray, factor: int) -> np.ndarray:
+    """Downsamples TIFF bands: (H, W) thermal only, or (H, W, 4) RGB + thermal."""
+    if bands.ndim == 2:
+        return downsample_thermal(bands, factor)
+    out = downsample(bands, factor)
+    out[..., 3] = downsample_thermal(bands[..., 3], factor)
+    return out
+
+def colorize(band: np.ndarray, low: int, high: int, colormap: str = "ironbow") -> np.ndarray:
+    """Maps an encoded thermal band to (H, W, 3) uint8 colors over [low, high]; invalid pixels are black."""
+    scaled = (band.astype(np.float32) - low) * (255.0 / max(high - low, 1))
+    index = np.clip(scaled, 0, 255).astype(np.uint8)
+    rgb = colormap_lut(colormap)[index]
+    rgb[band == 0] = 0
+    return rgb
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encodes an (H, W) gray or (H, W, 3) RGB uint8 image as a PNG."""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    color_type = 2 if image.ndim == 3 else 0
+    # Every row starts with filter type 0 (none)
+    rows = np.zeros((height, 1 + image[0].size), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, -1)
+
+    def chunk(kind: bytes, payload: bytes) -> bytes:
+        return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows.tobytes(), 6))
+            + chunk(b'IEND', b''))
+
+def thumbnail_factor(shape, size: int) -> int:
+    return max(1, -(-max(shape[:2]) // size))
+
+def render_thumbnails(thermal: np.ndarray, rgb: np.ndarray = None, options: PreviewOptions = None) -> dict:
+    """PNG thumbnails of a frame: {"thermal": bytes[, "rgb": bytes]}.
+
+    `thermal` is the encoded uint16 band, `rgb` the (H, W, 3) uint8 image.
+    """
+    options = options or PreviewOptions()
+    factor = thumbnail_factor(thermal.shape, options.size)
+    small = downsample_thermal(thermal, factor)
+    if options.temperature_range:
+        from .normalize import encoded_value
+        low, high = (encoded_value(t) for t in options.temperature_range)
+    else:
+        valid = small[small > 0]
+        low, high = np.percentile(valid, (1, 99)).astype(int) if valid.size else (0, 1)
+    thumbnails = {"thermal": encode_png(colorize(small, low, high, options.colormap))}
+    if options.rgb and rgb is not None:
+        thumbnails["rgb"] = encode_png(downsample(rgb, factor))
+    return thumbnails
+
+def thumbnail_paths(output_path) -> dict:
+    """Where the thumbnails of a TIFF go: thumbnails/<stem>_thermal.png and _rgb.png next to it."""
+    output_path = Path(output_path)
+    folder = output_path.parent / THUMBNAIL_DIR
+    return {kind: folder / f"{output_path.stem}_{kind}.png" for kind in ("thermal", "rgb")}
+
+def write_thumbnails(output_path, thumbnails: dict):
+    """Writes rendered thumbnails for the TIFF at `output_path` (its final name)."""
+    paths = thumbnail_paths(output_path)
+    for kind, data in thumbnails.items():
+        paths[kind].parent.mkdir(exist_ok=True)
+        with atomic_output(paths[kind]) as tmp:
+            with open(tmp, 'wb') as f:
+                f.write(data)
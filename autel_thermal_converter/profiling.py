@@ -0,0 +1,181 @@
+"""Per-stage timing of conversions and run-level profiling reports.
+
+Every conversion records a timings dict:
+
+    {"stages": {"read": s, "decode": s, "encode": s, "write": s, "metadata": s},
+     "input_bytes": n, "output_bytes": n}
+
+Durations are in seconds. Which stages appear depends on the converter: the
+native DLL path reports the stages of ConvertWithMetadataTimed, while the
+NumPy path reports decode/encode/write (its decode includes reading the file).
+
+Converters expose the timings of their last conversion as `last_timings` and
+pass them to every hook added with `add_timing_hook`. A Profiler aggregates
+them into p50/p95/max per stage, images/s and MB/s, and can write them in the
+Prometheus text format for node_exporter's textfile collector.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from .fileutil import atomic_output
+
+# Display order; unknown stage names are listed after these
+STAGES = ("prefetch", "read", "decode", "encode", "write", "metadata")
+
+METRIC_PREFIX = "autel_convert"
+
+class StageTimer:
+    """Accumulates the stage durations and byte counts of one conversion."""
+
+    def __init__(self):
+        self.stages = {}
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self) -> dict:
+        return {"stages": dict(self.stages), "input_bytes": self.input_bytes, "output_bytes": self.output_bytes}
+
+def file_size(path) -> int:
+    """Size of a file in bytes, or 0 if it cannot be read (e.g. a fixture sidecar input)."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+class TimingHooks:
+    """Mixin for converters: keeps `last_timings` and calls timing hooks after each conversion."""
+
+    last_timings = None
+
+    def add_timing_hook(self, callback):
+        """Registers `callback(input_path, output_path, timings)`, called after every conversion.
+
+        Hooks run in the process doing the conversion (a worker, with -j > 1).
+        """
+        if '_timing_hooks' not in self.__dict__:
+            self._timing_hooks = []
+        self._timing_hooks.append(callback)
+
+    def remove_timing_hook(self, callback):
+        self.__dict__.get('_timing_hooks', []).remove(callback)
+
+    def _emit_timings(self, input_path, output_path, timings: dict):
+        self.last_timings = timings
+        if timings is None:
+            return
+        for callback in self.__dict__.get('_timing_hooks', ()):
+            callback(str(input_path), str(output_path), timings)
+
+def _ordered(names) -> list:
+    known = [s for s in STAGES if s in names]
+    return known + sorted(n for n in names if n not in STAGES)
+
+class Profiler:
+    """Aggregates per-conversion timings over a run.
+
+    Usage:
+
+        profiler = Profiler()
+        for result in convert_batch(...):
+            profiler.add(result.timings)
+        print(profiler.report())
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self.images = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add(self, timings: dict):
+        if not timings:
+            return
+        self.images += 1
+        self.input_bytes += timings.get("input_bytes") or 0
+        self.output_bytes += timings.get("output_bytes") or 0
+        for stage, seconds in timings.get("stages", {}).items():
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def stop(self):
+        """Freezes the wall-clock time used for images/s and MB/s."""
+        self.finished = time.perf_counter()
+
+    @property
+    def wall(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self) -> dict:
+        stages = {}
+        for stage in _ordered(self.samples):
+            values = np.array(self.samples[stage])
+            stages[stage] = {
+                "count": int(values.size),
+                "sum": float(values.sum()),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(values.max()),
+            }
+        wall = self.wall
+        return {
+            "images": self.images,
+            "wall_seconds": wall,
+            "images_per_sec": self.images / wall if wall else 0.0,
+            "input_mb_per_sec": self.input_bytes / wall / 1e6 if wall else 0.0,
+            "output_mb_per_sec": self.output_bytes / wall / 1e6 if wall else 0.0,
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "stages": stages,
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        lines = [f"{'stage':<10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'total s':>9}"]
+        for stage, st in s["stages"].items():
+            lines.append(f"{stage:<10} {st['p50'] * 1e3:>9.2f} {st['p95'] * 1e3:>9.2f} "
+                         f"{st['max'] * 1e3:>9.2f} {st['sum']:>9.2f}")
+        lines.append(f"{s['images']} images in {s['wall_seconds']:.2f} s: {s['images_per_sec']:.2f} images/s, "
+                     f"{s['input_mb_per_sec']:.2f} MB/s in, {s['output_mb_per_sec']:.2f} MB/s out")
+        return "\n".join(lines)
+
+    def metrics_text(self) -> str:
+        """The summary in the Prometheus text exposition format."""
+        s = self.summary()
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds Time spent in each conversion stage, per image.",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        for stage, st in s["stages"].items():
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("1", "max")):
+                lines.append(f'{p}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {st[key]:.6f}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {st["sum"]:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {st["count"]}')
+        for name, kind, help_text, value in (
+            ("images_total", "counter", "Images converted in the run.", s["images"]),
+            ("input_bytes_total", "counter", "Input bytes read.", s["input_bytes"]),
+            ("output_bytes_total", "counter", "TIFF bytes written.", s["output_bytes"]),
+            ("wall_seconds", "gauge", "Wall-clock duration of the run.", f"{s['wall_seconds']:.6f}"),
+            ("images_per_second", "gauge", "Conversion throughput.", f"{s['images_per_sec']:.6f}"),
+            ("input_megabytes_per_second", "gauge", "Input throughput.", f"{s['input_mb_per_sec']:.6f}"),
+        ):
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {kind}", f"{p}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path):
+        """Writes metrics_text() atomically, so a scraper never reads a half-written file."""
+        with atomic_output(path) as tmp:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(self.metrics_text())
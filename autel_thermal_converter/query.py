@@ -0,0 +1,273 @@
+"""Point, rectangle and polygon temperature queries across many images.
+
+    regions = [Point(120, 80, "valve"), Rect(0, 0, 63, 31, "panel"),
+               Polygon([(300, 200), (340, 210), (320, 260)], "roof")]
+    result = query_images(files, regions, jobs=8)
+    result.max[:, 1]          # max temperature of "panel" in every frame
+
+Regions are compiled once into one array of flat pixel indices, sorted by
+region (RegionMasks). A frame is then answered with one gather and three
+`reduceat` calls, whatever the number of regions. Each image is decoded at
+most once, through the converter (and its decode cache, if any); stored
+data is used instead when it exists: a stack (`query_stack`) or converted
+TIFFs (band 4). Nothing is written.
+
+Coordinates are pixels, (x, y) from the top-left corner, like min_point and
+max_point in the metadata. Rectangles include both corners; a polygon holds
+the pixels inside it by the even-odd rule, with half-open edges so that
+adjacent polygons never share a pixel. Invalid pixels are left out of every
+statistic.
+"""
+import csv
+import functools
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from . import encoding
+from .batch import run_tasks
+from .converter import THERMAL_HEIGHT, THERMAL_WIDTH, ThermalConverter
+
+TIFF_SUFFIXES = (".tif", ".tiff")
+
+@dataclass
+class Point:
+    x: int
+    y: int
+    name: str = None
+    kind = "point"
+
+    def mask(self, height: int, width: int) -> np.ndarray:
+        if not (0 <= self.x < width and 0 <= self.y < height):
+            raise ValueError(f"Point ({self.x}, {self.y}) is outside the {width}x{height} image")
+        return np.array([self.y * width + self.x])
+
+@dataclass
+class Rect:
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    name: str = None
+    kind = "rect"
+
+    def mask(self, height: int, width: int) -> np.ndarray:
+        x0, x1 = sorted((self.x0, self.x1))
+        y0, y1 = sorted((self.y0, self.y1))
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width - 1), min(y1, height - 1)
+        if x0 > x1 or y0 > y1:
+            raise ValueError(f"Rect ({self.x0}, {self.y0}, {self.x1}, {self.y1}) is outside the {width}x{height} image")
+        ys, xs = np.mgrid[y0:y1 + 1, x0:x1 + 1]
+        return (ys * width + xs).ravel()
+
+@dataclass
+class Polygon:
+    vertices: list
+    name: str = None
+    kind = "polygon"
+
+    def mask(self, height: int, width: int) -> np.ndarray:
+        vertices = np.asarray(self.vertices, dtype=np.float64)
+        if vertices.ndim != 2 or vertices.shape[0] < 3 or vertices.shape[1] != 2:
+            raise ValueError("A polygon needs at least 3 (x, y) vertices")
+        # Only the bounding box is tested, one vectorized pass per edge
+        x0, y0 = np.maximum(np.floor(vertices.min(axis=0)).astype(int), 0)
+        x1 = min(int(np.ceil(vertices[:, 0].max())), width - 1)
+        y1 = min(int(np.ceil(vertices[:, 1].max())), height - 1)
+        if x0 > x1 or y0 > y1:
+            return np.array([], dtype=np.int64)
+        ys, xs = np.mgrid[y0:y1 + 1, x0:x1 + 1]
+        inside = np.zeros(xs.shape, dtype=bool)
+        for (ax, ay), (bx, by) in zip(vertices, np.roll(vertices, -1, axis=0)):
+            if ay == by:
+                continue
+            crosses = (ay > ys) != (by > ys)
+            inside ^= crosses & (xs < ax + (ys - ay) * (bx - ax) / (by - ay))
+        return (ys * width + xs)[inside]
+
+def parse_region(spec: dict):
+    """Builds a region from {"point": [x, y]}, {"rect": [x0, y0, x1, y1]} or {"polygon": [[x, y], ...]},
+    with an optional "name"."""
+    name = spec.get("name")
+    if "point" in spec:
+        return Point(*(int(v) for v in spec["point"]), name=name)
+    if "rect" in spec:
+        return Rect(*(int(v) for v in spec["rect"]), name=name)
+    if "polygon" in spec:
+        return Polygon([(float(x), float(y)) for x, y in spec["polygon"]], name=name)
+    raise ValueError(f"Unknown region {spec}: expected a 'point', 'rect' or 'polygon' key")
+
+def load_regions(path) -> list:
+    """Reads a JSON list of region specs (see parse_region)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [parse_region(spec) for spec in json.load(f)]
+
+class RegionMasks:
+    """The pixels of every region, compiled once into one sorted flat index.
+
+    `index` holds the flat pixel indices of region 0, then region 1, and so
+    on; `starts` the offset of each region in it. Overlapping regions simply
+    repeat pixels.
+    """
+
+    def __init__(self, regions, height: int = THERMAL_HEIGHT, width: int = THERMAL_WIDTH):
+        if not regions:
+            raise ValueError("No regions to query")
+        self.regions = list(regions)
+        self.names = [r.name or f"{r.kind}_{i}" for i, r in enumerate(self.regions)]
+        self.shape = (height, width)
+        masks = [r.mask(height, width) for r in self.regions]
+        for name, mask in zip(self.names, masks):
+            if mask.size == 0:
+                raise ValueError(f"Region '{name}' contains no pixels")
+        self.pixels = np.array([m.size for m in masks])
+        self.starts = np.concatenate(([0], np.cumsum(self.pixels)[:-1]))
+        self.index = np.concatenate(masks).astype(np.intp)
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def reduce(self, values: np.ndarray) -> np.ndarray:
+        """Per-region (value, min, max, mean, valid pixels) of gathered values.
+
+        `values` is (..., len(index)) float32 with NaN for invalid pixels; the
+        result is (..., regions, 5). For points, value is the pixel; for
+        areas, it is the mean.
+        """
+        valid = ~np.isnan(values)
+        counts = np.add.reduceat(valid, self.starts, axis=-1, dtype=np.int64)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), self.starts, axis=-1, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = sums / counts
+            lo = np.fmin.reduceat(values, self.starts, axis=-1)
+            hi = np.fmax.reduceat(values, self.starts, axis=-1)
+        return np.stack([mean, lo, hi, mean, counts], axis=-1)
+
+    def query(self, temperature: np.ndarray) -> np.ndarray:
+        """Stats of one (H, W) °C grid (NaN = invalid): (regions, 5)."""
+        if temperature.shape != self.shape:
+            raise ValueError(f"Expected a {self.shape} grid, got {temperature.shape}")
+        return self.reduce(temperature.reshape(-1)[self.index])
+
+@dataclass
+class QueryResult:
+    """Stats of every region in every frame, as (frames, regions) arrays."""
+    frames: list
+    regions: list
+    kinds: list
+    stats: np.ndarray  # (frames, regions, 5): value, min, max, mean, valid pixels
+    valid: np.ndarray = field(default=None)  # (frames,) False where the frame could not be read
+    errors: dict = field(default_factory=dict)  # frame -> error message
+
+    COLUMNS = ("value", "min", "max", "mean", "pixels")
+
+    @property
+    def value(self) -> np.ndarray:
+        return self.stats[..., 0]
+
+    @property
+    def min(self) -> np.ndarray:
+        return self.stats[..., 1]
+
+    @property
+    def max(self) -> np.ndarray:
+        return self.stats[..., 2]
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.stats[..., 3]
+
+    @property
+    def pixels(self) -> np.ndarray:
+        return np.nan_to_num(self.stats[..., 4]).astype(np.int64)  # 0 for unreadable frames
+
+    def rows(self):
+        """Yields one dict per (frame, region), frames in order; unreadable frames are left out."""
+        for f, frame in enumerate(self.frames):
+            if not self.valid[f]:
+                continue
+            for r, region in enumerate(self.regions):
+                value, lo, hi, mean, pixels = self.stats[f, r]
+                yield {"frame": frame, "region": region, "kind": self.kinds[r],
+                       "value": _rounded(value), "min": _rounded(lo), "max": _rounded(hi),
+                       "mean": _rounded(mean), "pixels": int(pixels)}
+
+    def write_csv(self, f):
+        """Writes rows() as CSV to an open text file."""
+        writer = csv.DictWriter(f, fieldnames=("frame", "region", "kind") + self.COLUMNS)
+        writer.writeheader()
+        writer.writerows(self.rows())
+
+def _rounded(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+def _invalid_to_nan(temperature: np.ndarray) -> np.ndarray:
+    temperature[temperature <= encoding.INVALID_TEMPERATURE] = np.nan
+    return temperature
+
+class _QueryWorker:
+    """Per-process region masks, temperature buffer and converter (created for the first JPG)."""
+
+    def __init__(self, converter_factory, masks: RegionMasks):
+        self.masks = masks
+        self.converter_factory = converter_factory
+        self.converter = None
+        self.buffer = np.empty(masks.shape, dtype=np.float32)
+
+    def load(self, path: str) -> np.ndarray:
+        if Path(path).suffix.lower() in TIFF_SUFFIXES:
+            from .tiff import read_thermal_band
+            return encoding.decode_temperature(read_thermal_band(path, mmap=True), self.buffer, invalid_nan=True)
+        if self.converter is None:
+            self.converter = self.converter_factory()
+        temperature = self.converter.read_temperature(path, out=self.buffer)
+        if temperature is None:
+            raise RuntimeError("Decode failed")
+        return _invalid_to_nan(temperature)
+
+def _query_task(worker, path):
+    return worker.masks.query(worker.load(path))
+
+def query_images(paths, regions, jobs: int = 1, converter_factory=ThermalConverter, chunksize: int = None) -> QueryResult:
+    """Queries `regions` in every image of `paths` (JPGs, or converted TIFFs read from band 4).
+
+    Each image is decoded once, in `jobs` worker processes. Frames that fail
+    are marked in `valid` and `errors` instead of stopping the query.
+    """
+    paths = [str(p) for p in paths]
+    masks = regions if isinstance(regions, RegionMasks) else RegionMasks(regions)
+    stats = np.full((len(paths), len(masks), 5), np.nan, dtype=np.float64)
+    valid = np.zeros(len(paths), dtype=bool)
+    errors = {}
+    factory = functools.partial(_QueryWorker, converter_factory, masks)
+    for i, result in enumerate(run_tasks(_query_task, paths, jobs, factory, chunksize)):
+        if isinstance(result, Exception):
+            errors[paths[i]] = str(result)
+            continue
+        stats[i] = result
+        valid[i] = True
+    return QueryResult(paths, masks.names, [r.kind for r in masks.regions], stats, valid, errors)
+
+def query_stack(stack_dir, regions, frames=None, chunk: int = 256) -> QueryResult:
+    """Queries `regions` in a stack (see stack) without decoding anything.
+
+    Only the region pixels are read from the memory map and decoded, for
+    `chunk` frames at a time. `frames` selects frame numbers (default: all).
+    """
+    from .stack import StackReader
+
+    reader = StackReader(stack_dir)
+    masks = regions if isinstance(regions, RegionMasks) else RegionMasks(regions, *reader.thermal.shape[1:])
+    frames = np.arange(len(reader)) if frames is None else np.asarray(frames)
+    flat = reader.thermal.reshape(len(reader), -1)
+    stats = np.full((len(frames), len(masks), 5), np.nan, dtype=np.float64)
+    for start in range(0, len(frames), chunk):
+        selected = frames[start:start + chunk]
+        # Reads only the region pixels of each frame
+        encoded = flat[np.ix_(selected, masks.index)]
+        stats[start:start + chunk] = masks.reduce(encoding.decode_temperature(encoded, invalid_nan=True))
+    valid = reader.index["valid"][frames]
+    names = [str(n) for n in reader.names[frames]]
+    return QueryResult(names, masks.names, [r.kind for r in masks.regions], stats, valid)
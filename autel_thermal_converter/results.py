@@ -0,0 +1,17 @@
+"""The per-file outcome shared by the batch engine, the server and its client.
+
+Kept free of NumPy and the DLL wrapper so `autel-convert submit` starts instantly.
+"""
+from dataclasses import dataclass
+
+@dataclass
+class ConversionResult:
+    """Outcome of converting one input file."""
+    input_path: str
+    output_path: str
+    success: bool
+    metadata: dict = None
+    error: str = None
+    skipped: bool = False
+    timings: dict = None  # see profiling; None if not converted
+    histogram: tuple = None  # (first value, counts) of the encoded thermal band, with collect_histogram
@@ -0,0 +1,230 @@
+"""Long-running conversion server with a warm pool of converters, and its client.
+
+Every `autel-convert` call pays for the Python start, loading the SDK and
+OpenCV DLLs and initializing the SDK. `autel-convert serve` pays once: it
+keeps a pool of worker processes, each holding a loaded converter, and takes
+jobs over a local TCP port or Unix socket.
+
+The protocol is one JSON object per line, in both directions:
+
+    {"op": "convert", "items": [[input, output], ...], "stream": true}
+        streamed: one {"type": "result", ...ConversionResult fields} per item,
+                  in order, then {"type": "done", "count": n, "success": m}
+        blocking: a single {"type": "done", "count": n, "success": m, "results": [...]}
+    {"op": "ping"}      -> {"type": "pong", "version": ..., "backend": ..., "jobs": n, "served": n}
+    {"op": "shutdown"}  -> {"type": "bye"}
+
+A bad request gets {"type": "error", "error": "..."}. Paths are opened by the
+server, so clients send absolute paths. There is no authentication: bind to
+localhost (the default) or a Unix socket.
+"""
+import dataclasses
+import functools
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import threading
+
+from . import __version__
+from .results import ConversionResult
+
+# The batch engine (NumPy, the DLL wrapper) is imported by the server side
+# only, so ConversionClient and `autel-convert submit` stay light.
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+def parse_address(address: str) -> tuple:
+    """Parses "unix:/path/to.sock" or "host:port" into (socket family, address)."""
+    if address.startswith("unix:"):
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("Unix sockets are not available on this platform; use host:port")
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"Invalid address '{address}': expected host:port or unix:/path")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+def _init_warm_worker(converter_factory):
+    from . import batch
+
+    batch._init_worker(converter_factory)
+    load = getattr(batch._worker_converter, "load", None)
+    if load is not None:
+        try:
+            load()
+        except Exception as e:
+            batch._worker_converter = None
+            batch._worker_error = f"Failed to initialize converter: {e}"
+
+def _result_record(result: ConversionResult) -> dict:
+    record = {"type": "result"}
+    record.update(dataclasses.asdict(result))
+    return record
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # A connection may carry several requests, one per line
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+            except (json.JSONDecodeError, AttributeError):
+                self._send({"type": "error", "error": "Request must be a JSON object"})
+                continue
+            if op == "convert":
+                self._convert(request)
+            elif op == "ping":
+                self._send(self.server.owner.info())
+            elif op == "shutdown":
+                self._send({"type": "bye"})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            else:
+                self._send({"type": "error", "error": f"Unknown op '{op}'"})
+
+    def _send(self, obj):
+        self.wfile.write(json.dumps(obj).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def _convert(self, request):
+        try:
+            items = [(str(i), str(o)) for i, o in request.get("items", [])]
+        except (TypeError, ValueError):
+            self._send({"type": "error", "error": "items must be a list of [input, output] pairs"})
+            return
+        stream = bool(request.get("stream", False))
+        results = []
+        success = 0
+        for result in self.server.owner.convert(items):
+            success += result.success
+            if stream:
+                self._send(_result_record(result))
+            else:
+                results.append(_result_record(result))
+        done = {"type": "done", "count": len(items), "success": success}
+        if not stream:
+            done["results"] = results
+        self._send(done)
+
+class ConversionServer:
+    """Serves conversion jobs from a pool of `jobs` warm worker processes.
+
+    Concurrent clients share the pool; each client's results come back in the
+    order it submitted them.
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, jobs: int = 1, converter_factory=None, backend: str = None):
+        if converter_factory is None:
+            from .converter import ThermalConverter
+            converter_factory = ThermalConverter
+        from .batch import resolve_jobs
+
+        self.address = address
+        self.jobs = resolve_jobs(jobs)
+        self.backend = backend
+        self.served = 0
+        self._lock = threading.Lock()
+
+        family, bind_address = parse_address(address)
+        server_class = _TCPServer if family == socket.AF_INET else _UnixServer
+        self._server = server_class(bind_address, _Handler)
+        self._server.owner = self
+        self._pool = multiprocessing.Pool(self.jobs, initializer=_init_warm_worker, initargs=(converter_factory,))
+
+    @property
+    def server_address(self):
+        return self._server.server_address
+
+    def info(self) -> dict:
+        return {"type": "pong", "version": __version__, "backend": self.backend, "jobs": self.jobs,
+                "served": self.served}
+
+    def convert(self, items):
+        """Yields a ConversionResult per (input, output) pair, in order."""
+        from . import batch
+
+        task = functools.partial(batch._safe_task, batch._convert_task)
+        for (input_path, output_path), result in zip(items, self._pool.imap(task, items)):
+            if isinstance(result, Exception):
+                result = ConversionResult(input_path, output_path, False, error=str(result))
+            with self._lock:
+                self.served += 1
+            yield result
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        """Stops serve_forever (call from another thread)."""
+        self._server.shutdown()
+
+    def close(self):
+        self._server.server_close()
+        self._pool.terminate()
+        self._pool.join()
+        if self._server.address_family != socket.AF_INET:
+            try:
+                os.remove(self._server.server_address)
+            except OSError:
+                pass
+
+class ConversionClient:
+    """Submits jobs to a running ConversionServer."""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: float = None):
+        self.family, self.address = parse_address(address)
+        self.timeout = timeout
+
+    def _request(self, request: dict):
+        with socket.socket(self.family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+            with sock.makefile("rwb") as stream:
+                stream.write(json.dumps(request).encode("utf-8") + b"\n")
+                stream.flush()
+                for line in stream:
+                    reply = json.loads(line)
+                    if reply.get("type") == "error":
+                        raise RuntimeError(reply["error"])
+                    yield reply
+                    if reply.get("type") in ("done", "pong", "bye"):
+                        return
+
+    def convert_stream(self, pairs):
+        """Yields a ConversionResult per (input, output) pair as the server finishes it."""
+        items = [[str(i), str(o)] for i, o in pairs]
+        for reply in self._request({"op": "convert", "items": items, "stream": True}):
+            if reply["type"] == "result":
+                reply.pop("type")
+                yield ConversionResult(**reply)
+
+    def convert(self, pairs) -> list:
+        """Blocks until every pair is converted; returns the ConversionResults in order."""
+        items = [[str(i), str(o)] for i, o in pairs]
+        done = list(self._request({"op": "convert", "items": items, "stream": False}))[-1]
+        results = []
+        for record in done["results"]:
+            record.pop("type")
+            results.append(ConversionResult(**record))
+        return results
+
+    def ping(self) -> dict:
+        return next(self._request({"op": "ping"}))
+
+    def shutdown(self):
+        list(self._request({"op": "shutdown"}))
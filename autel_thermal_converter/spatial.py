@@ -0,0 +1,256 @@
+"""Spatial index of a flight: which frames cover a point or an area.
+
+Positions come from each JPG's own header (see exif): GPS latitude,
+longitude and altitude, plus the height above takeoff and the gimbal angles
+from the XMP packet when the camera records them. From the height and the
+camera's field of view, each frame gets an approximate ground footprint (a
+nadir view rotated by the gimbal yaw), kept as a latitude/longitude bounding
+box. Frames without a height are indexed as points; find them with `near`.
+
+SpatialIndex puts the footprints in a uniform grid, stored in CSR form
+(`cell_offsets`, `cell_frames`): a lookup only reads the cells under the
+query, then filters the few candidate frames exactly. The index is one .npz
+(spatial_index.npz) that loads in milliseconds for hundreds of thousands of
+frames.
+
+Frames are identified by their path relative to the input folder, like the
+names in dataset_metadata.jsonl. `paths` joins them to a root folder, so
+lookups can be fed back into conversion (--paths-from) or `query`.
+"""
+import re
+from pathlib import Path
+
+import numpy as np
+
+from .batch import run_tasks
+from .exif import read_exif
+from .fileutil import atomic_output
+
+SPATIAL_INDEX_NAME = "spatial_index.npz"
+
+# Horizontal and vertical field of view in degrees (640x512 thermal core, 13 mm lens)
+DEFAULT_FOV = (33.0, 26.5)
+METERS_PER_DEGREE = 111_320.0
+
+POSITION_FIELDS = ("latitude", "longitude", "altitude", "relative_altitude", "yaw", "pitch")
+BOUND_FIELDS = ("south", "west", "north", "east")
+
+# XMP names of the fields that GPS does not carry, in order of preference
+_XMP_FIELDS = {
+    "relative_altitude": (b"RelativeAltitude",),
+    "yaw": (b"GimbalYawDegree", b"FlightYawDegree"),
+    "pitch": (b"GimbalPitchDegree",),
+}
+_NUMBER = rb'\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)'
+
+def _xmp_number(xmp: bytes, names) -> float:
+    # Matches both the attribute (ns:Name="1.5") and the element (<ns:Name>1.5<) forms
+    for name in names:
+        match = re.search(rb'[\s<:]' + name + rb'(?:\s*=\s*["\']|>)' + _NUMBER, xmp)
+        if match:
+            return float(match.group(1))
+    return None
+
+def read_position(path) -> dict:
+    """Position of a frame from its JPG header, or None without a GPS fix.
+
+    {"latitude", "longitude", "altitude"} from GPS and, when the XMP packet
+    has them, {"relative_altitude", "yaw", "pitch"}; missing values are None.
+    """
+    exif = read_exif(path)
+    gps = exif.gps_position() if exif else None
+    if gps is None:
+        return None
+    position = dict(zip(("latitude", "longitude", "altitude"), gps))
+    for key, names in _XMP_FIELDS.items():
+        position[key] = _xmp_number(exif.xmp or b"", names)
+    return position
+
+def footprint_bounds(latitude, longitude, height, yaw, fov=DEFAULT_FOV) -> tuple:
+    """(south, west, north, east) of the ground footprints of nadir frames; arrays in, arrays out.
+
+    `height` is above the ground in meters (NaN: a point footprint), `yaw` in
+    degrees clockwise from north (NaN: 0).
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    height = np.nan_to_num(np.abs(np.asarray(height, dtype=np.float64)))
+    yaw = np.radians(np.nan_to_num(np.asarray(yaw, dtype=np.float64)))
+    half_width = height * np.tan(np.radians(fov[0]) / 2)
+    half_height = height * np.tan(np.radians(fov[1]) / 2)
+    # Half extents of the rotated rectangle along east and north, in meters
+    east = np.abs(half_width * np.cos(yaw)) + np.abs(half_height * np.sin(yaw))
+    north = np.abs(half_width * np.sin(yaw)) + np.abs(half_height * np.cos(yaw))
+    dlat = north / METERS_PER_DEGREE
+    dlon = east / (METERS_PER_DEGREE * np.cos(np.radians(latitude)))
+    return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+
+def frames_dtype(name_length: int) -> np.dtype:
+    return np.dtype([("name", f"U{max(1, name_length)}")] + [(f, "f8") for f in POSITION_FIELDS + BOUND_FIELDS])
+
+class SpatialIndex:
+    """Grid index over the frame footprints of a dataset.
+
+    `frames` is a structured array (name, POSITION_FIELDS, BOUND_FIELDS; NaN
+    for missing values); lookups return indices into it, in frame order.
+    """
+
+    def __init__(self, frames: np.ndarray, origin, cell, shape, cell_offsets, cell_frames, root=None,
+                 fov=DEFAULT_FOV):
+        self.frames = frames
+        self.origin = tuple(float(v) for v in origin)  # (south, west) of the grid
+        self.cell = tuple(float(v) for v in cell)  # cell size in degrees (latitude, longitude)
+        self.shape = tuple(int(v) for v in shape)  # (rows, columns)
+        self.cell_offsets = cell_offsets
+        self.cell_frames = cell_frames
+        self.root = root
+        self.fov = tuple(fov)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @classmethod
+    def build(cls, entries, fov=DEFAULT_FOV, cell_size: float = None, root=None) -> "SpatialIndex":
+        """Indexes (name, position) pairs (see read_position); pairs without a position are left out.
+
+        `cell_size` is in meters; by default about one footprint, or one frame
+        per cell for point footprints.
+        """
+        entries = [(name, position) for name, position in entries if position]
+        frames = np.zeros(len(entries), dtype=frames_dtype(max((len(n) for n, _ in entries), default=1)))
+        frames["name"] = [name for name, _ in entries]
+        for field in POSITION_FIELDS:
+            frames[field] = [np.nan if p.get(field) is None else p[field] for _, p in entries]
+        bounds = footprint_bounds(frames["latitude"], frames["longitude"], frames["relative_altitude"],
+                                  frames["yaw"], fov)
+        for field, values in zip(BOUND_FIELDS, bounds):
+            frames[field] = values
+        if not len(frames):
+            return cls(frames, (0, 0), (1, 1), (0, 0), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                       root, fov)
+
+        south, west = frames["south"].min(), frames["west"].min()
+        span_lat = (frames["north"].max() - south) * METERS_PER_DEGREE
+        meters_per_lon = METERS_PER_DEGREE * np.cos(np.radians(frames["latitude"].mean()))
+        span_lon = (frames["east"].max() - west) * meters_per_lon
+        if cell_size is None:
+            sizes = np.maximum(frames["north"] - frames["south"], 0) * METERS_PER_DEGREE
+            cell_size = float(np.median(sizes)) if sizes.any() else np.sqrt(span_lat * span_lon / len(frames))
+        cell_size = max(cell_size, 1.0)
+        # No more than ~4 cells per frame, so the offsets stay small
+        cells = (span_lat / cell_size + 1) * (span_lon / cell_size + 1)
+        if cells > 4 * len(frames) + 64:
+            cell_size *= np.sqrt(cells / (4 * len(frames) + 64))
+        cell = (cell_size / METERS_PER_DEGREE, cell_size / meters_per_lon)
+        shape = (int(span_lat // cell_size) + 1, int(span_lon // cell_size) + 1)
+
+        index = cls(frames, (south, west), cell, shape, None, None, root, fov)
+        r0, r1, c0, c1 = index._cell_range(frames["south"], frames["west"], frames["north"], frames["east"])
+        # Expand every frame to the cells under its footprint, then sort by cell
+        widths = c1 - c0 + 1
+        counts = (r1 - r0 + 1) * widths
+        owners = np.repeat(np.arange(len(frames)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_ids = (r0[owners] + local // widths[owners]) * shape[1] + c0[owners] + local % widths[owners]
+        order = np.argsort(cell_ids, kind="stable")
+        index.cell_frames = owners[order]
+        index.cell_offsets = np.concatenate(([0], np.cumsum(np.bincount(cell_ids, minlength=shape[0] * shape[1]))))
+        return index
+
+    def _cell_range(self, south, west, north, east) -> tuple:
+        rows, columns = self.shape
+        r0 = np.clip(np.floor((np.asarray(south) - self.origin[0]) / self.cell[0]), 0, rows - 1).astype(np.int64)
+        r1 = np.clip(np.floor((np.asarray(north) - self.origin[0]) / self.cell[0]), 0, rows - 1).astype(np.int64)
+        c0 = np.clip(np.floor((np.asarray(west) - self.origin[1]) / self.cell[1]), 0, columns - 1).astype(np.int64)
+        c1 = np.clip(np.floor((np.asarray(east) - self.origin[1]) / self.cell[1]), 0, columns - 1).astype(np.int64)
+        return r0, r1, c0, c1
+
+    def _candidates(self, south, west, north, east) -> np.ndarray:
+        """Frames in the grid cells under a box (a superset of the answer)."""
+        if not len(self.frames):
+            return np.zeros(0, dtype=np.int64)
+        r0, r1, c0, c1 = (int(v) for v in self._cell_range(south, west, north, east))
+        columns = self.shape[1]
+        # The cells of a row are contiguous in the CSR arrays: one slice per row
+        pieces = [self.cell_frames[self.cell_offsets[r * columns + c0]:self.cell_offsets[r * columns + c1 + 1]]
+                  for r in range(r0, r1 + 1)]
+        return np.unique(np.concatenate(pieces))
+
+    def within(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """Frames whose footprint intersects the box."""
+        candidates = self._candidates(south, west, north, east)
+        f = self.frames[candidates]
+        hit = (f["south"] <= north) & (f["north"] >= south) & (f["west"] <= east) & (f["east"] >= west)
+        return candidates[hit]
+
+    def covering(self, latitude: float, longitude: float) -> np.ndarray:
+        """Frames whose footprint contains the point."""
+        return self.within(latitude, longitude, latitude, longitude)
+
+    def near(self, latitude: float, longitude: float, radius: float) -> np.ndarray:
+        """Frames whose position is within `radius` meters of the point, nearest first."""
+        dlat = radius / METERS_PER_DEGREE
+        dlon = radius / (METERS_PER_DEGREE * np.cos(np.radians(latitude)))
+        candidates = self._candidates(latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon)
+        distance = self.distances(latitude, longitude, candidates)
+        order = np.argsort(distance, kind="stable")
+        return candidates[order][distance[order] <= radius]
+
+    def distances(self, latitude: float, longitude: float, frames=None) -> np.ndarray:
+        """Ground distance in meters from the point to frame positions (equirectangular; fine up to a few km)."""
+        f = self.frames if frames is None else self.frames[frames]
+        north = (f["latitude"] - latitude) * METERS_PER_DEGREE
+        east = (f["longitude"] - longitude) * METERS_PER_DEGREE * np.cos(np.radians(latitude))
+        return np.hypot(north, east)
+
+    def paths(self, frames, root=None) -> list:
+        """Paths of frames: their names joined to `root` (default: the folder the index was built from)."""
+        root = root if root is not None else self.root
+        names = self.frames["name"][frames]
+        return [Path(root) / name if root else Path(name) for name in names]
+
+    def save(self, path):
+        with atomic_output(path) as tmp:
+            with open(tmp, 'wb') as f:
+                np.savez(f, frames=self.frames, origin=self.origin, cell=self.cell, shape=self.shape,
+                         cell_offsets=self.cell_offsets, cell_frames=self.cell_frames, fov=self.fov,
+                         root=np.array(str(self.root) if self.root else ""))
+
+    @classmethod
+    def load(cls, path) -> "SpatialIndex":
+        """Loads an index file, or the spatial_index.npz of a folder."""
+        path = Path(path)
+        if path.is_dir():
+            path = path / SPATIAL_INDEX_NAME
+        with np.load(path) as data:
+            root = str(data["root"]) or None
+            return cls(data["frames"], data["origin"], data["cell"], data["shape"], data["cell_offsets"],
+                       data["cell_frames"], root, tuple(data["fov"]))
+
+def positions_from_records(records) -> list:
+    """(name, position) pairs of metadata records (see metadata_writer.iter_records); the last record of a name wins."""
+    positions = {}
+    for record in records:
+        if "name" in record:
+            positions.pop(record["name"], None)
+            positions[record["name"]] = record.get("position")
+    return list(positions.items())
+
+class _PositionReader:
+    """Worker object of `scan_positions`: reads JPG headers only."""
+
+    def read(self, path):
+        return read_position(path)
+
+def _position_task(reader, path):
+    return reader.read(path)
+
+def scan_positions(found, jobs: int = 1) -> list:
+    """(relative name, position) of (path, relative_path) pairs, read from the JPG headers in `jobs` processes.
+
+    Frames that cannot be read get None.
+    """
+    found = list(found)
+    results = run_tasks(_position_task, [str(p) for p, _ in found], jobs, converter_factory=_PositionReader)
+    return [(relative, None if isinstance(position, Exception) else position)
+            for (_, relative), position in zip(found, results)]
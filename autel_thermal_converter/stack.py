@@ -0,0 +1,198 @@
+"""Whole-flight stacked arrays with memory-mapped random access.
+
+Instead of one TIFF per image, a stack directory holds:
+
+*   `thermal.npy`: (N, 512, 640) uint16, the encoded thermal band of every
+    frame ((T * 100) + 10000, exactly as band 4 of the TIFFs).
+*   `rgb.npy`: optional (N, 512, 640, 3) uint8 visual images.
+*   `index.npy`: structured array mapping frame number to source file name,
+    conversion status and stats (see metadata_writer.STATS_COLUMNS).
+*   `stack.json`: shape, encoding constants and format version.
+
+The arrays are preallocated as .npy memory maps. Each worker process writes
+its frames straight into its slot, so no pixel data passes through the parent.
+StackReader maps the files read-only and gives O(1) access to any frame or
+slice without decoding anything.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from . import encoding
+from .batch import ConversionResult, run_tasks
+from .converter import THERMAL_HEIGHT, THERMAL_WIDTH, ThermalConverter
+from .fileutil import atomic_output
+from .metadata_writer import STATS_COLUMNS, stats_row
+
+THERMAL_NAME = "thermal.npy"
+RGB_NAME = "rgb.npy"
+INDEX_NAME = "index.npy"
+HEADER_NAME = "stack.json"
+STACK_VERSION = 1
+
+def index_dtype(name_length: int) -> np.dtype:
+    fields = [("frame", "i8"), ("name", f"U{max(1, name_length)}"), ("valid", "?")]
+    fields += [(c, "f4" if c in ("min", "max", "avg") else "i4") for c in STATS_COLUMNS]
+    return np.dtype(fields)
+
+# Memory maps opened by this process for the stack being written, reused
+# across its frames. Pool workers drop theirs when the pool exits; the writer
+# closes the ones opened in-process (jobs=1) when write_frames finishes.
+_open_maps = {}
+
+def _open_map(path: str) -> np.ndarray:
+    # Keyed by inode too, so a stack rewritten at the same path is not served a stale map
+    st = os.stat(path)
+    key = (st.st_ino, st.st_size)
+    entry = _open_maps.get(path)
+    if entry is None or entry[0] != key:
+        _close_maps(path)
+        entry = _open_maps[path] = (key, np.load(path, mmap_mode='r+'))
+    return entry[1]
+
+def _close_maps(*paths):
+    for path in paths:
+        entry = _open_maps.pop(path, None)
+        if entry is not None:
+            entry[1].flush()
+
+def _stack_task(converter, item):
+    frame_index, input_path, thermal_path, rgb_path = item
+    frame = converter.decode(input_path)
+    if frame is None:
+        return None
+    encoding.encode_temperature(frame.temperature, out=_open_map(thermal_path)[frame_index])
+    if rgb_path:
+        _open_map(rgb_path)[frame_index] = frame.rgb
+    return frame.metadata
+
+class StackWriter:
+    """Writes frames into a preallocated stack directory.
+
+    `names` (e.g. the relative paths from discovery) identify the frames in
+    the index; the file names are used if not given.
+
+    Usage:
+
+        with StackWriter("flight_stack", files, include_rgb=True) as writer:
+            for result in writer.write_frames(jobs=8):
+                ...
+    """
+
+    def __init__(self, stack_dir, files, include_rgb: bool = False,
+                 height: int = THERMAL_HEIGHT, width: int = THERMAL_WIDTH, names=None):
+        self.stack_dir = Path(stack_dir)
+        self.stack_dir.mkdir(parents=True, exist_ok=True)
+        self.files = [str(f) for f in files]
+        self.include_rgb = include_rgb
+        count = len(self.files)
+
+        self.thermal_path = self.stack_dir / THERMAL_NAME
+        self.rgb_path = self.stack_dir / RGB_NAME if include_rgb else None
+        np.lib.format.open_memmap(self.thermal_path, mode='w+', dtype=np.uint16, shape=(count, height, width)).flush()
+        if include_rgb:
+            np.lib.format.open_memmap(self.rgb_path, mode='w+', dtype=np.uint8, shape=(count, height, width, 3)).flush()
+
+        # Relative paths from discovery keep frames from different folders apart; file names otherwise
+        names = [str(n) for n in names] if names is not None else [Path(f).name for f in self.files]
+        if len(names) != count:
+            raise ValueError(f"Got {len(names)} names for {count} files")
+        self.index = np.zeros(count, dtype=index_dtype(max((len(n) for n in names), default=1)))
+        self.index["frame"] = np.arange(count)
+        self.index["name"] = names
+        self.header = {
+            "version": STACK_VERSION,
+            "count": count,
+            "height": height,
+            "width": width,
+            "rgb": include_rgb,
+            "encoding": {
+                "scale": float(encoding.ENCODING_SCALE),
+                "offset": float(encoding.ENCODING_OFFSET),
+                "version": encoding.ENCODING_VERSION,
+            },
+        }
+
+    def write_frames(self, jobs: int = 1, converter_factory=ThermalConverter, chunksize: int = None):
+        """Decodes every file into its slot. Yields a ConversionResult per frame, in order.
+
+        The converter must provide `decode(input_path)` (ThermalConverter and
+        BackendConverter both do).
+        """
+        rgb_path = str(self.rgb_path) if self.rgb_path else None
+        items = [(i, f, str(self.thermal_path), rgb_path) for i, f in enumerate(self.files)]
+        try:
+            yield from self._record(items, run_tasks(_stack_task, items, jobs, converter_factory, chunksize))
+        finally:
+            _close_maps(str(self.thermal_path), rgb_path)
+
+    def _record(self, items, results):
+        for (i, input_path, _, _), meta in zip(items, results):
+            output = f"{self.thermal_path}[{i}]"
+            if isinstance(meta, Exception) or meta is None:
+                error = str(meta) if isinstance(meta, Exception) else "Decode failed"
+                yield ConversionResult(input_path, output, False, error=error)
+                continue
+            self.index["valid"][i] = True
+            row = stats_row(meta.get("stats") or {})
+            for column, value in zip(STATS_COLUMNS, row):
+                self.index[column][i] = value if value is not None else -1
+            yield ConversionResult(input_path, output, True, meta)
+
+    def close(self):
+        """Writes the frame index and header; the stack is complete after this."""
+        with atomic_output(self.stack_dir / INDEX_NAME) as tmp:
+            np.save(tmp, self.index)
+        with atomic_output(self.stack_dir / HEADER_NAME) as tmp:
+            with open(tmp, 'w') as f:
+                json.dump(self.header, f, indent=4)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+
+class StackReader:
+    """Read-only, memory-mapped access to a stack directory.
+
+    `reader[i]` and `reader[a:b]` return encoded uint16 frames as memmap views
+    (no copy, no decode); `temperature(i)` converts to °C on demand.
+    """
+
+    def __init__(self, stack_dir):
+        self.stack_dir = Path(stack_dir)
+        with open(self.stack_dir / HEADER_NAME, 'r') as f:
+            self.header = json.load(f)
+        self.thermal = np.load(self.stack_dir / THERMAL_NAME, mmap_mode='r')
+        self.rgb = np.load(self.stack_dir / RGB_NAME, mmap_mode='r') if self.header.get("rgb") else None
+        self.index = np.load(self.stack_dir / INDEX_NAME)
+        self._frames_by_name = None
+
+    def __len__(self) -> int:
+        return self.thermal.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        return self.thermal[key]
+
+    @property
+    def names(self) -> np.ndarray:
+        return self.index["name"]
+
+    def frame_of(self, name: str) -> int:
+        """Frame number of a source file, by its name in the index (KeyError if absent)."""
+        if self._frames_by_name is None:
+            self._frames_by_name = {str(n): i for i, n in enumerate(self.index["name"])}
+        return self._frames_by_name[name]
+
+    def temperature(self, key, out: np.ndarray = None) -> np.ndarray:
+        """Frame(s) decoded to float32 °C."""
+        return encoding.decode_temperature(self.thermal[key], out=out)
+
+    def rgb_frame(self, key) -> np.ndarray:
+        if self.rgb is None:
+            raise ValueError("This stack was written without RGB")
+        return self.rgb[key]
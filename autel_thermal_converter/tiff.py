@@ -0,0 +1,551 @@
+"""Pure-NumPy TIFF writer for the converter's output layout.
+
+By default it produces the same band layout as cv::imwrite in ConvertToTiff:
+a single image, 16-bit unsigned samples, R, G, B, thermal interleaved per
+pixel (PlanarConfiguration = 1), with the thermal band flagged as an extra
+sample. Single-band images are written as grayscale.
+
+TiffOptions adds Deflate/LZW/ZSTD compression, the horizontal predictor,
+tiled layout, BigTIFF, a thermal-only single-band mode and overview levels
+(see preview).
+
+`read_tiff` reads the images back: this writer's output in every option
+combination and the DLL's (OpenCV/libtiff, LZW with the predictor).
+`read_thermal_band(path, mmap=True)` maps band 4 of uncompressed files
+instead of reading them, and `read_thermal_bands` loads many files into one
+array, optionally as °C.
+"""
+import io
+import mmap as mmap_module
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import compression as codecs
+from . import encoding
+
+# Tag codes
+NEW_SUBFILE_TYPE = 254
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+PHOTOMETRIC = 262
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+PLANAR_CONFIG = 284
+SOFTWARE = 305
+PREDICTOR = 317
+TILE_WIDTH = 322
+TILE_LENGTH = 323
+TILE_OFFSETS = 324
+TILE_BYTE_COUNTS = 325
+EXTRA_SAMPLES = 338
+SAMPLE_FORMAT = 339
+XMP = 700
+EXIF_IFD = 34665
+GPS_IFD = 34853
+
+# Field types
+BYTE, ASCII, SHORT, LONG, RATIONAL = 1, 2, 3, 4, 5
+SBYTE, UNDEFINED, SSHORT, SLONG, SRATIONAL = 6, 7, 8, 9, 10
+FLOAT, DOUBLE, IFD = 11, 12, 13
+LONG8, SLONG8, IFD8 = 16, 17, 18
+
+_TYPE_FORMATS = {
+    BYTE: 'B', ASCII: 'B', SHORT: 'H', LONG: 'I', RATIONAL: 'I',
+    SBYTE: 'b', UNDEFINED: 'B', SSHORT: 'h', SLONG: 'i', SRATIONAL: 'i',
+    FLOAT: 'f', DOUBLE: 'd', IFD: 'I', LONG8: 'Q', SLONG8: 'q', IFD8: 'Q',
+}
+_TYPE_SIZES = {t: struct.calcsize('<' + f) for t, f in _TYPE_FORMATS.items()}
+
+PHOTOMETRIC_MINISBLACK = 1
+PHOTOMETRIC_RGB = 2
+
+_SAMPLE_FORMATS = {'u': 1, 'i': 2, 'f': 3}
+_SAMPLE_KINDS = {code: kind for kind, code in _SAMPLE_FORMATS.items()}
+
+def _encode_values(field_type, values) -> tuple:
+    """Returns (count, payload) for a tag value."""
+    if field_type == ASCII:
+        if isinstance(values, str):
+            values = values.encode('ascii', 'replace')
+        payload = bytes(values)
+        if not payload.endswith(b'\0'):
+            payload += b'\0'
+        return len(payload), payload
+    if field_type in (BYTE, UNDEFINED) and isinstance(values, (bytes, bytearray)):
+        return len(values), bytes(values)
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    if field_type in (RATIONAL, SRATIONAL):
+        flat = [int(v) for pair in values for v in pair]
+        count = len(values)
+    else:
+        flat = list(values)
+        count = len(flat)
+    return count, struct.pack(f'<{len(flat)}{_TYPE_FORMATS[field_type]}', *flat)
+
+# Uncompressed output is one strip (memory-mappable); compressed strips target this size
+_STRIP_BYTES = 64 * 1024
+
+@dataclass
+class TiffOptions:
+    """Output options of the NumPy TIFF writer.
+
+    compression: "none", "deflate", "lzw" or "zstd".
+    predictor: horizontal differencing before compression (better ratios on thermal data);
+        ignored without compression.
+    tile: tile edge in pixels (multiple of 16) for tiled layout, None for strips.
+    bigtiff: write BigTIFF (64-bit offsets).
+    thermal_only: write only the encoded thermal band as a single-band image.
+    level: Deflate/ZSTD compression level.
+    overviews: downsampling factors of reduced-resolution pages written after
+        the image, e.g. (2, 4, 8); same layout and compression as the image.
+    """
+    compression: str = "none"
+    predictor: bool = False
+    tile: int = None
+    bigtiff: bool = False
+    thermal_only: bool = False
+    level: int = 6
+    overviews: tuple = ()
+
+    def __post_init__(self):
+        if self.compression not in codecs.COMPRESSION_CODES:
+            raise ValueError(f"Unknown compression '{self.compression}'. Choose from: {', '.join(codecs.COMPRESSION_CODES)}")
+        if self.tile is not None and (self.tile <= 0 or self.tile % 16):
+            raise ValueError("Tile size must be a positive multiple of 16")
+        self.overviews = tuple(int(f) for f in self.overviews)
+        if any(f < 2 for f in self.overviews):
+            raise ValueError("Overview factors must be at least 2")
+
+    @property
+    def uses_predictor(self) -> bool:
+        return self.predictor and self.compression != "none"
+
+    @property
+    def is_default(self) -> bool:
+        """True if no option is set, so the DLL can write the TIFF itself.
+
+        The DLL's TIFFs (cv::imwrite) are LZW with the horizontal predictor;
+        the NumPy writer writes TiffOptions() uncompressed. The band layout is
+        the same.
+        """
+        return self == TiffOptions()
+
+class _Format:
+    """Classic TIFF vs BigTIFF field sizes."""
+
+    def __init__(self, bigtiff: bool):
+        self.bigtiff = bigtiff
+        if bigtiff:
+            self.count_fmt, self.offset_fmt, self.offset_type = 'Q', 'Q', LONG8
+            self.inline_size, self.entry_size = 8, 20
+        else:
+            self.count_fmt, self.offset_fmt, self.offset_type = 'H', 'I', LONG
+            self.inline_size, self.entry_size = 4, 12
+
+    def header(self) -> bytes:
+        if self.bigtiff:
+            return b'II' + struct.pack('<HHHQ', 43, 8, 0, 0)
+        return b'II' + struct.pack('<HI', 42, 0)
+
+    @property
+    def first_ifd_pointer(self) -> int:
+        return 8 if self.bigtiff else 4
+
+def _pad(buf):
+    # Keep every offset word-aligned, as required by the TIFF spec
+    if buf.tell() % 2:
+        buf.write(b'\0')
+
+def _write_ifd(buf, tags, fmt: _Format = None) -> tuple:
+    """Writes an IFD at the current (aligned) position.
+
+    `tags` is a list of (code, type, values). Values that do not fit inline
+    are written right after the IFD. The next-IFD pointer is written as 0.
+    Returns (ifd_offset, position of the next-IFD pointer).
+    """
+    fmt = fmt or _Format(False)
+    _pad(buf)
+    ifd_offset = buf.tell()
+    entries = sorted(tags, key=lambda t: t[0])
+    count_size = struct.calcsize('<' + fmt.count_fmt)
+    offset_size = struct.calcsize('<' + fmt.offset_fmt)
+    data_offset = ifd_offset + count_size + fmt.entry_size * len(entries) + offset_size
+    overflow = io.BytesIO()
+
+    buf.write(struct.pack('<' + fmt.count_fmt, len(entries)))
+    for code, field_type, values in entries:
+        count, payload = _encode_values(field_type, values)
+        head = struct.pack('<HH' + fmt.offset_fmt, code, field_type, count)
+        if len(payload) <= fmt.inline_size:
+            buf.write(head + payload.ljust(fmt.inline_size, b'\0'))
+        else:
+            if overflow.tell() % 2:
+                overflow.write(b'\0')
+            buf.write(head + struct.pack('<' + fmt.offset_fmt, data_offset + overflow.tell()))
+            overflow.write(payload)
+    next_pointer = buf.tell()
+    buf.write(struct.pack('<' + fmt.offset_fmt, 0))
+    buf.write(overflow.getvalue())
+    return ifd_offset, next_pointer
+
+def image_tags(image: np.ndarray, photometric=None, subfile_type: int = 0) -> list:
+    """Basic image structure tags (size, samples, format) for an (H, W) or (H, W, S) array.
+
+    `subfile_type` 1 marks a reduced-resolution copy (an overview).
+    """
+    height, width = image.shape[:2]
+    samples = image.shape[2] if image.ndim == 3 else 1
+    if photometric is None:
+        photometric = PHOTOMETRIC_RGB if samples >= 3 else PHOTOMETRIC_MINISBLACK
+    tags = [
+        (NEW_SUBFILE_TYPE, LONG, subfile_type),
+        (IMAGE_WIDTH, LONG, width),
+        (IMAGE_LENGTH, LONG, height),
+        (BITS_PER_SAMPLE, SHORT, [image.dtype.itemsize * 8] * samples),
+        (PHOTOMETRIC, SHORT, photometric),
+        (SAMPLES_PER_PIXEL, SHORT, samples),
+        (PLANAR_CONFIG, SHORT, 1),
+        (SAMPLE_FORMAT, SHORT, [_SAMPLE_FORMATS[image.dtype.kind]] * samples),
+    ]
+    base_samples = 3 if photometric == PHOTOMETRIC_RGB else 1
+    if samples > base_samples:
+        # Unspecified extra samples: the thermal band is data, not alpha
+        tags.append((EXTRA_SAMPLES, SHORT, [0] * (samples - base_samples)))
+    return tags
+
+def _rows_per_strip(image: np.ndarray, options: TiffOptions) -> int:
+    height = image.shape[0]
+    if options.compression == "none":
+        return height
+    return max(1, min(height, _STRIP_BYTES // image[0].nbytes))
+
+def _chunks(image: np.ndarray, options: TiffOptions):
+    """Yields the strips or tiles of `image` in TIFF order."""
+    height, width = image.shape[:2]
+    if options.tile:
+        size = options.tile
+        for y in range(0, height, size):
+            for x in range(0, width, size):
+                tile = image[y:y + size, x:x + size]
+                if tile.shape[:2] != (size, size):
+                    # Edge tiles are always full size, zero padded
+                    padded = np.zeros((size, size) + image.shape[2:], dtype=image.dtype)
+                    padded[:tile.shape[0], :tile.shape[1]] = tile
+                    tile = padded
+                yield tile
+        return
+
+    rows = _rows_per_strip(image, options)
+    for y in range(0, height, rows):
+        yield image[y:y + rows]
+
+def _layout_tags(image: np.ndarray, options: TiffOptions, offsets, byte_counts, fmt: _Format) -> list:
+    tags = [(COMPRESSION, SHORT, codecs.COMPRESSION_CODES[options.compression])]
+    if options.uses_predictor:
+        tags.append((PREDICTOR, SHORT, codecs.PREDICTOR_HORIZONTAL))
+    if options.tile:
+        tags += [
+            (TILE_WIDTH, LONG, options.tile),
+            (TILE_LENGTH, LONG, options.tile),
+            (TILE_OFFSETS, fmt.offset_type, offsets),
+            (TILE_BYTE_COUNTS, fmt.offset_type, byte_counts),
+        ]
+    else:
+        tags += [
+            (STRIP_OFFSETS, fmt.offset_type, offsets),
+            (ROWS_PER_STRIP, LONG, _rows_per_strip(image, options)),
+            (STRIP_BYTE_COUNTS, fmt.offset_type, byte_counts),
+        ]
+    return tags
+
+def _write_image_data(buf, image: np.ndarray, options: TiffOptions) -> tuple:
+    """Writes the (compressed) strips or tiles. Returns (offsets, byte_counts)."""
+    code = codecs.COMPRESSION_CODES[options.compression]
+    offsets, byte_counts = [], []
+    for chunk in _chunks(image, options):
+        if options.uses_predictor:
+            chunk = codecs.predictor_encode(chunk)
+        data = codecs.compress(np.ascontiguousarray(chunk).tobytes(), code, options.level)
+        _pad(buf)
+        offsets.append(buf.tell())
+        byte_counts.append(len(data))
+        buf.write(data)
+    return offsets, byte_counts
+
+def _prepare_image(image: np.ndarray) -> np.ndarray:
+    image = np.ascontiguousarray(image)
+    if image.ndim not in (2, 3):
+        raise ValueError(f"Expected a 2D or 3D array, got shape {image.shape}")
+    if image.dtype.kind not in _SAMPLE_FORMATS:
+        raise ValueError(f"Unsupported dtype {image.dtype}")
+    return image.astype(image.dtype.newbyteorder('<'), copy=False)
+
+def encode_tiff(image: np.ndarray, options: TiffOptions = None, photometric=None, software: str = None,
+                extra_tags=(), sub_ifds=None) -> bytes:
+    """Encodes an (H, W) or (H, W, S) array as a TIFF.
+
+    With default options the file is uncompressed with a single strip, like
+    the DLL output. `options.thermal_only` is applied by the caller (see
+    `select_bands`); this function writes whatever bands it is given.
+    `extra_tags` is a list of (code, type, values) added to the image IFD.
+    `sub_ifds` maps a pointer tag (e.g. EXIF_IFD, GPS_IFD) to the tags of a
+    private IFD written before the image IFD and referenced by that tag.
+    Overview pages follow the image, each one chained from the previous IFD.
+    """
+    options = options or TiffOptions()
+    fmt = _Format(options.bigtiff)
+    image = _prepare_image(image)
+
+    buf = io.BytesIO()
+    buf.write(fmt.header())
+
+    # Pixel data first, so the IFD can be written with final offsets
+    offsets, byte_counts = _write_image_data(buf, image, options)
+
+    tags = image_tags(image, photometric)
+    tags += _layout_tags(image, options, offsets, byte_counts, fmt)
+    if software:
+        tags.append((SOFTWARE, ASCII, software))
+    tags += list(extra_tags)
+    for pointer_tag, ifd_tags in (sub_ifds or {}).items():
+        sub_offset, _ = _write_ifd(buf, ifd_tags, fmt)
+        tags.append((pointer_tag, fmt.offset_type, sub_offset))
+
+    ifd_offset, next_pointer = _write_ifd(buf, tags, fmt)
+    buf.seek(fmt.first_ifd_pointer)
+    buf.write(struct.pack('<' + fmt.offset_fmt, ifd_offset))
+
+    if options.overviews:
+        from .preview import downsample_bands
+
+    for factor in options.overviews:
+        buf.seek(0, io.SEEK_END)
+        level = downsample_bands(image, factor)
+        offsets, byte_counts = _write_image_data(buf, level, options)
+        tags = image_tags(level, photometric, subfile_type=1)
+        tags += _layout_tags(level, options, offsets, byte_counts, fmt)
+        ifd_offset, pointer = _write_ifd(buf, tags, fmt)
+        buf.seek(next_pointer)
+        buf.write(struct.pack('<' + fmt.offset_fmt, ifd_offset))
+        next_pointer = pointer
+    return buf.getvalue()
+
+def select_bands(bands: np.ndarray, options: TiffOptions = None) -> np.ndarray:
+    """Applies `thermal_only` to (H, W, 4) encoded bands: returns band 4 alone or all bands."""
+    if options is not None and options.thermal_only:
+        return bands[..., 3]
+    return bands
+
+def write_tiff(path, image: np.ndarray, options: TiffOptions = None, photometric=None, software: str = None,
+               extra_tags=(), sub_ifds=None) -> int:
+    """Writes `image` to `path` as a TIFF. Returns the number of bytes written."""
+    data = encode_tiff(image, options, photometric, software, extra_tags, sub_ifds)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+def _read_header(data) -> tuple:
+    """Returns (byte order, bigtiff, offset of the first IFD)."""
+    byteorder = {b'II': '<', b'MM': '>'}.get(bytes(data[:2]))
+    if byteorder is None:
+        raise ValueError("Not a TIFF file")
+    version = struct.unpack_from(byteorder + 'H', data, 2)[0]
+    if version == 42:
+        return byteorder, False, struct.unpack_from(byteorder + 'I', data, 4)[0]
+    if version == 43:
+        return byteorder, True, struct.unpack_from(byteorder + 'Q', data, 8)[0]
+    raise ValueError(f"Unsupported TIFF version {version}")
+
+def read_ifd_entries(data, offset: int, byteorder: str = '<', bigtiff: bool = False) -> tuple:
+    """Parses the IFD at `offset`, keeping field types. Returns ({code: (type, values)}, next IFD offset or 0).
+
+    Values are tuples of numbers (pairs for rationals) and raw bytes for
+    ASCII (without the trailing NUL) and UNDEFINED, ready to be written back
+    by `encode_tiff`. Entries of unknown types are skipped.
+    """
+    fmt = _Format(bigtiff)
+    count = struct.unpack_from(byteorder + fmt.count_fmt, data, offset)[0]
+    position = offset + struct.calcsize(fmt.count_fmt)
+    entries = {}
+    for _ in range(count):
+        code, field_type, n = struct.unpack_from(byteorder + 'HH' + fmt.offset_fmt, data, position)
+        value_position = position + fmt.entry_size - fmt.inline_size
+        position += fmt.entry_size
+        if field_type not in _TYPE_FORMATS:
+            continue
+        items = n * 2 if field_type in (RATIONAL, SRATIONAL) else n
+        size = items * _TYPE_SIZES[field_type]
+        if size > fmt.inline_size:
+            value_position = struct.unpack_from(byteorder + fmt.offset_fmt, data, value_position)[0]
+        if field_type == ASCII:
+            values = bytes(data[value_position:value_position + size]).split(b'\0', 1)[0]
+        elif field_type == UNDEFINED:
+            values = bytes(data[value_position:value_position + size])
+        else:
+            values = struct.unpack_from(f'{byteorder}{items}{_TYPE_FORMATS[field_type]}', data, value_position)
+            if field_type in (RATIONAL, SRATIONAL):
+                values = tuple(zip(values[::2], values[1::2]))
+        entries[code] = (field_type, values)
+    next_offset = struct.unpack_from(byteorder + fmt.offset_fmt, data, position)[0]
+    return entries, next_offset
+
+def read_ifd(data, offset: int, byteorder: str = '<', bigtiff: bool = False) -> tuple:
+    """Parses the IFD at `offset`. Returns ({code: values}, offset of the next IFD or 0).
+
+    Values are tuples of numbers (pairs for rationals), str for ASCII and
+    bytes for UNDEFINED. Entries of unknown types are skipped.
+    """
+    entries, next_offset = read_ifd_entries(data, offset, byteorder, bigtiff)
+    tags = {code: values.decode('ascii', 'replace') if field_type == ASCII else values
+            for code, (field_type, values) in entries.items()}
+    return tags, next_offset
+
+def _decode_image(data, tags: dict, byteorder: str) -> np.ndarray:
+    width = tags[IMAGE_WIDTH][0]
+    height = tags[IMAGE_LENGTH][0]
+    samples = tags.get(SAMPLES_PER_PIXEL, (1,))[0]
+    bits = set(tags.get(BITS_PER_SAMPLE, (1,)))
+    kinds = {_SAMPLE_KINDS.get(v) for v in tags.get(SAMPLE_FORMAT, (1,))}
+    if len(bits) != 1 or len(kinds) != 1 or None in kinds or bits.pop() not in (8, 16, 32, 64):
+        raise ValueError("Unsupported sample layout (mixed or non-byte-sized samples)")
+    dtype = np.dtype(f"{byteorder}{kinds.pop()}{max(tags[BITS_PER_SAMPLE]) // 8}")
+    compression = tags.get(COMPRESSION, (codecs.COMPRESSION_NONE,))[0]
+    predictor = tags.get(PREDICTOR, (codecs.PREDICTOR_NONE,))[0]
+    if predictor not in (codecs.PREDICTOR_NONE, codecs.PREDICTOR_HORIZONTAL):
+        raise ValueError(f"Unsupported TIFF predictor {predictor}")
+    planar = tags.get(PLANAR_CONFIG, (1,))[0] == 2
+
+    if TILE_OFFSETS in tags:
+        chunk_width, chunk_height = tags[TILE_WIDTH][0], tags[TILE_LENGTH][0]
+        offsets, byte_counts = tags[TILE_OFFSETS], tags[TILE_BYTE_COUNTS]
+    else:
+        chunk_width, chunk_height = width, min(tags.get(ROWS_PER_STRIP, (height,))[0], height)
+        offsets, byte_counts = tags[STRIP_OFFSETS], tags[STRIP_BYTE_COUNTS]
+    across = -(-width // chunk_width)
+    down = -(-height // chunk_height)
+    chunk_samples = 1 if planar else samples
+
+    image = np.empty((height, width, samples), dtype=dtype.newbyteorder('='))
+    for index, (offset, byte_count) in enumerate(zip(offsets, byte_counts)):
+        plane, rest = divmod(index, across * down)
+        y = (rest // across) * chunk_height
+        x = (rest % across) * chunk_width
+        # Strips end at the image edge; tiles are always full size
+        rows = chunk_height if TILE_OFFSETS in tags else min(chunk_height, height - y)
+        raw = codecs.decompress(bytes(data[offset:offset + byte_count]), compression)
+        chunk = np.frombuffer(raw, dtype=dtype, count=rows * chunk_width * chunk_samples)
+        chunk = chunk.reshape(rows, chunk_width, chunk_samples).astype(image.dtype)
+        if predictor == codecs.PREDICTOR_HORIZONTAL:
+            codecs.predictor_decode(chunk)
+        band = slice(plane, plane + 1) if planar else slice(None)
+        image[y:y + rows, x:x + chunk_width, band] = chunk[:height - y, :width - x]
+    return image[..., 0] if samples == 1 else image
+
+def _page_tags(data, page: int, path) -> tuple:
+    """Returns (tags of image number `page`, byte order)."""
+    byteorder, bigtiff, offset = _read_header(data)
+    for _ in range(page):
+        _, offset = read_ifd(data, offset, byteorder, bigtiff)
+        if not offset:
+            raise IndexError(f"{path} has no page {page}")
+    tags, _ = read_ifd(data, offset, byteorder, bigtiff)
+    return tags, byteorder
+
+def read_tiff(path, page: int = 0) -> np.ndarray:
+    """Reads image number `page` of a TIFF as an (H, W) or (H, W, S) array.
+
+    Handles classic TIFF and BigTIFF, either byte order, strips and tiles,
+    chunky and planar layouts, and every compression and predictor the
+    writer supports.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    tags, byteorder = _page_tags(data, page, path)
+    return _decode_image(data, tags, byteorder)
+
+def tiff_compression(path, page: int = 0) -> int:
+    """The Compression tag of image number `page` (1 = uncompressed), read without touching the pixels."""
+    with open(path, 'rb') as f:
+        data = mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ)
+    with data:
+        tags, _ = _page_tags(data, page, path)
+    return tags.get(COMPRESSION, (codecs.COMPRESSION_NONE,))[0]
+
+def _mapped_last_band(data, tags: dict, byteorder: str) -> np.ndarray:
+    """The last band of uncompressed 16-bit strips stored back to back, as a view into `data`; else None."""
+    if tags.get(COMPRESSION, (codecs.COMPRESSION_NONE,))[0] != codecs.COMPRESSION_NONE or TILE_OFFSETS in tags:
+        return None
+    if set(tags.get(BITS_PER_SAMPLE, (1,))) != {16} or set(tags.get(SAMPLE_FORMAT, (1,))) != {1}:
+        return None
+    width, height = tags[IMAGE_WIDTH][0], tags[IMAGE_LENGTH][0]
+    samples = tags.get(SAMPLES_PER_PIXEL, (1,))[0]
+    offsets, byte_counts = tags[STRIP_OFFSETS], tags[STRIP_BYTE_COUNTS]
+    if tags.get(PLANAR_CONFIG, (1,))[0] == 2:
+        # The strips of the last plane
+        per_plane = len(offsets) // samples
+        offsets, byte_counts, samples = offsets[-per_plane:], byte_counts[-per_plane:], 1
+    count = height * width * samples
+    start = offsets[0]
+    if not np.array_equal(offsets, start + np.cumsum((0,) + tuple(byte_counts[:-1]))):
+        return None
+    if sum(byte_counts) < count * 2 or start + count * 2 > len(data):
+        return None
+    block = np.frombuffer(data, dtype=np.dtype(byteorder + 'u2'), count=count, offset=start)
+    return block.reshape(height, width, samples)[..., -1]
+
+def read_thermal_band(path, mmap: bool = False) -> np.ndarray:
+    """The encoded uint16 thermal band of a converted TIFF (band 4, or the only band).
+
+    With `mmap`, uncompressed strip layouts (what the NumPy writer produces
+    without compression) are returned as a read-only view into the
+    memory-mapped file: no copy is made and only the pages that are used are
+    read. On Windows the file cannot be replaced while the view is alive.
+    Other files (e.g. the DLL's LZW output) are decoded as usual; LZW takes
+    over a second per frame without imagecodecs (see compression).
+    """
+    if not mmap:
+        image = read_tiff(path)
+        return image if image.ndim == 2 else image[..., -1]
+    with open(path, 'rb') as f:
+        data = mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ)
+    tags, byteorder = _page_tags(data, 0, path)
+    band = _mapped_last_band(data, tags, byteorder)
+    if band is None:
+        image = _decode_image(data, tags, byteorder)
+        band = image if image.ndim == 2 else image[..., -1]
+    return band
+
+def read_thermal_bands(paths, out: np.ndarray = None, celsius: bool = False) -> np.ndarray:
+    """Thermal bands of many converted TIFFs of the same size, as one (N, H, W) array.
+
+    Each file is memory-mapped when its layout allows and copied (or decoded
+    to °C) straight into `out`, allocated if not given: uint16 encoded
+    values, or float32 °C with invalid pixels as NaN if `celsius`.
+    """
+    paths = list(paths)
+    dtype = np.dtype(np.float32 if celsius else np.uint16)
+    if out is not None:
+        if out.dtype != dtype:
+            raise ValueError(f"out must be {dtype}{' with celsius' if celsius else ''}, got {out.dtype}")
+        if out.ndim != 3 or out.shape[0] != len(paths):
+            raise ValueError(f"out must be ({len(paths)}, H, W), got {out.shape}")
+    for i, path in enumerate(paths):
+        band = read_thermal_band(path, mmap=True)
+        if out is None:
+            out = np.empty((len(paths),) + band.shape, dtype=dtype)
+        if band.shape != out.shape[1:]:
+            raise ValueError(f"{path}: band is {band.shape}, expected {out.shape[1:]}")
+        if celsius:
+            encoding.decode_temperature(band, out=out[i], invalid_nan=True)
+        else:
+            np.copyto(out[i], band)
+    if out is None:
+        out = np.empty((0, 0, 0), dtype=dtype)
+    return out
@@ -0,0 +1,275 @@
+"""Watch-folder ingest: converts images as they land in a folder.
+
+`autel-convert watch INPUT OUTPUT` polls INPUT (one os.scandir pass per
+interval, as in discovery) instead of re-running a whole conversion from
+cron. A file counts as arrived once its size and mtime have not changed for
+`settle` seconds, so a JPG still being copied off a card is never read half
+written. Arrived files go to a pool of warm workers as soon as they are found
+and their results are recorded as each one finishes, in completion order:
+
+*   the manifest, so a restarted watcher skips what is already converted;
+*   the metadata JSONL and stats CSV (MetadataWriter), one record per image.
+
+WatchStats tracks the queue (files settling, and files waiting for or in
+conversion) and the end-to-end latency of each image, from the first scan
+that saw it to its TIFF being in place. Card copy tools often keep the
+capture time as mtime, so latency is not measured from mtime.
+
+Only files not yet handed out are stat()ed on each scan, so a landing folder
+that keeps thousands of converted images costs one directory listing per
+interval.
+"""
+import collections
+import multiprocessing
+import os
+import signal
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from . import batch
+from .batch import ConversionResult, resolve_jobs
+from .discovery import DEFAULT_INCLUDE, iter_inputs, output_path_for
+from .fileutil import atomic_output
+from .manifest import STATUS_FAILED, STATUS_OK
+from .profiling import METRIC_PREFIX
+from .server import _init_warm_worker
+
+DEFAULT_SETTLE = 2.0
+DEFAULT_INTERVAL = 0.5
+# Latencies kept for the percentiles
+LATENCY_WINDOW = 1000
+
+@dataclass
+class _Candidate:
+    size: int
+    mtime_ns: int
+    changed: float  # monotonic time size or mtime was last seen to change
+    first_seen: float  # wall-clock time of the first scan that saw the file
+
+class ArrivalScanner:
+    """Finds files under `root` whose size and mtime have been stable for `settle` seconds.
+
+    Each file is returned by `scan` once. A file needs two scans at least
+    `settle` seconds apart, so even with settle=0 it is seen unchanged once.
+    Empty files are never ready.
+    """
+
+    def __init__(self, root, settle: float = DEFAULT_SETTLE, recursive: bool = False, include=DEFAULT_INCLUDE,
+                 exclude=(), shard: tuple = None):
+        self.root = Path(root)
+        self.settle = settle
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.shard = shard
+        self.pending = {}  # relative path -> _Candidate, still settling
+        self.handed_out = set()
+
+    def scan(self) -> list:
+        """One pass over the folder. Returns (path, relative_path, first_seen) of the newly arrived files."""
+        now = time.monotonic()
+        ready = []
+        present = set()
+        for path, relative in iter_inputs(self.root, self.recursive, self.include, self.exclude, self.shard):
+            if relative in self.handed_out:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # removed between the listing and the stat
+            present.add(relative)
+            candidate = self.pending.get(relative)
+            if candidate is None:
+                self.pending[relative] = _Candidate(st.st_size, st.st_mtime_ns, now, time.time())
+            elif (candidate.size, candidate.mtime_ns) != (st.st_size, st.st_mtime_ns):
+                candidate.size, candidate.mtime_ns, candidate.changed = st.st_size, st.st_mtime_ns, now
+            elif st.st_size > 0 and now - candidate.changed >= self.settle:
+                del self.pending[relative]
+                self.handed_out.add(relative)
+                ready.append((path, relative, candidate.first_seen))
+        # Files that disappeared while settling (e.g. a cancelled copy)
+        for relative in self.pending.keys() - present:
+            del self.pending[relative]
+        return ready
+
+@dataclass
+class WatchStats:
+    """Queue depth, outcomes and end-to-end latency (seconds) of a watch session."""
+    settling: int = 0
+    queued: int = 0
+    converted: int = 0
+    failed: int = 0
+    skipped: int = 0
+    latencies: collections.deque = field(default_factory=lambda: collections.deque(maxlen=LATENCY_WINDOW))
+
+    def latency(self) -> dict:
+        """p50/p95/max over the last LATENCY_WINDOW images, or None before the first one."""
+        if not self.latencies:
+            return None
+        values = np.array(self.latencies)
+        return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+                "max": float(values.max())}
+
+    def status_line(self) -> str:
+        line = (f"📥 {self.queued} queued, {self.settling} settling | ✅ {self.converted} converted, "
+                f"❌ {self.failed} failed, ⏭️  {self.skipped} skipped")
+        latency = self.latency()
+        if latency:
+            line += f" | latency p50 {latency['p50']:.1f}s p95 {latency['p95']:.1f}s"
+        return line
+
+    def metrics_text(self) -> str:
+        """The stats in the Prometheus text exposition format."""
+        p = f"{METRIC_PREFIX}_watch"
+        lines = []
+        for name, kind, help_text, value in (
+            ("queue_depth", "gauge", "Arrived images waiting for or in conversion.", self.queued),
+            ("settling", "gauge", "Files seen but not yet stable.", self.settling),
+            ("converted_total", "counter", "Images converted.", self.converted),
+            ("failed_total", "counter", "Images that failed to convert.", self.failed),
+            ("skipped_total", "counter", "Arrived images already converted (manifest).", self.skipped),
+        ):
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {kind}", f"{p}_{name} {value}"]
+        latency = self.latency()
+        if latency:
+            lines += [f"# HELP {p}_latency_seconds Time from first seeing an image to its TIFF being written.",
+                      f"# TYPE {p}_latency_seconds summary"]
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("1", "max")):
+                lines.append(f'{p}_latency_seconds{{quantile="{quantile}"}} {latency[key]:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path):
+        """Writes metrics_text() atomically, so a scraper never reads a half-written file."""
+        with atomic_output(path) as tmp:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(self.metrics_text())
+
+def _init_watch_worker(converter_factory):
+    # Ctrl+C goes to the whole process group; the parent drains in-flight work instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_warm_worker(converter_factory)
+
+class FolderIngest:
+    """Converts the images arriving in `input_dir` into `output_dir` with `jobs` warm workers.
+
+    Call `poll` repeatedly (or `run`). Each call scans once, submits the
+    arrived files and returns the ConversionResults finished since the last
+    call, after recording them in `manifest` and `writer` (both optional).
+    Outputs mirror the input folders, as in directory mode. With jobs == 1
+    conversions run in the calling process, inside `poll`.
+    """
+
+    def __init__(self, input_dir, output_dir, converter_factory, jobs: int = 1, scanner: ArrivalScanner = None,
+                 manifest=None, writer=None):
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        self.scanner = scanner or ArrivalScanner(input_dir)
+        self.manifest = manifest
+        self.writer = writer
+        self.jobs = resolve_jobs(jobs)
+        self.stats = WatchStats()
+        # (pair, relative path, first seen, AsyncResult or None), in submission order
+        self._in_flight = collections.deque()
+        self._pool = None
+        if self.jobs == 1:
+            batch._init_worker(converter_factory)
+        else:
+            self._pool = multiprocessing.Pool(self.jobs, initializer=_init_watch_worker,
+                                              initargs=(converter_factory,))
+
+    def poll(self) -> list:
+        for path, relative, first_seen in self.scanner.scan():
+            output_path = output_path_for(self.output_dir, relative)
+            if self.manifest is not None and self.manifest.is_current(path, output_path):
+                self.stats.skipped += 1
+                continue
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            pair = (str(path), str(output_path))
+            pending = None
+            if self._pool is not None:
+                pending = self._pool.apply_async(batch._safe_task, (batch._convert_task, pair))
+            self._in_flight.append((pair, relative, first_seen, pending))
+        self.stats.settling = len(self.scanner.pending)
+        self.stats.queued = len(self._in_flight)
+        return self._collect()
+
+    def _collect(self, wait: bool = False) -> list:
+        finished = []
+        still_running = collections.deque()
+        while self._in_flight:
+            item = self._in_flight.popleft()
+            pair, relative, first_seen, pending = item
+            if pending is None:
+                result = batch._safe_task(batch._convert_task, pair)
+            elif wait or pending.ready():
+                result = pending.get()
+            else:
+                still_running.append(item)
+                continue
+            if isinstance(result, Exception):
+                result = ConversionResult(pair[0], pair[1], False, error=str(result))
+            self._record(result, relative, first_seen)
+            finished.append((relative, result))
+        self._in_flight = still_running
+        self.stats.queued = len(still_running)
+        return finished
+
+    def _record(self, result: ConversionResult, relative: str, first_seen: float):
+        if self.manifest is not None:
+            self.manifest.record(result.input_path, result.output_path, STATUS_OK if result.success else STATUS_FAILED)
+        if result.success:
+            self.stats.converted += 1
+            self.stats.latencies.append(time.time() - first_seen)
+            if result.metadata and self.writer is not None:
+                self.writer.append(relative, result.metadata)
+        else:
+            self.stats.failed += 1
+
+    def drain(self) -> list:
+        """Waits for every submitted conversion and returns their (relative path, result)."""
+        return self._collect(wait=True)
+
+    def run(self, interval: float = DEFAULT_INTERVAL, idle_exit: float = None, on_result=None, on_poll=None):
+        """Polls every `interval` seconds until interrupted (KeyboardInterrupt) or, with `idle_exit`,
+        until no file has been copying, queued or converted for that many seconds.
+
+        `on_result(relative_path, result)` is called for each finished image and
+        `on_poll(stats)` after each scan. In-flight conversions are finished
+        before returning.
+        """
+        last_activity = time.monotonic()
+        try:
+            while True:
+                finished = self.poll()
+                for relative, result in finished:
+                    if on_result is not None:
+                        on_result(relative, result)
+                if on_poll is not None:
+                    on_poll(self.stats)
+                now = time.monotonic()
+                # An empty file left in the folder never settles; it does not keep the watcher busy
+                copying = any(candidate.size for candidate in self.scanner.pending.values())
+                if finished or self.stats.queued or copying:
+                    last_activity = now
+                elif idle_exit is not None and now - last_activity >= idle_exit:
+                    break
+                time.sleep(interval)
+        finally:
+            for relative, result in self.drain():
+                if on_result is not None:
+                    on_result(relative, result)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
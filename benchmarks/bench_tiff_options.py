@@ -0,0 +1,102 @@
+"""Size and write/read throughput of each TIFF output option on synthetic 640x512 frames.
+
+LZW is timed with whichever codec is in use: imagecodecs if installed,
+otherwise the pure-Python one (seconds per frame; run with --frames 2).
+
+Runs anywhere (no SDK needed):
+
+    python benchmarks/bench_tiff_options.py --frames 20 --json tiff_options.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from autel_thermal_converter import encoding  # noqa: E402
+from autel_thermal_converter.compression import has_fast_lzw  # noqa: E402
+from autel_thermal_converter.tiff import TiffOptions, read_tiff, select_bands, write_tiff  # noqa: E402
+
+OPTIONS = {
+    "default (uncompressed, 4 band)": TiffOptions(),
+    "deflate": TiffOptions("deflate"),
+    "deflate + predictor": TiffOptions("deflate", predictor=True),
+    "deflate + predictor, tiled 256": TiffOptions("deflate", predictor=True, tile=256),
+    "lzw + predictor": TiffOptions("lzw", predictor=True),
+    "zstd + predictor": TiffOptions("zstd", predictor=True),
+    "bigtiff, uncompressed": TiffOptions(bigtiff=True),
+    "thermal only, uncompressed": TiffOptions(thermal_only=True),
+    "thermal only, deflate + predictor": TiffOptions("deflate", predictor=True, thermal_only=True),
+    "thermal only, zstd + predictor": TiffOptions("zstd", predictor=True, thermal_only=True),
+}
+
+def synthetic_frame(seed: int, height: int = 512, width: int = 640):
+    """A thermal scene with smooth gradients, hot spots and sensor noise, plus a matching RGB image."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    temps = 18.0 + 6.0 * np.sin(x / 97.0 + seed) + 4.0 * np.cos(y / 61.0)
+    for _ in range(5):
+        cx, cy, r = rng.uniform(0, width), rng.uniform(0, height), rng.uniform(5, 40)
+        temps += 35.0 * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * r * r))
+    temps += rng.normal(0, 0.08, temps.shape)
+    gray = np.clip((temps - temps.min()) / np.ptp(temps) * 255, 0, 255)
+    rgb = np.stack([gray, 255 - gray, np.full_like(gray, 128)], axis=-1)
+    rgb = np.clip(rgb + rng.normal(0, 3, rgb.shape), 0, 255).astype(np.uint8)
+    return temps.astype(np.float32), rgb
+
+def run(frames: int):
+    bands = [encoding.encode_frame(*synthetic_frame(i)) for i in range(frames)]
+    raw_bytes = bands[0].nbytes
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frame.tif")
+        for label, options in OPTIONS.items():
+            try:
+                sizes, elapsed, read_elapsed = [], 0.0, 0.0
+                for b in bands:
+                    start = time.perf_counter()
+                    sizes.append(write_tiff(path, select_bands(b, options), options))
+                    elapsed += time.perf_counter() - start
+                    start = time.perf_counter()
+                    read_tiff(path)
+                    read_elapsed += time.perf_counter() - start
+            except ImportError as e:
+                results.append({"option": label, "skipped": str(e)})
+                continue
+            mean_size = sum(sizes) / len(sizes)
+            results.append({
+                "option": label,
+                "bytes_per_frame": int(mean_size),
+                "ratio_vs_default": raw_bytes / mean_size,
+                "frames_per_sec": frames / elapsed,
+                "input_mb_per_sec": frames * raw_bytes / elapsed / 1e6,
+                "read_frames_per_sec": frames / read_elapsed,
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TIFF output options")
+    parser.add_argument("--frames", type=int, default=10, help="Number of synthetic frames (default: 10)")
+    parser.add_argument("--json", default=None, help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.frames)
+    print(f"LZW codec: {'imagecodecs' if has_fast_lzw() else 'pure Python (slow)'}")
+    print(f"{'option':<36} {'KB/frame':>10} {'ratio':>7} {'frames/s':>9} {'MB/s':>8} {'read/s':>8}")
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['option']:<36} skipped: {r['skipped']}")
+            continue
+        print(f"{r['option']:<36} {r['bytes_per_frame'] / 1024:>10.0f} {r['ratio_vs_default']:>7.2f} "
+              f"{r['frames_per_sec']:>9.1f} {r['input_mb_per_sec']:>8.1f} {r['read_frames_per_sec']:>8.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
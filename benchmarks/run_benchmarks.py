@@ -0,0 +1,265 @@
+"""Per-stage benchmark of the conversion pipeline, with regression gates.
+
+Generates reproducible synthetic 640x512 fixtures (seeded), including the
+invalid values sanitizeTemp() handles (NaN, +/-inf, >= 60000). It then times
+every stage of a conversion separately:
+
+    load           read the input file into memory
+    decode         decode backend (fixture .npz parse + stats, or the SDK)
+    encode         temperature -> uint16 thermal band (incl. sanitize)
+    merge          RGB scaling + 4-band assembly
+    tiff_write     TIFF write with the chosen TiffOptions
+    metadata_json  metadata record to JSONL + stats CSV
+
+Runs anywhere with the fixture backend (no SDK needed):
+
+    python benchmarks/run_benchmarks.py --json results.json
+    python benchmarks/run_benchmarks.py --thresholds benchmarks/thresholds.json --baseline previous.json
+
+Exits with status 1 if a stage breaks its threshold or regresses against the
+baseline, and 2 if an output check fails (e.g. invalid pixels not encoded as 0).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from autel_thermal_converter import __version__, encoding  # noqa: E402
+from autel_thermal_converter.backends import BACKENDS, save_fixture  # noqa: E402
+from autel_thermal_converter.metadata_writer import MetadataWriter  # noqa: E402
+from autel_thermal_converter.tiff import TiffOptions, write_tiff  # noqa: E402
+from bench_tiff_options import synthetic_frame  # noqa: E402
+
+RESULTS_VERSION = 1
+STAGES = ("load", "decode", "encode", "merge", "tiff_write", "metadata_json")
+
+# Values sanitizeTemp() must map to -273.15 (encoded 0)
+INVALID_VALUES = np.array([np.nan, np.inf, -np.inf, 60000.0, 65535.0, 1e9], dtype=np.float32)
+
+def make_fixtures(directory, frames: int, seed: int = 0, invalid_fraction: float = 0.005):
+    """Writes `frames` reproducible fixtures to `directory`. Returns their paths."""
+    directory = Path(directory)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(frames):
+        temps, rgb = synthetic_frame(seed + i)
+        count = int(temps.size * invalid_fraction)
+        positions = rng.choice(temps.size, size=count, replace=False)
+        temps.flat[positions] = INVALID_VALUES[np.arange(count) % len(INVALID_VALUES)]
+        path = directory / f"IRX_{i:04d}.npz"
+        save_fixture(path, temps, rgb)
+        paths.append(path)
+    return paths
+
+def check_encoding(temperature: np.ndarray, band: np.ndarray) -> bool:
+    """Invalid pixels encode to 0 and valid ones to round((T * 100) + 10000)."""
+    invalid = ~np.isfinite(temperature) | (temperature >= encoding.INVALID_THRESHOLD)
+    if band[invalid].any():
+        return False
+    expected = np.clip(temperature[~invalid] * encoding.ENCODING_SCALE + encoding.ENCODING_OFFSET, 0, 65535)
+    return bool(np.all(np.abs(band[~invalid].astype(np.float32) - expected) <= 0.5))
+
+def _summary(samples: list, nbytes: int) -> dict:
+    times = np.array(samples)
+    median = float(np.median(times))
+    return {
+        "median_ms": median * 1e3,
+        "p95_ms": float(np.percentile(times, 95)) * 1e3,
+        "min_ms": float(times.min()) * 1e3,
+        "frames_per_sec": 1.0 / median if median else None,
+        "mb_per_sec": nbytes / median / 1e6 if median else None,
+    }
+
+def run(frames: int = 10, repeat: int = 3, backend: str = "fixture", options: TiffOptions = None, seed: int = 0,
+        inputs: list = None):
+    """Runs the benchmark. Returns the results dict (see RESULTS_VERSION).
+
+    `inputs` replaces the synthetic fixtures with real files (e.g. JPGs for the sdk backend).
+    """
+    options = options or TiffOptions()
+    decoder = BACKENDS[backend]()
+    samples = {stage: [] for stage in STAGES}
+    nbytes = dict.fromkeys(STAGES, 0)
+    checks = {"encoding": True, "decoded": True}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if inputs is None:
+            inputs = make_fixtures(tmp, frames, seed)
+        inputs = [Path(p) for p in inputs]
+        frames = len(inputs)
+        merged = np.empty((512, 640, 4), dtype=np.uint16)
+        tiff_path = tmp / "frame.tif"
+
+        with MetadataWriter(tmp, append=False) as writer:
+            for iteration in range(repeat + 1):
+                warmup = iteration == 0
+                for path in inputs:
+                    timings = {}
+
+                    start = time.perf_counter()
+                    data = path.read_bytes()
+                    timings["load"] = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    frame = decoder.decode(str(path))
+                    timings["decode"] = time.perf_counter() - start
+                    if frame is None:
+                        checks["decoded"] = False
+                        continue
+
+                    start = time.perf_counter()
+                    band = encoding.encode_temperature(frame.temperature)
+                    timings["encode"] = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    encoding.assemble_bands(frame.rgb, band, out=merged)
+                    timings["merge"] = time.perf_counter() - start
+
+                    image = band if options.thermal_only else merged
+                    start = time.perf_counter()
+                    written = write_tiff(tiff_path, image, options)
+                    timings["tiff_write"] = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    writer.append(path.name, frame.metadata)
+                    timings["metadata_json"] = time.perf_counter() - start
+
+                    if warmup:
+                        checks["encoding"] &= check_encoding(frame.temperature, band)
+                        continue
+                    sizes = {
+                        "load": len(data),
+                        "decode": frame.temperature.nbytes + frame.rgb.nbytes,
+                        "encode": frame.temperature.nbytes,
+                        "merge": merged.nbytes,
+                        "tiff_write": written,
+                        "metadata_json": len(json.dumps(frame.metadata)),
+                    }
+                    for stage in STAGES:
+                        samples[stage].append(timings[stage])
+                        nbytes[stage] += sizes[stage]
+
+    count = max(1, frames * repeat)
+    return {
+        "version": RESULTS_VERSION,
+        "environment": {
+            "package": __version__,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "frames": frames,
+            "repeat": repeat,
+            "backend": backend,
+            "seed": seed,
+            "tiff_options": {
+                "compression": options.compression,
+                "predictor": options.predictor,
+                "tile": options.tile,
+                "bigtiff": options.bigtiff,
+                "thermal_only": options.thermal_only,
+            },
+        },
+        "stages": {stage: _summary(samples[stage], nbytes[stage] / count) for stage in STAGES if samples[stage]},
+        "checks": checks,
+    }
+
+def find_regressions(results: dict, thresholds: dict = None, baseline: dict = None) -> list:
+    """Compares results against absolute thresholds and/or a baseline run. Returns messages.
+
+    `thresholds` is {"stages": {stage: {"max_median_ms": x, "max_p95_ms": y}},
+    "max_regression": 0.25, "min_regression_ms": 0.25}. `max_regression` is
+    the allowed relative slowdown of each stage's median versus `baseline`;
+    slowdowns below `min_regression_ms` are treated as timer noise.
+    """
+    thresholds = thresholds or {}
+    problems = []
+    for stage, limits in thresholds.get("stages", {}).items():
+        measured = results["stages"].get(stage)
+        if measured is None:
+            continue
+        for key, metric in (("max_median_ms", "median_ms"), ("max_p95_ms", "p95_ms")):
+            if key in limits and measured[metric] > limits[key]:
+                problems.append(f"{stage}: {metric} {measured[metric]:.2f} > {limits[key]:.2f}")
+
+    if baseline is not None:
+        allowed = thresholds.get("max_regression", 0.25)
+        noise = thresholds.get("min_regression_ms", 0.25)
+        for stage, measured in results["stages"].items():
+            previous = baseline.get("stages", {}).get(stage)
+            if not previous or not previous["median_ms"]:
+                continue
+            change = measured["median_ms"] / previous["median_ms"] - 1.0
+            if change > allowed and measured["median_ms"] - previous["median_ms"] > noise:
+                problems.append(f"{stage}: median {measured['median_ms']:.2f} ms is {change:.0%} slower "
+                                f"than baseline {previous['median_ms']:.2f} ms (allowed {allowed:.0%})")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each conversion stage on synthetic fixtures")
+    parser.add_argument("--frames", type=int, default=10, help="Number of synthetic frames (default: 10)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the frames (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Fixture seed (default: 0)")
+    parser.add_argument("--backend", default="fixture", choices=list(BACKENDS),
+                        help="Decode backend (default: fixture; sdk needs ir_converter.dll and --inputs)")
+    parser.add_argument("--inputs", default=None, metavar="DIR",
+                        help="Benchmark the JPGs in DIR instead of synthetic fixtures")
+    parser.add_argument("--compression", default="none", choices=["none", "deflate", "lzw", "zstd"])
+    parser.add_argument("--predictor", action="store_true")
+    parser.add_argument("--thermal-only", action="store_true")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--thresholds", default=None, help="JSON file of regression thresholds")
+    parser.add_argument("--baseline", default=None, help="Results JSON of an earlier run to compare against")
+    args = parser.parse_args()
+
+    options = TiffOptions(args.compression, args.predictor, thermal_only=args.thermal_only)
+    inputs = None
+    if args.inputs:
+        inputs = sorted(p for p in Path(args.inputs).iterdir() if p.suffix.lower() in ('.jpg', '.jpeg'))
+        inputs = inputs[:args.frames]
+    results = run(args.frames, args.repeat, args.backend, options, args.seed, inputs)
+
+    print(f"{'stage':<14} {'median ms':>10} {'p95 ms':>8} {'frames/s':>9} {'MB/s':>8}")
+    for stage, r in results["stages"].items():
+        print(f"{stage:<14} {r['median_ms']:>10.3f} {r['p95_ms']:>8.3f} {r['frames_per_sec']:>9.1f} {r['mb_per_sec']:>8.1f}")
+
+    thresholds = None
+    if args.thresholds:
+        with open(args.thresholds, 'r') as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("⚠️  Baseline was run with a different configuration; comparison may be meaningless.")
+    results["regressions"] = find_regressions(results, thresholds, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    failed_checks = [name for name, ok in results["checks"].items() if not ok]
+    if failed_checks:
+        print(f"❌ Output checks failed: {', '.join(failed_checks)}")
+        sys.exit(2)
+    if results["regressions"]:
+        print("❌ Performance regressions:")
+        for problem in results["regressions"]:
+            print(f"   {problem}")
+        sys.exit(1)
+    print("✅ No regressions.")
+
+if __name__ == "__main__":
+    main()
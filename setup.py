@@ -6,6 +6,9 @@ setup(
     description="Python package to convert Autel thermal JPGs to TIFF using Autel SDK",
     packages=find_packages(),
     include_package_data=True,
+    install_requires=[
+        "numpy",
+    ],
     package_data={
         "autel_thermal_converter": ["libs/*.dll"],
     },
@@ -5,13 +5,28 @@
 #include <cmath>
 #include <algorithm>
 #include <filesystem>
+#include <chrono>
+#include <cstdint>
+#include <cstring>
+#include <fstream>
+#ifdef _WIN32
+#define DLLEXPORT extern "C" __declspec(dllexport)
+#else
+#define DLLEXPORT extern "C" __attribute__((visibility("default")))
+// The SDK header marks its imports with __declspec unconditionally
+#define __declspec(x)
+#endif
+
 #include "../include/Autel_IrTempParser.h"
 #include "../include/nlohmann/json.hpp"
 #include <opencv2/opencv.hpp>
 
 using json = nlohmann::json;
 
-#define DLLEXPORT extern "C" __declspec(dllexport)
+// Size of the thermal grid and of the output TIFF
+constexpr int kWidth = 640;
+constexpr int kHeight = 512;
+constexpr size_t kHistogramBins = 65536;
 
 // Helper to sanitize float values
 float sanitizeTemp(float val) {
@@ -21,6 +36,124 @@ float sanitizeTemp(float val) {
     return val;
 }
 
+// Per-stage durations (milliseconds) and byte counts of one conversion.
+// Layout is shared with ctypes (converter._ConversionTimings); only append fields.
+struct ConversionTimings {
+    double read_ms;      // file read + cv::imdecode (+ resize)
+    double decode_ms;    // GetIrPhotoTempInfo
+    double encode_ms;    // thermal band encoding and RGB scaling
+    double write_ms;     // cv::imwrite
+    double metadata_ms;  // metadata JSON serialization
+    int64_t input_bytes;
+    int64_t output_bytes;
+};
+
+using Clock = std::chrono::steady_clock;
+
+static double elapsedMs(Clock::time_point start) {
+    return std::chrono::duration<double, std::milli>(Clock::now() - start).count();
+}
+
+static int64_t fileSize(const std::string& path) {
+    std::error_code ec;
+    auto size = std::filesystem::file_size(std::filesystem::u8path(path), ec);
+    return ec ? 0 : static_cast<int64_t>(size);
+}
+
+// Formula: (Temp * 100) + 10000, clamped to uint16 and rounded
+// Example: 23.45 -> 2345 + 10000 = 12345
+// Example: -5.00 -> -500 + 10000 = 9500
+static inline uint16_t encodeTemp(float val) {
+    float encodedFloat = (sanitizeTemp(val) * 100.0f) + 10000.0f;
+    encodedFloat = std::max(0.0f, std::min(65535.0f, encodedFloat));
+    return static_cast<uint16_t>(encodedFloat + 0.5f);
+}
+
+// Fill `bands` (h x w CV_16UC4, allocated by the caller) from a BGR image of the same size and
+// the SDK grid, one row at a time through raw pointers (no per-pixel .at<>, no split/merge).
+// Channels are B, G, R (scaled 8 -> 16 bit) and thermal; cv::imwrite stores them as R, G, B, thermal.
+// Returns false if the grid does not have h rows of w values.
+static bool encodeBandsInto(const cv::Mat& bgrImage, const std::vector<std::vector<float>>& tempArray, cv::Mat& bands) {
+    const int h = bands.rows;
+    const int w = bands.cols;
+    if (static_cast<int>(tempArray.size()) != h) return false;
+    for (int y = 0; y < h; ++y) {
+        if (static_cast<int>(tempArray[y].size()) != w) return false;
+        const float* temps = tempArray[y].data();
+        const uint8_t* src = bgrImage.ptr<uint8_t>(y);
+        uint16_t* dst = bands.ptr<uint16_t>(y);
+        for (int x = 0; x < w; ++x) {
+            dst[4 * x + 0] = static_cast<uint16_t>(src[3 * x + 0] * 257); // 0-255 -> 0-65535
+            dst[4 * x + 1] = static_cast<uint16_t>(src[3 * x + 1] * 257);
+            dst[4 * x + 2] = static_cast<uint16_t>(src[3 * x + 2] * 257);
+            dst[4 * x + 3] = encodeTemp(temps[x]);
+        }
+    }
+    return true;
+}
+
+// Encode the SDK temperature grid and the RGB image into the 4-band layout.
+// Returns an empty Mat if the grid is not h x w.
+cv::Mat encodeThermalBands(const cv::Mat& rgbImage, const std::vector<std::vector<float>>& tempArray, int w, int h) {
+    cv::Mat output4Channel(h, w, CV_16UC4);
+    if (!encodeBandsInto(rgbImage, tempArray, output4Channel)) return cv::Mat();
+    return output4Channel;
+}
+
+// Count every encoded thermal value (band 4) into 65536 bins, for dataset-wide normalization
+static void countThermalValues(const cv::Mat& bands, uint32_t* histogram) {
+    std::fill(histogram, histogram + kHistogramBins, 0u);
+    for (int y = 0; y < bands.rows; ++y) {
+        const cv::Vec4w* row = bands.ptr<cv::Vec4w>(y);
+        for (int x = 0; x < bands.cols; ++x) {
+            ++histogram[row[x][3]];
+        }
+    }
+}
+
+// Encode the SDK temperature grid and the RGB image into the 4-band TIFF
+int writeThermalTiff(const cv::Mat& rgbImage, const std::vector<std::vector<float>>& tempArray,
+                     const std::string& outFile, int w, int h) {
+    cv::Mat output4Channel = encodeThermalBands(rgbImage, tempArray, w, h);
+    if (output4Channel.empty()) return -2; // Error: SDK returned an unexpected grid
+    if (!cv::imwrite(outFile, output4Channel)) return -3; // Error: Write failed
+
+    return 0;
+}
+
+// Serialize SDK stats and proprietary metadata to the JSON layout returned by GetMetadataJSON
+json buildMetadataJson(const TempStatInfo& tempStatInfo, const std::map<std::string, Autel_IR_INFO_S>& metadata) {
+    json j;
+    j["stats"] = {
+        {"min", tempStatInfo.min},
+        {"max", tempStatInfo.max},
+        {"avg", tempStatInfo.avg},
+        {"min_point", {{"x", tempStatInfo.minPoint.x}, {"y", tempStatInfo.minPoint.y}}},
+        {"max_point", {{"x", tempStatInfo.maxPoint.x}, {"y", tempStatInfo.maxPoint.y}}}
+    };
+
+    // Extract Autel proprietary metadata
+    json meta_j;
+    for (auto const& [key, val] : metadata) {
+        // Try to determine if it's a number or string based on value
+        if (std::string(val.show_value) != "NA") {
+             meta_j[key] = val.show_value;
+        } else {
+             meta_j[key] = val.num_value;
+        }
+    }
+    j["metadata"] = meta_j;
+    return j;
+}
+
+// Copy a JSON document into a caller-owned buffer. Returns false if it does not fit.
+bool copyJsonToBuffer(const json& j, char* buffer, int bufferLen) {
+    std::string jsonStr = j.dump();
+    if (bufferLen <= 0 || jsonStr.length() + 1 > static_cast<size_t>(bufferLen)) return false;
+    std::memcpy(buffer, jsonStr.c_str(), jsonStr.length() + 1);
+    return true;
+}
+
 // Core processing logic
 DLLEXPORT int ConvertToTiff(const char* inputPath, const char* outputPath) {
     std::string inFile(inputPath);
@@ -45,87 +178,219 @@ DLLEXPORT int ConvertToTiff(const char* inputPath, const char* outputPath) {
     int ret = GetIrPhotoTempInfo(inFile.c_str(), w, h, tempStatInfo, metadata, tempArray);
     if (ret != 0) return -2; // Error: SDK failed
 
-    // 3. Create 16-bit Thermal Band
-    cv::Mat thermalBand(h, w, CV_16U);
+    return writeThermalTiff(rgbImage, tempArray, outFile, w, h);
+}
+
+DLLEXPORT int GetMetadataJSON(const char* inputPath, char* buffer, int bufferLen) {
+    std::string inFile(inputPath);
+    int w = 640;
+    int h = 512;
+
+    TempStatInfo tempStatInfo;
+    std::map<std::string, Autel_IR_INFO_S> metadata;
+    std::vector<std::vector<float>> tempArray;
+
+    int ret = GetIrPhotoTempInfo(inFile.c_str(), w, h, tempStatInfo, metadata, tempArray);
+    if (ret != 0) return -1;
+
+    json j = buildMetadataJson(tempStatInfo, metadata);
+
+    // Copy to buffer
+    if (!copyJsonToBuffer(j, buffer, bufferLen)) return -2; // Buffer too small
     
+    return 0;
+}
+
+// Working buffers of one conversion. ConvertBatch keeps one set for a whole batch, so after
+// the first file the file buffer, the decoded image and the output bands are reused. The
+// temperature grid is not: the SDK fills it, and as it may append rows it is cleared before
+// each file, which frees its rows. The SDK, the TIFF encoder and the JSON serializer also
+// allocate internally.
+struct ConversionBuffers {
+    std::vector<uint8_t> fileData;                       // raw JPG bytes
+    cv::Mat image;                                       // decoded visual image (BGR)
+    cv::Mat resized;                                     // image at w x h, when it is another size
+    cv::Mat bands;                                       // h x w CV_16UC4 output
+    std::vector<std::vector<float>> tempArray;           // SDK temperature grid
+    std::map<std::string, Autel_IR_INFO_S> metadata;     // SDK metadata
+};
+
+static bool readFileInto(const std::string& path, std::vector<uint8_t>& data) {
+    std::ifstream file(std::filesystem::u8path(path), std::ios::binary | std::ios::ate);
+    if (!file) return false;
+    std::streamoff size = file.tellg();
+    if (size <= 0) return false;
+    data.resize(static_cast<size_t>(size));
+    file.seekg(0);
+    return static_cast<bool>(file.read(reinterpret_cast<char*>(data.data()), size));
+}
+
+// One file of ConvertWithMetadataHistogram / ConvertBatch. `buffer` and `histogram` may be NULL.
+// Same return codes as ConvertWithMetadata; `t` is complete when the TIFF was written (0 or -4).
+static int convertWithBuffers(const char* inputPath, const char* outputPath, ConversionBuffers& b,
+                              char* buffer, int bufferLen, ConversionTimings& t, uint32_t* histogram) {
+    std::string inFile(inputPath);
+    std::string outFile(outputPath);
+    const int w = kWidth;
+    const int h = kHeight;
+
+    // imdecode into the reused Mat (imread always allocates a new one)
+    auto start = Clock::now();
+    if (!readFileInto(inFile, b.fileData)) return -1; // Error: Image not found
+    cv::imdecode(b.fileData, cv::IMREAD_COLOR, &b.image);
+    if (b.image.empty()) return -1;
+
+    const cv::Mat* bgrImage = &b.image;
+    if (b.image.cols != w || b.image.rows != h) {
+        cv::resize(b.image, b.resized, cv::Size(w, h));
+        bgrImage = &b.resized;
+    }
+    t.read_ms = elapsedMs(start);
+    t.input_bytes = static_cast<int64_t>(b.fileData.size());
+
+    TempStatInfo tempStatInfo;
+    // The SDK may append to these, so they start empty; the grid's rows are reallocated per file
+    b.metadata.clear();
+    b.tempArray.clear();
+
+    start = Clock::now();
+    int ret = GetIrPhotoTempInfo(inFile.c_str(), w, h, tempStatInfo, b.metadata, b.tempArray);
+    if (ret != 0) return -2; // Error: SDK failed
+    t.decode_ms = elapsedMs(start);
+
+    start = Clock::now();
+    b.bands.create(h, w, CV_16UC4); // no-op after the first file
+    if (!encodeBandsInto(*bgrImage, b.tempArray, b.bands)) return -2; // Error: unexpected grid
+    if (histogram) countThermalValues(b.bands, histogram);
+    t.encode_ms = elapsedMs(start);
+
+    start = Clock::now();
+    if (!cv::imwrite(outFile, b.bands)) return -3; // Error: Write failed
+    t.write_ms = elapsedMs(start);
+    t.output_bytes = fileSize(outFile);
+
+    if (!buffer) return 0;
+    start = Clock::now();
+    json j = buildMetadataJson(tempStatInfo, b.metadata);
+    bool fits = copyJsonToBuffer(j, buffer, bufferLen);
+    t.metadata_ms = elapsedMs(start);
+    return fits ? 0 : -4; // -4: TIFF written, buffer too small
+}
+
+// Single-pass conversion with per-stage timings and the histogram of the encoded
+// thermal band (65536 bins); `timings` and `histogram` may be NULL.
+// Same return codes as ConvertWithMetadata.
+DLLEXPORT int ConvertWithMetadataHistogram(const char* inputPath, const char* outputPath, char* buffer, int bufferLen,
+                                           ConversionTimings* timings, uint32_t* histogram) {
+    ConversionBuffers buffers;
+    ConversionTimings t = {};
+    int ret = convertWithBuffers(inputPath, outputPath, buffers, buffer, bufferLen, t, histogram);
+    if (timings && (ret == 0 || ret == -4)) *timings = t;
+    return ret;
+}
+
+// Batch conversion: `count` files with one set of working buffers and one call from Python.
+// statuses[i] receives the ConvertWithMetadata code of file i. Optional outputs (may be NULL):
+// jsonBuffer holds count NUL-terminated JSON documents, jsonStride bytes apart; timings holds
+// count ConversionTimings; histograms holds count x 65536 bins. A failed file does not stop
+// the batch. Returns the number of TIFFs written (status 0 or -4).
+DLLEXPORT int ConvertBatch(const char* const* inputPaths, const char* const* outputPaths, int count, int* statuses,
+                           char* jsonBuffer, int jsonStride, ConversionTimings* timings, uint32_t* histograms) {
+    ConversionBuffers buffers;
+    int written = 0;
+    for (int i = 0; i < count; ++i) {
+        ConversionTimings t = {};
+        char* json = jsonBuffer ? jsonBuffer + static_cast<size_t>(i) * jsonStride : nullptr;
+        uint32_t* histogram = histograms ? histograms + static_cast<size_t>(i) * kHistogramBins : nullptr;
+        statuses[i] = convertWithBuffers(inputPaths[i], outputPaths[i], buffers, json, jsonStride, t, histogram);
+        if (timings) timings[i] = t;
+        if (statuses[i] == 0 || statuses[i] == -4) ++written;
+    }
+    return written;
+}
+
+// Single-pass conversion with per-stage timings; `timings` may be NULL
+DLLEXPORT int ConvertWithMetadataTimed(const char* inputPath, const char* outputPath, char* buffer, int bufferLen,
+                                       ConversionTimings* timings) {
+    return ConvertWithMetadataHistogram(inputPath, outputPath, buffer, bufferLen, timings, nullptr);
+}
+
+// Single-pass conversion: one SDK decode feeds both the TIFF and the metadata JSON
+DLLEXPORT int ConvertWithMetadata(const char* inputPath, const char* outputPath, char* buffer, int bufferLen) {
+    return ConvertWithMetadataTimed(inputPath, outputPath, buffer, bufferLen, nullptr);
+}
+
+// Copy the sanitized temperature grid (°C, row-major float32) into a caller-owned buffer
+DLLEXPORT int GetTemperatureData(const char* inputPath, float* buffer, int w, int h) {
+    std::string inFile(inputPath);
+
+    TempStatInfo tempStatInfo;
+    std::map<std::string, Autel_IR_INFO_S> metadata;
+    std::vector<std::vector<float>> tempArray;
+
+    int ret = GetIrPhotoTempInfo(inFile.c_str(), w, h, tempStatInfo, metadata, tempArray);
+    if (ret != 0) return -1; // Error: SDK failed
+    if (static_cast<int>(tempArray.size()) != h) return -2; // Error: Unexpected size
+
     for (int y = 0; y < h; ++y) {
+        const std::vector<float>& row = tempArray[y];
+        if (static_cast<int>(row.size()) != w) return -2;
+        float* dst = buffer + static_cast<size_t>(y) * w;
         for (int x = 0; x < w; ++x) {
-            float tempVal = sanitizeTemp(tempArray[y][x]);
-            
-            // Formula: (Temp * 100) + 10000
-            // Example: 23.45 -> 2345 + 10000 = 12345
-            // Example: -5.00 -> -500 + 10000 = 9500
-            float encodedFloat = (tempVal * 100.0f) + 10000.0f;
-            
-            // Clamp to uint16 range (0 - 65535) just in case
-            encodedFloat = std::max(0.0f, std::min(65535.0f, encodedFloat));
-            
-            thermalBand.at<uint16_t>(y, x) = static_cast<uint16_t>(encodedFloat + 0.5f);
+            dst[x] = sanitizeTemp(row[x]);
         }
     }
 
-    // 4. Process RGB Bands (Scale 8-bit to 16-bit)
-    std::vector<cv::Mat> rgbChannels;
-    cv::split(rgbImage, rgbChannels);
-    std::vector<cv::Mat> outputChannels;
+    return 0;
+}
 
-    for (int i = 0; i < 3; ++i) {
-        cv::Mat channel16;
-        rgbChannels[i].convertTo(channel16, CV_16U, 257.0); // 0-255 -> 0-65535
-        outputChannels.push_back(channel16);
-    }
-    
-    // Add Thermal as 4th band
-    outputChannels.push_back(thermalBand);
+// Copy the SDK's raw int16 temperature data into a caller-owned buffer of w * h values
+DLLEXPORT int GetRawTempBuffer(const char* inputPath, int16_t* buffer, int w, int h) {
+    std::string inFile(inputPath);
+    std::vector<int16_t> rawTempData;
 
-    // 5. Merge and Save
-    cv::Mat output4Channel;
-    cv::merge(outputChannels, output4Channel);
-    
-    if (!cv::imwrite(outFile, output4Channel)) return -3; // Error: Write failed
+    int ret = GetRawTempData(inFile.c_str(), w, h, rawTempData);
+    if (ret != 0) return -1; // Error: SDK failed
+    if (rawTempData.size() != static_cast<size_t>(w) * h) return -2; // Error: Unexpected size
 
-    return 0; // Success
+    std::copy(rawTempData.begin(), rawTempData.end(), buffer);
+    return 0;
 }
 
-DLLEXPORT int GetMetadataJSON(const char* inputPath, char* buffer, int bufferLen) {
+// Decode-only entry point for the Python encoding backend.
+// Fills caller-owned buffers with the raw SDK temperature grid (w * h float32, °C),
+// the RGB image resized to w x h (w * h * 3 uint8, R-G-B order) and the metadata JSON.
+DLLEXPORT int DecodeFrame(const char* inputPath, float* tempBuffer, uint8_t* rgbBuffer, char* jsonBuffer, int jsonLen) {
     std::string inFile(inputPath);
     int w = 640;
     int h = 512;
 
+    cv::Mat bgrImage = cv::imread(inFile, cv::IMREAD_COLOR);
+    if (bgrImage.empty()) return -1; // Error: Image not found
+
+    if (bgrImage.cols != w || bgrImage.rows != h) {
+        cv::resize(bgrImage, bgrImage, cv::Size(w, h));
+    }
+
     TempStatInfo tempStatInfo;
     std::map<std::string, Autel_IR_INFO_S> metadata;
     std::vector<std::vector<float>> tempArray;
 
     int ret = GetIrPhotoTempInfo(inFile.c_str(), w, h, tempStatInfo, metadata, tempArray);
-    if (ret != 0) return -1;
-
-    json j;
-    j["stats"] = {
-        {"min", tempStatInfo.min},
-        {"max", tempStatInfo.max},
-        {"avg", tempStatInfo.avg},
-        {"min_point", {{"x", tempStatInfo.minPoint.x}, {"y", tempStatInfo.minPoint.y}}},
-        {"max_point", {{"x", tempStatInfo.maxPoint.x}, {"y", tempStatInfo.maxPoint.y}}}
-    };
+    if (ret != 0) return -2; // Error: SDK failed
+    if (static_cast<int>(tempArray.size()) != h) return -2;
 
-    // Extract Autel proprietary metadata
-    json meta_j;
-    for (auto const& [key, val] : metadata) {
-        // Try to determine if it's a number or string based on value
-        if (std::string(val.show_value) != "NA") {
-             meta_j[key] = val.show_value;
-        } else {
-             meta_j[key] = val.num_value;
-        }
+    for (int y = 0; y < h; ++y) {
+        if (static_cast<int>(tempArray[y].size()) != w) return -2;
+        std::copy(tempArray[y].begin(), tempArray[y].end(), tempBuffer + static_cast<size_t>(y) * w);
     }
-    j["metadata"] = meta_j;
 
-    std::string jsonStr = j.dump();
-    
-    // Copy to buffer
-    if (jsonStr.length() + 1 > bufferLen) return -2; // Buffer too small
-    
-    strcpy_s(buffer, bufferLen, jsonStr.c_str());
-    
+    // Write straight into the caller's buffer
+    cv::Mat rgbView(h, w, CV_8UC3, rgbBuffer);
+    cv::cvtColor(bgrImage, rgbView, cv::COLOR_BGR2RGB);
+
+    json j = buildMetadataJson(tempStatInfo, metadata);
+    if (!copyJsonToBuffer(j, jsonBuffer, jsonLen)) return -4; // Buffer too small
+
     return 0;
 }
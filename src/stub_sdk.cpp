@@ -0,0 +1,68 @@
+// Stand-in for AutelIrTempParserSDK on platforms without the vendor binary (Linux CI, benchmarks).
+// Implements the two functions of Autel_IrTempParser.h with a deterministic synthetic grid
+// derived from the file size, so ir_converter can be built, loaded and timed end to end.
+// Temperatures are NOT real measurements.
+#include <cstdint>
+#include <fstream>
+#ifndef _WIN32
+// The SDK header marks its functions with __declspec unconditionally
+#define __declspec(x) __attribute__((visibility("default")))
+#endif
+#include "../include/Autel_IrTempParser.h"
+
+static bool stubFileSize(const char* filepath, int64_t& size) {
+    std::ifstream file(filepath, std::ios::binary | std::ios::ate);
+    if (!file) return false;
+    size = static_cast<int64_t>(file.tellg());
+    return true;
+}
+
+// Smooth gradient between 10 and 50 °C, offset per file
+static float stubTemp(int x, int y, int w, int h, int64_t seed) {
+    float offset = static_cast<float>(seed % 1000) / 100.0f;
+    return 10.0f + 40.0f * (static_cast<float>(x) / w + static_cast<float>(y) / h) / 2.0f + offset;
+}
+
+AUTEL_IRTEMPPARSER int GetIrPhotoTempInfo(const char* filepath, const int w, const int h, TempStatInfo& tempStatInfo,
+                                          std::map<std::string, Autel_IR_INFO_S>& result,
+                                          std::vector<std::vector<float>>& tempArray) {
+    int64_t seed = 0;
+    if (w <= 0 || h <= 0 || !stubFileSize(filepath, seed)) return -1;
+
+    tempArray.assign(h, std::vector<float>(w));
+    double sum = 0.0;
+    for (int y = 0; y < h; ++y) {
+        for (int x = 0; x < w; ++x) {
+            float t = stubTemp(x, y, w, h, seed);
+            tempArray[y][x] = t;
+            sum += t;
+        }
+    }
+    tempStatInfo.min = tempArray[0][0];
+    tempStatInfo.max = tempArray[h - 1][w - 1];
+    tempStatInfo.avg = static_cast<float>(sum / (static_cast<double>(w) * h));
+    tempStatInfo.minPoint = QPointF(0, 0);
+    tempStatInfo.maxPoint = QPointF(w - 1, h - 1);
+
+    Autel_IR_INFO_S info = {};
+    info.tag = 0;
+    info.len = 4;
+    info.show_value = "stub";
+    info.str_value[0] = '\0';
+    info.num_value = static_cast<int>(seed);
+    result["FileSize"] = info;
+    return 0;
+}
+
+AUTEL_IRTEMPPARSER int GetRawTempData(const char* filepath, const int w, const int h, std::vector<int16_t>& rawTempData) {
+    int64_t seed = 0;
+    if (w <= 0 || h <= 0 || !stubFileSize(filepath, seed)) return -1;
+
+    rawTempData.resize(static_cast<size_t>(w) * h);
+    for (int y = 0; y < h; ++y) {
+        for (int x = 0; x < w; ++x) {
+            rawTempData[static_cast<size_t>(y) * w + x] = static_cast<int16_t>(stubTemp(x, y, w, h, seed) * 10.0f);
+        }
+    }
+    return 0;
+}
@@ -0,0 +1,136 @@
+import os
+import time
+
+from autel_thermal_converter.batch import convert_batch
+
+class StandInConverter:
+    """Linux stand-in for ThermalConverter: writes a marker file instead of a TIFF."""
+
+    def convert_with_metadata(self, input_path, output_path):
+        if "bad" in os.path.basename(input_path):
+            return False, None
+        time.sleep(0.01)
+        with open(output_path, "w") as f:
+            f.write(input_path)
+        return True, {"stats": {"pid": os.getpid()}}
+
+class StandInBatchConverter(StandInConverter):
+    """Stand-in for a ThermalConverter whose DLL exports ConvertBatch."""
+    batches_natively = True
+
+    def convert_many(self, pairs):
+        self.last_batch_timings = [{"stages": {"batch": len(pairs)}}] * len(pairs)
+        self.last_histograms = [None] * len(pairs)
+        return [self.convert_with_metadata(i, o) for i, o in pairs]
+
+class BrokenConverter:
+    def __init__(self):
+        raise OSError("DLL not found")
+
+def _pairs(tmp_path, names):
+    return [(tmp_path / n, tmp_path / f"{n}.tif") for n in names]
+
+def test_results_keep_input_order_across_workers(tmp_path):
+    names = [f"IRX_{i:04d}.JPG" for i in range(40)] + ["bad.JPG"]
+    results = list(convert_batch(_pairs(tmp_path, names), jobs=4,
+                                 converter_factory=StandInConverter, chunksize=3))
+
+    assert [os.path.basename(r.input_path) for r in results] == names
+    assert all(r.success for r in results[:-1])
+    assert not results[-1].success
+    assert (tmp_path / "IRX_0007.JPG.tif").read_text() == str(tmp_path / "IRX_0007.JPG")
+    assert len({r.metadata["stats"]["pid"] for r in results[:-1]}) > 1
+
+def test_single_job_runs_in_process(tmp_path):
+    results = list(convert_batch(_pairs(tmp_path, ["a.JPG"]), jobs=1, converter_factory=StandInConverter))
+    assert results[0].metadata["stats"]["pid"] == os.getpid()
+
+def test_converter_init_failure_is_reported_per_file(tmp_path):
+    results = list(convert_batch(_pairs(tmp_path, ["a.JPG", "b.JPG"]), jobs=2,
+                                 converter_factory=BrokenConverter))
+    assert [r.success for r in results] == [False, False]
+    assert "DLL not found" in results[0].error
+
+def test_manifest_skips_unchanged_inputs(tmp_path):
+    from autel_thermal_converter.manifest import Manifest
+
+    inputs = []
+    for name in ["a.JPG", "b.JPG"]:
+        (tmp_path / name).write_bytes(b"jpg")
+        inputs.append(name)
+    pairs = [(tmp_path / n, tmp_path / f"{n}.tif") for n in inputs]
+
+    with Manifest(tmp_path) as manifest:
+        first = list(convert_batch(pairs, converter_factory=StandInConverter, manifest=manifest))
+    assert [r.skipped for r in first] == [False, False]
+
+    (tmp_path / "b.JPG").write_bytes(b"changed")
+    with Manifest(tmp_path) as manifest:
+        second = list(convert_batch(pairs, converter_factory=StandInConverter, manifest=manifest))
+    assert [r.skipped for r in second] == [True, False]
+    assert second[0].metadata is None
+    assert not list(tmp_path.glob(".*partial*"))
+
+    # b.JPG was recorded twice; compacting keeps the last line per input
+    manifest.compact()
+    assert len(manifest.path.read_text().splitlines()) == 2
+    assert Manifest(tmp_path).entries == manifest.entries
+
+def test_lazy_pairs_interleave_skipped_in_order(tmp_path):
+    from autel_thermal_converter.manifest import Manifest
+
+    names = [f"IRX_{i:02d}.JPG" for i in range(12)]
+    for name in names:
+        (tmp_path / name).write_bytes(b"jpg")
+    pairs = _pairs(tmp_path, names)
+    with Manifest(tmp_path) as manifest:
+        list(convert_batch(pairs[::3], converter_factory=StandInConverter, manifest=manifest))
+
+    with Manifest(tmp_path) as manifest:
+        results = list(convert_batch((p for p in pairs), jobs=3, converter_factory=StandInConverter,
+                                     manifest=manifest))
+    assert [os.path.basename(r.input_path) for r in results] == names
+    assert [r.skipped for r in results] == [i % 3 == 0 for i in range(12)]
+    assert all(r.success for r in results)
+
+def test_batch_size_groups_pairs_per_convert_many_call(tmp_path):
+    names = [f"IRX_{i:02d}.JPG" for i in range(9)] + ["bad.JPG"]
+    results = list(convert_batch(_pairs(tmp_path, names), jobs=2, converter_factory=StandInBatchConverter,
+                                 batch_size=4))
+    assert [os.path.basename(r.input_path) for r in results] == names
+    assert [r.success for r in results] == [True] * 9 + [False]
+    assert [r.timings["stages"]["batch"] for r in results[:-1]] == [4] * 8 + [2]
+    assert (tmp_path / "IRX_05.JPG.tif").read_text() == str(tmp_path / "IRX_05.JPG")
+    assert not list(tmp_path.glob(".*partial*"))
+
+    # Converters without a native batch call convert file by file
+    results = list(convert_batch(_pairs(tmp_path, names[:3]), converter_factory=StandInConverter, batch_size=2))
+    assert [r.success for r in results] == [True] * 3
+
+def test_single_file_failure_is_reported(tmp_path, capsys):
+    import numpy as np
+
+    from autel_thermal_converter.__main__ import main
+    from autel_thermal_converter.backends import save_fixture
+
+    save_fixture(tmp_path / "IRX_0.npz", np.zeros((512, 640), dtype=np.float32), np.zeros((512, 640, 3), dtype=np.uint8))
+    (tmp_path / "out" / "IRX_0.tif").mkdir(parents=True)  # the TIFF cannot be moved into place
+    main([str(tmp_path / "IRX_0.npz"), str(tmp_path / "out"), "--backend", "fixture"])
+    assert "❌ Failed to convert IRX_0.npz: " in capsys.readouterr().out
+    assert not list((tmp_path / "out").glob(".*partial*"))
+
+def test_submission_stays_a_window_ahead_of_the_results(tmp_path):
+    produced = []
+
+    def listing():
+        for i in range(200):
+            produced.append(i)
+            yield tmp_path / f"IRX_{i:04d}.JPG", tmp_path / f"IRX_{i:04d}.tif"
+
+    results = convert_batch(listing(), jobs=2, converter_factory=StandInConverter, chunksize=2)
+    for consumed in range(1, 21):
+        next(results)
+        time.sleep(0.02)
+        assert len(produced) <= consumed + 2 * 2 * 4 + 1  # + the one waiting for a slot
+    results.close()
+    assert len(produced) < 200
@@ -0,0 +1,44 @@
+import numpy as np
+
+from autel_thermal_converter.backends import BackendConverter, FixtureBackend, save_fixture
+from autel_thermal_converter.cache import CachedBackend, DecodeCache
+
+class CountingBackend(FixtureBackend):
+    def __init__(self):
+        self.decodes = 0
+
+    def decode(self, input_path):
+        self.decodes += 1
+        return super().decode(input_path)
+
+def _fixture(path, value):
+    save_fixture(path, np.full((512, 640), value, dtype=np.float32), np.zeros((512, 640, 3), dtype=np.uint8))
+
+def test_convert_metadata_and_temperature_share_one_decode(tmp_path):
+    _fixture(tmp_path / "a.npz", 25.0)
+    backend = CountingBackend()
+    converter = BackendConverter(backend, cache=DecodeCache(tmp_path / "cache"))
+
+    assert converter.convert_image(str(tmp_path / "a.npz"), str(tmp_path / "a.tif"))
+    assert converter.get_metadata(str(tmp_path / "a.npz"))["stats"]["max"] == 25.0
+    assert converter.read_temperature(str(tmp_path / "a.npz"))[0, 0] == 25.0
+    assert backend.decodes == 1
+
+def test_disk_layer_survives_new_process_state(tmp_path):
+    _fixture(tmp_path / "a.npz", 25.0)
+    first = CountingBackend()
+    CachedBackend(first, DecodeCache(tmp_path / "cache")).decode(str(tmp_path / "a.npz"))
+
+    second = CountingBackend()
+    frame = CachedBackend(second, DecodeCache(tmp_path / "cache", memory_items=0)).decode(str(tmp_path / "a.npz"))
+    assert second.decodes == 0
+    assert frame.metadata["stats"]["min"] == 25.0
+
+def test_eviction_keeps_store_under_limit(tmp_path):
+    cache = DecodeCache(tmp_path / "cache", max_bytes=1, memory_items=0)
+    backend = CachedBackend(CountingBackend(), cache)
+    for i in range(3):
+        _fixture(tmp_path / f"{i}.npz", float(i))
+        backend.decode(str(tmp_path / f"{i}.npz"))
+    assert cache._disk_bytes <= 1
+    assert not list((tmp_path / "cache").glob("*/*.npz"))
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+
+from autel_thermal_converter.compression import lzw_decode, lzw_encode, predictor_decode, predictor_encode
+
+def test_lzw_roundtrip_across_code_width_changes():
+    rng = np.random.default_rng(0)
+    for data in [b"", b"a", b"abababab", os.urandom(3000), rng.integers(0, 4, 100000, dtype=np.uint8).tobytes()]:
+        assert lzw_decode(lzw_encode(data)) == data
+
+def test_horizontal_predictor_roundtrip_wraps():
+    chunk = np.array([[[0, 65535], [65535, 0], [5, 7]]], dtype=np.uint16)
+    diff = predictor_encode(chunk)
+    assert diff[0, 1].tolist() == [65535, 1]
+    np.testing.assert_array_equal(predictor_decode(diff), chunk)
+
+def test_read_tiff_roundtrips_every_layout(tmp_path):
+    from autel_thermal_converter.tiff import TiffOptions, read_thermal_band, read_tiff, write_tiff
+
+    image = np.random.default_rng(1).integers(0, 65535, (70, 45, 4), dtype=np.uint16)
+    for options in [TiffOptions(), TiffOptions("lzw", predictor=True), TiffOptions("deflate", tile=32, bigtiff=True)]:
+        write_tiff(tmp_path / "t.tif", image, options)
+        np.testing.assert_array_equal(read_tiff(tmp_path / "t.tif"), image)
+    write_tiff(tmp_path / "t.tif", image[..., 3], TiffOptions("deflate", predictor=True))
+    np.testing.assert_array_equal(read_thermal_band(tmp_path / "t.tif"), image[..., 3])
+
+def test_thermal_band_is_mapped_when_uncompressed(tmp_path):
+    from autel_thermal_converter.tiff import TiffOptions, read_thermal_band, read_thermal_bands, write_tiff
+
+    image = np.random.default_rng(2).integers(1, 65535, (3, 70, 45, 4), dtype=np.uint16)
+    image[1, 0, 0, 3] = 0  # invalid pixel
+    paths = []
+    for i, options in enumerate([TiffOptions(), TiffOptions(bigtiff=True), TiffOptions("lzw", predictor=True)]):
+        paths.append(tmp_path / f"{i}.tif")
+        write_tiff(paths[-1], image[i], options)
+    mapped, decoded = read_thermal_band(paths[0], mmap=True), read_thermal_band(paths[2], mmap=True)
+    assert not mapped.flags.owndata and not mapped.flags.writeable and decoded.flags.writeable
+    np.testing.assert_array_equal(mapped, image[0, ..., 3])
+    np.testing.assert_array_equal(decoded, image[2, ..., 3])
+
+    np.testing.assert_array_equal(read_thermal_bands(paths), image[..., 3])
+    out = np.zeros((3, 70, 45), dtype=np.float32)
+    assert read_thermal_bands(paths, out=out, celsius=True) is out
+    assert np.isnan(out[1, 0, 0]) and np.isnan(out).sum() == 1
+    np.testing.assert_allclose(out[0], (image[0, ..., 3] - 10000.0) / 100, atol=1e-3)
+    for wrong in [out, np.zeros((3, 70, 45), dtype=np.uint16)[:2], np.zeros((3, 45, 70), dtype=np.uint16)]:
+        with pytest.raises(ValueError):
+            read_thermal_bands(paths, out=wrong)
+
+def test_codecs_roundtrip_with_every_available_backend(monkeypatch):
+    from autel_thermal_converter import compression
+
+    data = np.random.default_rng(3).integers(0, 8, 200000, dtype=np.uint8).tobytes()
+    lzw = compression.COMPRESSION_LZW
+    # imagecodecs (if installed) and the pure-Python codec read each other's streams
+    assert lzw_decode(compression.compress(data, lzw)) == data
+    assert compression.decompress(lzw_encode(data), lzw) == data
+    monkeypatch.setattr(compression, "_fast_lzw_encode", lambda: None)
+    monkeypatch.setattr(compression, "_fast_lzw_decode", lambda: None)
+    assert compression.decompress(compression.compress(data, lzw), lzw) == data
+
+    try:
+        compression._zstd_module()
+    except ImportError:
+        pytest.skip("no ZSTD module")
+    packed = compression.compress(data, compression.COMPRESSION_ZSTD, level=3)
+    assert compression.decompress(packed, compression.COMPRESSION_ZSTD) == data
@@ -0,0 +1,65 @@
+import ctypes
+
+import numpy as np
+import pytest
+
+from autel_thermal_converter.converter import ThermalConverter
+from autel_thermal_converter.tiff import TiffOptions, write_tiff
+
+class _Export:
+    """A ctypes function stand-in: callable, with settable argtypes/restype."""
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+class FirstReleaseDLL:
+    """Exports only what the first ir_converter.dll had."""
+
+    def __init__(self):
+        self.calls = []
+        self.ConvertToTiff = _Export(self._convert)
+        self.GetMetadataJSON = _Export(self._metadata)
+
+    def _convert(self, b_in, b_out):
+        self.calls.append("ConvertToTiff")
+        bands = np.zeros((512, 640, 4), dtype=np.uint16)
+        bands[..., 3] = 12500
+        write_tiff(b_out.decode(), bands, TiffOptions("lzw", predictor=True))  # like cv::imwrite
+        return 0
+
+    def _metadata(self, b_in, buffer, size):
+        self.calls.append("GetMetadataJSON")
+        ctypes.memmove(buffer, b'{"stats": {"max": 42.0}}', 25)
+        return 0
+
+def _converter(monkeypatch, tmp_path, **kwargs):
+    dll = tmp_path / "ir_converter.dll"
+    dll.write_bytes(b"")
+    monkeypatch.setattr("autel_thermal_converter.converter._get_dll_path", lambda: str(dll))
+    converter, lib = ThermalConverter(**kwargs), FirstReleaseDLL()
+    converter._setup_signatures(lib)
+    converter._lib = lib
+    return converter, lib
+
+def test_first_release_dll_still_converts(monkeypatch, tmp_path):
+    converter, lib = _converter(monkeypatch, tmp_path)
+    (tmp_path / "IRX_0.JPG").write_bytes(b"jpg")
+    success, meta = converter.convert_with_metadata(str(tmp_path / "IRX_0.JPG"), str(tmp_path / "IRX_0.tif"))
+    assert success and meta == {"stats": {"max": 42.0}}
+    assert lib.calls == ["ConvertToTiff", "GetMetadataJSON"] and converter.last_timings is not None
+
+    with pytest.raises(RuntimeError, match="does not export GetTemperatureData.*Rebuild"):
+        converter.read_temperature(str(tmp_path / "IRX_0.JPG"))
+    with pytest.raises(RuntimeError, match="DecodeFrame"):
+        converter.decode(str(tmp_path / "IRX_0.JPG"))
+
+def test_histogram_without_the_export_is_counted_from_the_written_tiff(monkeypatch, tmp_path):
+    converter, lib = _converter(monkeypatch, tmp_path, histogram=True)
+    (tmp_path / "IRX_0.JPG").write_bytes(b"jpg")
+    assert converter.rereads_output_for_histogram
+    assert converter.convert_with_metadata(str(tmp_path / "IRX_0.JPG"), str(tmp_path / "IRX_0.tif"))[0]
+    assert converter.last_histogram[12500] == 512 * 640
+    assert lib.calls == ["ConvertToTiff", "GetMetadataJSON"]  # the JPG is not decoded again
@@ -0,0 +1,50 @@
+from autel_thermal_converter.discovery import iter_inputs, iter_listed, output_path_for, parse_shard, shard_of
+from autel_thermal_converter.metadata_writer import MetadataWriter, load_stats_index, merge_shards
+
+def _tree(root):
+    for relative in ["b.JPG", "a.jpeg", "notes.txt", "m1/2024/IRX_1.jpg", "m1/2024/IRX_2.JPG",
+                     "m1/thumbs/t.jpg", "m2/IRX_1.Jpg"]:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"jpg")
+
+def test_recursive_walk_patterns_and_order(tmp_path):
+    _tree(tmp_path)
+    flat = [rel for _, rel in iter_inputs(tmp_path)]
+    assert flat == ["a.jpeg", "b.JPG"]
+
+    found = [rel for _, rel in iter_inputs(tmp_path, recursive=True, exclude=["THUMBS"])]
+    assert found == ["a.jpeg", "b.JPG", "m1/2024/IRX_1.jpg", "m1/2024/IRX_2.JPG", "m2/IRX_1.Jpg"]
+
+    only = [rel for _, rel in iter_inputs(tmp_path, recursive=True, include=["m1/*/irx_*.jpg"])]
+    assert only == ["m1/2024/IRX_1.jpg", "m1/2024/IRX_2.JPG"]
+    assert output_path_for(tmp_path / "out", "m2/IRX_1.Jpg") == tmp_path / "out" / "m2" / "IRX_1.tif"
+
+def test_listed_paths_stay_under_the_root(tmp_path):
+    root = tmp_path / "flight"
+    _tree(root)
+    (tmp_path / "paths.txt").write_text("\n".join([
+        "b.JPG", "m1/./2024/IRX_1.jpg", "m2/../a.jpeg", "../x.JPG", "m1/../../x.JPG", str(tmp_path / "x.JPG"),
+        str(root / "m2" / ".." / ".." / "x.JPG"), str(root / "m2" / "IRX_1.Jpg"), ""]))
+    listed = [rel for _, rel in iter_listed(root, tmp_path / "paths.txt")]
+    assert listed == ["b.JPG", "m1/2024/IRX_1.jpg", "a.jpeg", "m2/IRX_1.Jpg"]
+
+def test_shards_are_disjoint_and_cover_everything(tmp_path):
+    _tree(tmp_path)
+    everything = [rel for _, rel in iter_inputs(tmp_path, recursive=True)]
+    shards = [[rel for _, rel in iter_inputs(tmp_path, recursive=True, shard=(i, 3))] for i in range(3)]
+    assert sorted(sum(shards, [])) == sorted(everything)
+    assert shard_of("m1/2024/IRX_1.jpg", 3) == shard_of("m1/2024/IRX_1.jpg", 3)
+    assert parse_shard("2/3") == (2, 3)
+
+def test_merge_shards(tmp_path):
+    meta = {"stats": {"min": 1.0, "max": 2.0, "avg": 1.5, "min_point": {"x": 0, "y": 0},
+                      "max_point": {"x": 1, "y": 1}}, "metadata": {}}
+    for i, names in enumerate([["a/1.JPG", "b/2.JPG"], ["c/3.JPG"]]):
+        with MetadataWriter(tmp_path, tag=f"shard-{i}-of-2") as writer:
+            for name in names:
+                writer.append(name, meta)
+
+    assert merge_shards(tmp_path) == 3
+    assert load_stats_index(tmp_path)["name"].tolist() == ["a/1.JPG", "b/2.JPG", "c/3.JPG"]
+    assert (tmp_path / "dataset_metadata.json").exists()
@@ -0,0 +1,47 @@
+import numpy as np
+
+from autel_thermal_converter import encoding
+from autel_thermal_converter.backends import BackendConverter, FixtureBackend, save_fixture
+
+def _reference_encode(temps):
+    # Straight port of the per-pixel loop in ConvertToTiff, in float32
+    out = np.empty(temps.shape, dtype=np.uint16)
+    for idx, val in np.ndenumerate(temps.astype(np.float32)):
+        if np.isnan(val) or np.isinf(val) or val >= np.float32(60000.0):
+            val = np.float32(-273.15)
+        encoded = val * np.float32(100.0) + np.float32(10000.0)
+        encoded = max(np.float32(0.0), min(np.float32(65535.0), encoded))
+        out[idx] = int(encoded + np.float32(0.5))
+    return out
+
+def test_encode_matches_reference_loop():
+    rng = np.random.default_rng(0)
+    temps = rng.uniform(-150, 700, size=(32, 40)).astype(np.float32)
+    temps[0, :5] = [np.nan, np.inf, -np.inf, 60000.0, 59999.0]
+    temps[1, :4] = [23.45, -5.0, 0.005, -0.005]
+
+    np.testing.assert_array_equal(encoding.encode_temperature(temps), _reference_encode(temps))
+
+def test_encode_known_values():
+    temps = np.array([-20.0, 0.0, 23.45, 100.0, np.nan], dtype=np.float32)
+    assert encoding.encode_temperature(temps).tolist() == [8000, 10000, 12345, 20000, 0]
+
+def test_assemble_bands_scales_rgb():
+    rgb = np.array([[[0, 128, 255]]], dtype=np.uint8)
+    bands = encoding.assemble_bands(rgb, np.array([[12345]], dtype=np.uint16))
+    assert bands.dtype == np.uint16
+    assert bands[0, 0].tolist() == [0, 128 * 257, 65535, 12345]
+
+def test_fixture_backend_conversion(tmp_path):
+    temps = np.full((512, 640), 21.5, dtype=np.float32)
+    temps[10, 20] = 80.0
+    rgb = np.zeros((512, 640, 3), dtype=np.uint8)
+    save_fixture(tmp_path / "IRX_0001.npz", temps, rgb)
+
+    converter = BackendConverter(FixtureBackend())
+    success, meta = converter.convert_with_metadata(str(tmp_path / "IRX_0001.JPG"), str(tmp_path / "out.tif"))
+
+    assert success
+    assert meta["stats"]["max"] == 80.0
+    assert meta["stats"]["max_point"] == {"x": 20, "y": 10}
+    assert (tmp_path / "out.tif").stat().st_size > 512 * 640 * 8
@@ -0,0 +1,77 @@
+import struct
+
+import numpy as np
+
+from autel_thermal_converter.backends import create_converter, save_fixture
+from autel_thermal_converter.batch import convert_atomic
+from autel_thermal_converter.exif import read_exif
+from autel_thermal_converter.tiff import (ASCII, BYTE, EXIF_IFD, GPS_IFD, LONG, RATIONAL, SHORT, UNDEFINED, XMP,
+                                          read_ifd_entries, read_tiff)
+
+_FORMATS = {BYTE: 'B', ASCII: 'B', SHORT: 'H', LONG: 'I', RATIONAL: 'I', UNDEFINED: 'B'}
+
+def _ifd(entries, offset: int) -> bytes:
+    # Big-endian IFD at `offset` with its out-of-line values right after it
+    data_offset = offset + 2 + 12 * len(entries) + 4
+    head, overflow = struct.pack('>H', len(entries)), b''
+    for code, field_type, values in entries:
+        flat = [v for pair in values for v in pair] if field_type == RATIONAL else list(values)
+        payload = struct.pack(f'>{len(flat)}{_FORMATS[field_type]}', *flat)
+        count = len(values)
+        if len(payload) <= 4:
+            head += struct.pack('>HHI', code, field_type, count) + payload.ljust(4, b'\0')
+        else:
+            head += struct.pack('>HHII', code, field_type, count, data_offset + len(overflow))
+            overflow += payload + b'\0' * (len(payload) % 2)
+    return head + b'\0\0\0\0' + overflow
+
+def _jpeg_with_exif(path):
+    exif_entries = [(36867, ASCII, b'2024:05:01 10:20:30\0'), (33434, RATIONAL, [(1, 60)]),
+                    (37500, UNDEFINED, b'maker note with offsets')]
+    gps_entries = [(0, BYTE, [2, 3, 0, 0]), (1, ASCII, b'S\0'), (2, RATIONAL, [(33, 1), (51, 1), (3600, 100)]),
+                   (3, ASCII, b'E\0'), (4, RATIONAL, [(151, 1), (12, 1), (0, 1)]), (6, RATIONAL, [(12050, 100)])]
+    exif = _ifd(exif_entries, 100)
+    gps = _ifd(gps_entries, 100 + len(exif))
+    ifd0 = _ifd([(271, ASCII, b'Autel Robotics\0'), (274, SHORT, [6]),
+                 (EXIF_IFD, LONG, [100]), (GPS_IFD, LONG, [100 + len(exif)])], 8)
+    block = (b'MM' + struct.pack('>HI', 42, 8) + ifd0).ljust(100, b'\0') + exif + gps
+    xmp = b'<x:xmpmeta><rdf:Description GimbalYawDegree="-90.5"/></x:xmpmeta>'
+
+    def segment(marker, payload):
+        return b'\xff' + bytes([marker]) + struct.pack('>H', len(payload) + 2) + payload
+
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xd8' + segment(0xE1, b'Exif\0\0' + block)
+                + segment(0xE1, b'http://ns.adobe.com/xap/1.0/\0' + xmp)
+                + segment(0xDA, b'\0' * 8) + b'scan data' + b'\xff\xd9')
+    return xmp
+
+def test_read_exif_and_gps_position(tmp_path):
+    _jpeg_with_exif(tmp_path / "IRX_0.jpg")
+    exif = read_exif(tmp_path / "IRX_0.jpg")
+    assert set(exif.image) == {271}  # Orientation describes the JPG, not the TIFF
+    assert 37500 not in exif.exif  # MakerNote
+    latitude, longitude, altitude = exif.gps_position()
+    assert abs(latitude + (33 + 51 / 60 + 36 / 3600)) < 1e-9 and abs(longitude - 151.2) < 1e-9
+    assert altitude == 120.5
+    (tmp_path / "plain.jpg").write_bytes(b'\xff\xd8\xff\xd9')
+    assert read_exif(tmp_path / "plain.jpg") is None
+
+def test_exif_carried_into_tiff(tmp_path):
+    xmp = _jpeg_with_exif(tmp_path / "IRX_0.jpg")
+    temps = np.full((512, 640), 25.0, dtype=np.float32)
+    save_fixture(tmp_path / "IRX_0.npz", temps, np.zeros((512, 640, 3), dtype=np.uint8))
+
+    converter = create_converter("fixture", exif=True)
+    success, _ = convert_atomic(converter, str(tmp_path / "IRX_0.jpg"), str(tmp_path / "IRX_0.tif"))
+    assert success
+
+    data = (tmp_path / "IRX_0.tif").read_bytes()
+    ifd0, _ = read_ifd_entries(data, struct.unpack_from('<I', data, 4)[0])
+    assert ifd0[271] == (ASCII, b'Autel Robotics')
+    assert bytes(ifd0[XMP][1]) == xmp
+    exif_ifd, _ = read_ifd_entries(data, ifd0[EXIF_IFD][1][0])
+    assert exif_ifd[36867] == (ASCII, b'2024:05:01 10:20:30') and exif_ifd[33434] == (RATIONAL, ((1, 60),))
+    gps_ifd, _ = read_ifd_entries(data, ifd0[GPS_IFD][1][0])
+    assert gps_ifd[2] == (RATIONAL, ((33, 1), (51, 1), (3600, 100))) and gps_ifd[1] == (ASCII, b'S')
+    assert (read_tiff(tmp_path / "IRX_0.tif")[..., 3] == 12500).all()
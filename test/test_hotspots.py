@@ -0,0 +1,75 @@
+import csv
+
+import numpy as np
+
+from autel_thermal_converter.__main__ import main
+from autel_thermal_converter.backends import save_fixture
+from autel_thermal_converter.hotspots import HotspotOptions, detect_hotspots, label_components
+from autel_thermal_converter.tiff import read_tiff
+
+def _flood_fill(mask, connectivity):
+    steps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if connectivity == 8:
+        steps += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    labels, count = np.zeros(mask.shape, dtype=np.int32), 0
+    for y, x in zip(*np.nonzero(mask)):
+        if labels[y, x]:
+            continue
+        count += 1
+        labels[y, x] = count
+        todo = [(y, x)]
+        while todo:
+            cy, cx = todo.pop()
+            for dy, dx in steps:
+                ny, nx = cy + dy, cx + dx
+                if 0 <= ny < mask.shape[0] and 0 <= nx < mask.shape[1] and mask[ny, nx] and not labels[ny, nx]:
+                    labels[ny, nx] = count
+                    todo.append((ny, nx))
+    return labels, count
+
+def test_label_components_matches_flood_fill():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        mask = rng.random(tuple(rng.integers(1, 40, 2))) < rng.random()
+        for connectivity in (4, 8):
+            labels, count = label_components(mask, connectivity)
+            expected, expected_count = _flood_fill(mask, connectivity)
+            assert count == expected_count
+            np.testing.assert_array_equal(labels, expected)
+
+def test_detect_hotspots_threshold_and_background():
+    temps = np.full((512, 640), 25.0, dtype=np.float32)
+    temps[100:110, 200:215] = 70.0
+    temps[104, 207] = 80.0
+    temps[300, 300:302] = 90.0  # 2 pixels: below min_area
+    temps[400:403, 50:53] = 35.0  # warm only relative to the background
+    temps[0:5, 0:5] = np.nan
+
+    spots = detect_hotspots(temps, HotspotOptions(threshold=60.0, min_area=4))
+    assert len(spots) == 1
+    spot = spots[0]
+    assert (spot["x0"], spot["y0"], spot["x1"], spot["y1"], spot["area"]) == (200, 100, 214, 109, 150)
+    assert (spot["cx"], spot["cy"]) == (207.0, 104.5)
+    assert (spot["peak"], spot["peak_x"], spot["peak_y"]) == (80.0, 207, 104) and np.isnan(spot["background"])
+
+    spots = detect_hotspots(temps, HotspotOptions(delta=8.0, window=15, min_area=4))
+    assert sorted(spots["area"]) == [9, 150]
+    warm = spots[spots["area"] == 9][0]
+    assert warm["mean"] == 35.0 and abs(warm["background"] - (25 + 10 * 9 / 225)) < 1e-3
+
+def test_hotspots_command_writes_table_and_only_hot_tiffs(tmp_path):
+    flight, output = tmp_path / "flight", tmp_path / "out"
+    flight.mkdir()
+    for i in range(3):
+        temps = np.full((512, 640), 20.0, dtype=np.float32)
+        if i == 1:
+            temps[10:20, 30:40] = 95.0
+        save_fixture(flight / f"IRX_{i}.npz", temps, np.zeros((512, 640, 3), dtype=np.uint8))
+
+    assert main(["hotspots", str(flight), str(output), "--backend", "fixture", "--threshold", "60", "--tiffs",
+                 "-j", "2"]) == 0
+    with open(output / "hotspots.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["frame"], r["area"], r["peak"], r["background"]) for r in rows] == [("IRX_1.npz", "100", "95.0", "")]
+    assert [p.name for p in output.glob("*.tif")] == ["IRX_1.tif"]
+    assert (read_tiff(output / "IRX_1.tif")[15, 35, 3]) == 19500
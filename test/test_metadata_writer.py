@@ -0,0 +1,36 @@
+import json
+
+from autel_thermal_converter.metadata_writer import MetadataWriter, load_stats_index
+
+def _meta(value):
+    return {
+        "stats": {"min": value - 5, "max": value, "avg": value - 2.5,
+                  "min_point": {"x": 1, "y": 2}, "max_point": {"x": 3, "y": 4}},
+        "metadata": {"IR_Emissivity": 100},
+    }
+
+def test_streams_records_and_builds_stats_index(tmp_path):
+    with MetadataWriter(tmp_path) as writer:
+        writer.append("a.JPG", _meta(30.5))
+        writer.append("b.JPG", _meta(40.0))
+
+    index = load_stats_index(tmp_path)
+    assert index["name"].tolist() == ["a.JPG", "b.JPG"]
+    assert index["max"].tolist() == [30.5, 40.0]
+    assert index["max_y"].tolist() == [4, 4]
+
+def test_resumed_run_appends_and_last_record_wins(tmp_path):
+    with MetadataWriter(tmp_path) as writer:
+        writer.append("a.JPG", _meta(10.0))
+        writer.append("b.JPG", _meta(20.0))
+    # Simulate a crash that left a torn record behind
+    with open(writer.jsonl_path, "a") as f:
+        f.write('{"name": "c.JPG", "sta')
+
+    with MetadataWriter(tmp_path) as writer:
+        writer.append("a.JPG", _meta(15.0))
+    json_path = writer.compact()
+
+    expected = {"b.JPG": _meta(20.0), "a.JPG": _meta(15.0)}
+    assert json_path.read_text() == json.dumps(expected, indent=4)
+    assert load_stats_index(tmp_path)["name"].tolist() == ["b.JPG", "a.JPG"]
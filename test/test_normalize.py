@@ -0,0 +1,60 @@
+import functools
+
+import numpy as np
+
+from autel_thermal_converter import encoding
+from autel_thermal_converter.backends import create_converter, save_fixture
+from autel_thermal_converter.batch import convert_batch
+from autel_thermal_converter.normalize import (BandNormalizer, DatasetHistogram, build_histogram,
+                                               normalize_outputs)
+from autel_thermal_converter.tiff import read_tiff
+
+def test_histogram_from_conversion_matches_stored_bands(tmp_path):
+    pairs = []
+    for i in range(3):
+        temps = np.linspace(10.0 + i, 50.0 + i, 512 * 640, dtype=np.float32).reshape(512, 640)
+        temps[0, :10] = np.nan
+        save_fixture(tmp_path / f"IRX_{i}.npz", temps, np.zeros((512, 640, 3), dtype=np.uint8))
+        pairs.append((tmp_path / f"IRX_{i}.npz", tmp_path / f"IRX_{i}.tif"))
+
+    histogram = DatasetHistogram()
+    factory = functools.partial(create_converter, "fixture", histogram=True)
+    for result in convert_batch(pairs, jobs=2, converter_factory=factory):
+        histogram.add(result.histogram)
+    assert histogram.counts[0] == 30  # invalid pixels
+    assert histogram.valid_pixels == 3 * 512 * 640 - 30
+    rebuilt = build_histogram([o for _, o in pairs])
+    np.testing.assert_array_equal(rebuilt.counts, histogram.counts)
+
+    low, high = histogram.percentile_range(0, 100)
+    assert (low, high) == (11000, 15200)  # 10 and 52 °C
+
+    normalizer = BandNormalizer(low, high, bits=8)
+    results = list(normalize_outputs(tmp_path, normalizer))
+    assert [r.success for r in results] == [True] * 3
+    band = read_tiff(tmp_path / "normalized" / "IRX_2.tif")
+    assert band.dtype == np.uint8
+    assert band[0, 0] == 0 and band[0, 10] > 0 and band[-1, -1] == 255
+
+def test_percentile_range_and_lut():
+    histogram = DatasetHistogram()
+    histogram.add((12000, np.full(101, 10, dtype=np.uint32)))  # 20.00..21.00 °C
+    histogram.add(encoding.band_histogram(np.zeros(5, dtype=np.uint16)))
+    assert histogram.percentile_range(10, 90) == (12010, 12090)
+
+    lut = BandNormalizer(12010, 12090, bits=16).lut
+    assert lut[[0, 1, 12010, 12050, 12090, 65535]].tolist() == [0, 0, 0, 32768, 65535, 65535]
+
+def test_slow_lzw_reads_are_detected(tmp_path, monkeypatch):
+    from autel_thermal_converter import normalize
+    from autel_thermal_converter.tiff import TiffOptions, write_tiff
+
+    band = np.full((16, 16), 12000, dtype=np.uint16)
+    write_tiff(tmp_path / "IRX_0.tif", band, TiffOptions("lzw", predictor=True))
+    monkeypatch.setattr(normalize, "has_fast_lzw", lambda: False)
+    assert normalize.reads_lzw_slowly(tmp_path)
+    write_tiff(tmp_path / "IRX_0.tif", band)
+    assert not normalize.reads_lzw_slowly(tmp_path)
+    monkeypatch.setattr(normalize, "has_fast_lzw", lambda: True)
+    write_tiff(tmp_path / "IRX_0.tif", band, TiffOptions("lzw"))
+    assert not normalize.reads_lzw_slowly(tmp_path)
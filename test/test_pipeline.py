@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from autel_thermal_converter.backends import create_converter, save_fixture
+from autel_thermal_converter.pipeline import ConversionPipeline
+
+def test_pipeline_converts_in_order(tmp_path):
+    pairs = []
+    for i in range(6):
+        temps = np.full((512, 640), 30.0 + i, dtype=np.float32)
+        save_fixture(tmp_path / f"IRX_{i}.npz", temps, np.zeros((512, 640, 3), dtype=np.uint8))
+        pairs.append((tmp_path / f"IRX_{i}.npz", tmp_path / f"IRX_{i}.tif"))
+    pairs.insert(2, (tmp_path / "missing.npz", tmp_path / "missing.tif"))
+
+    pipeline = ConversionPipeline(create_converter("fixture"), queue_depth=1)
+    results = list(pipeline.run(pairs))
+    assert [r.input_path for r in results] == [str(p[0]) for p in pairs]
+    assert [r.success for r in results] == [True, True, False, True, True, True, True]
+    assert results[3].metadata["stats"]["max"] == 32.0
+    assert not (tmp_path / "missing.tif").exists()
+    assert pipeline.stats.stages["write"].items == 6
+    assert 0.0 < pipeline.stats.utilization("decode") <= 1.0
+    assert (tmp_path / "IRX_5.tif").stat().st_size > 512 * 640 * 8
+
+def test_pipeline_stops_when_consumer_stops(tmp_path):
+    for i in range(4):
+        save_fixture(tmp_path / f"IRX_{i}.npz", np.zeros((512, 640), dtype=np.float32),
+                     np.zeros((512, 640, 3), dtype=np.uint8))
+    pairs = [(tmp_path / f"IRX_{i}.npz", tmp_path / f"IRX_{i}.tif") for i in range(4)]
+    results = ConversionPipeline(create_converter("fixture"), queue_depth=1).run(pairs)
+    assert next(results).success
+    results.close()  # must not deadlock on the full queues
+
+def test_pipeline_reraises_when_the_input_fails(tmp_path):
+    save_fixture(tmp_path / "IRX_0.npz", np.zeros((512, 640), dtype=np.float32),
+                 np.zeros((512, 640, 3), dtype=np.uint8))
+
+    def pairs():
+        yield tmp_path / "IRX_0.npz", tmp_path / "IRX_0.tif"
+        raise OSError("listing failed")
+
+    results = ConversionPipeline(create_converter("fixture"), queue_depth=1).run(pairs())
+    assert next(results).success
+    with pytest.raises(OSError, match="listing failed"):
+        next(results)  # instead of waiting forever for the end of the input
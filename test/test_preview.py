@@ -0,0 +1,59 @@
+import functools
+import struct
+import zlib
+
+import numpy as np
+
+from autel_thermal_converter.__main__ import COLORMAP_NAMES
+from autel_thermal_converter.backends import create_converter, save_fixture
+from autel_thermal_converter.batch import convert_batch
+from autel_thermal_converter.preview import COLORMAPS, PreviewOptions, downsample_thermal, encode_png
+from autel_thermal_converter.tiff import TiffOptions, read_tiff
+
+def _decode_png(data: bytes) -> tuple:
+    # Minimal reader for the unfiltered 8-bit PNGs written by encode_png
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    pos, idat = 8, b''
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos + 4])
+        kind, payload = data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]
+        assert struct.unpack('>I', data[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + payload)
+        if kind == b'IHDR':
+            width, height, _, color_type = struct.unpack('>IIBB', payload[:10])
+        elif kind == b'IDAT':
+            idat += payload
+        pos += 12 + length
+    channels = 3 if color_type == 2 else 1
+    rows = np.frombuffer(zlib.decompress(idat), dtype=np.uint8).reshape(height, 1 + width * channels)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape((height, width, channels) if channels == 3 else (height, width))
+
+def test_encode_png_roundtrip():
+    image = np.random.default_rng(0).integers(0, 256, (7, 5, 3), dtype=np.uint8)
+    np.testing.assert_array_equal(_decode_png(encode_png(image)), image)
+    np.testing.assert_array_equal(_decode_png(encode_png(image[..., 0])), image[..., 0])
+
+def test_downsample_thermal_ignores_invalid_pixels():
+    band = np.array([[0, 0, 12000, 12002],
+                     [0, 0, 0, 12004],
+                     [5, 7, 9, 11],
+                     [0, 1, 3, 5]], dtype=np.uint16)
+    np.testing.assert_array_equal(downsample_thermal(band, 2), [[0, 12002], [4, 7]])
+
+def test_overviews_and_thumbnails_from_conversion(tmp_path):
+    assert set(COLORMAP_NAMES) == set(COLORMAPS)
+    temps = np.linspace(10.0, 50.0, 512 * 640, dtype=np.float32).reshape(512, 640)
+    rgb = np.full((512, 640, 3), 200, dtype=np.uint8)
+    save_fixture(tmp_path / "IRX_0.npz", temps, rgb)
+    factory = functools.partial(create_converter, "fixture", tiff_options=TiffOptions("deflate", overviews=(2, 4)),
+                                previews=PreviewOptions(size=160))
+    results = list(convert_batch([(tmp_path / "IRX_0.npz", tmp_path / "IRX_0.tif")], converter_factory=factory))
+    assert results[0].success
+
+    full, half, quarter = (read_tiff(tmp_path / "IRX_0.tif", page=p) for p in range(3))
+    assert full.shape == (512, 640, 4) and half.shape == (256, 320, 4) and quarter.shape == (128, 160, 4)
+    assert abs(int(quarter[0, 0, 3]) - int(full[:4, :4, 3].mean())) <= 1
+
+    thermal = _decode_png((tmp_path / "thumbnails" / "IRX_0_thermal.png").read_bytes())
+    assert thermal.shape == (128, 160, 3)
+    assert (_decode_png((tmp_path / "thumbnails" / "IRX_0_rgb.png").read_bytes()) == 200).all()
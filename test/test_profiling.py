@@ -0,0 +1,36 @@
+import numpy as np
+
+from autel_thermal_converter.backends import create_converter, save_fixture
+from autel_thermal_converter.batch import convert_batch
+from autel_thermal_converter.profiling import Profiler
+
+def test_timing_hook_and_batch_timings(tmp_path):
+    for i in range(3):
+        save_fixture(tmp_path / f"IRX_{i}.npz", np.full((512, 640), 25.0, dtype=np.float32),
+                     np.zeros((512, 640, 3), dtype=np.uint8))
+
+    converter = create_converter("fixture")
+    seen = []
+    converter.add_timing_hook(lambda i, o, t: seen.append((i, t)))
+    assert converter.convert_with_metadata(str(tmp_path / "IRX_0.npz"), str(tmp_path / "IRX_0.tif"))[0]
+    assert seen[0][1] is converter.last_timings
+    assert set(seen[0][1]["stages"]) == {"decode", "encode", "write"}
+    assert seen[0][1]["output_bytes"] == (tmp_path / "IRX_0.tif").stat().st_size
+
+    pairs = [(tmp_path / f"IRX_{i}.npz", tmp_path / f"IRX_{i}.tif") for i in range(3)]
+    pairs.append((tmp_path / "missing.npz", tmp_path / "missing.tif"))
+    profiler = Profiler()
+    for result in convert_batch(pairs, converter_factory=lambda: create_converter("fixture")):
+        assert (result.timings is not None) == result.success
+        profiler.add(result.timings)
+    profiler.stop()
+
+    summary = profiler.summary()
+    assert summary["images"] == 3
+    assert summary["stages"]["write"]["count"] == 3
+    assert summary["stages"]["decode"]["p50"] <= summary["stages"]["decode"]["max"]
+
+    profiler.write_metrics(tmp_path / "convert.prom")
+    text = (tmp_path / "convert.prom").read_text()
+    assert 'autel_convert_stage_seconds_count{stage="encode"} 3' in text
+    assert "autel_convert_images_total 3" in text
@@ -0,0 +1,52 @@
+import functools
+
+import numpy as np
+import pytest
+
+from autel_thermal_converter.backends import create_converter, save_fixture
+from autel_thermal_converter.query import Point, Polygon, Rect, RegionMasks, query_images, query_stack
+from autel_thermal_converter.stack import StackWriter
+
+REGIONS = [Point(5, 7, "p"), Rect(10, 20, 19, 24, "r"), Polygon([(100, 100), (120, 100), (100, 120)], "tri")]
+
+def _fixtures(tmp_path, count=3):
+    files = []
+    for i in range(count):
+        temps = np.random.default_rng(i).uniform(10, 60, (512, 640)).astype(np.float32)
+        temps[20, 10] = np.nan  # inside the rectangle; must be ignored
+        save_fixture(tmp_path / f"IRX_{i}.npz", temps, np.zeros((512, 640, 3), dtype=np.uint8))
+        files.append(tmp_path / f"IRX_{i}.npz")
+    return files
+
+def test_masks_match_brute_force():
+    masks = RegionMasks(REGIONS)
+    assert masks.pixels.tolist() == [1, 50, 210]
+    ys, xs = np.divmod(masks.index[masks.starts[2]:], 640)
+    assert np.all(xs + ys < 220) and xs.min() == 100 and ys.min() == 100
+
+    temps = np.random.default_rng(0).uniform(0, 100, (512, 640)).astype(np.float32)
+    stats = masks.query(temps)
+    assert stats[0].tolist()[:4] == [temps[7, 5]] * 4
+    rect = temps[20:25, 10:20]
+    np.testing.assert_allclose(stats[1, 1:4], [rect.min(), rect.max(), rect.mean()], rtol=1e-6)
+
+def test_rect_is_clipped_to_the_image():
+    ys, xs = np.divmod(Rect(700, 5, 600, 3).mask(512, 640), 640)  # corners given in any order
+    assert (xs.min(), xs.max(), ys.min(), ys.max(), len(xs)) == (600, 639, 3, 5, 120)
+    for outside in (Rect(700, 0, 800, 0), Rect(-50, -10, -5, -1), Rect(0, 600, 10, 520)):
+        with pytest.raises(ValueError):
+            outside.mask(512, 640)
+
+def test_images_and_stack_give_the_same_answers(tmp_path):
+    files = _fixtures(tmp_path) + [tmp_path / "missing.npz"]
+    factory = functools.partial(create_converter, "fixture")
+    result = query_images(files, REGIONS, jobs=2, converter_factory=factory)
+    assert result.valid.tolist() == [True, True, True, False]
+    assert result.pixels[0].tolist() == [1, 49, 210]  # the NaN pixel is left out
+    assert not np.isnan(result.stats[:3]).any()
+
+    with StackWriter(tmp_path / "stack", files, include_rgb=False) as writer:
+        list(writer.write_frames(converter_factory=factory))
+    stacked = query_stack(tmp_path / "stack", REGIONS)
+    np.testing.assert_allclose(stacked.stats[:3], result.stats[:3], atol=0.006)  # 0.01 °C encoding steps
+    assert [row["frame"] for row in stacked.rows()][::3] == ["IRX_0.npz", "IRX_1.npz", "IRX_2.npz"]
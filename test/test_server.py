@@ -0,0 +1,48 @@
+import functools
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from autel_thermal_converter.__main__ import BACKEND_NAMES
+from autel_thermal_converter.backends import BACKENDS, create_converter, save_fixture
+from autel_thermal_converter.server import ConversionClient, ConversionServer
+
+def test_server_stream_and_blocking(tmp_path):
+    for i in range(3):
+        save_fixture(tmp_path / f"IRX_{i}.npz", np.full((512, 640), 20.0 + i, dtype=np.float32),
+                     np.zeros((512, 640, 3), dtype=np.uint8))
+    pairs = [(tmp_path / f"IRX_{i}.npz", tmp_path / f"IRX_{i}.tif") for i in range(3)]
+    pairs.append((tmp_path / "missing.npz", tmp_path / "missing.tif"))
+
+    server = ConversionServer("127.0.0.1:0", jobs=2, converter_factory=functools.partial(create_converter, "fixture"),
+                              backend="fixture")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        client = ConversionClient(f"{host}:{port}", timeout=30)
+        assert client.ping()["jobs"] == 2
+
+        streamed = list(client.convert_stream(pairs))
+        assert [r.success for r in streamed] == [True, True, True, False]
+        assert streamed[2].metadata["stats"]["max"] == 22.0
+        assert (tmp_path / "IRX_1.tif").exists()
+
+        blocking = client.convert(pairs[:2])
+        assert [r.input_path for r in blocking] == [str(p[0]) for p in pairs[:2]]
+        assert client.ping()["served"] == 6
+        client.shutdown()
+    finally:
+        thread.join(timeout=10)
+    assert not thread.is_alive()
+
+def test_cli_backend_names_and_lazy_import():
+    assert set(BACKEND_NAMES) == set(BACKENDS)
+    code = ("import sys, autel_thermal_converter.__main__, autel_thermal_converter.server; "
+            "print('numpy' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=Path(__file__).resolve().parents[1])
+    assert out.stdout.strip() == "False"
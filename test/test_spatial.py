@@ -0,0 +1,78 @@
+import io
+import struct
+
+import numpy as np
+
+from autel_thermal_converter.__main__ import main
+from autel_thermal_converter.backends import save_fixture
+from autel_thermal_converter.spatial import SpatialIndex, read_position
+from autel_thermal_converter.tiff import ASCII, BYTE, GPS_IFD, LONG, RATIONAL, _write_ifd
+
+def _dms(value: float) -> list:
+    value = abs(value)
+    degrees, minutes = int(value), int(value % 1 * 60)
+    return [(degrees, 1), (minutes, 1), (round((value * 3600) % 60 * 10000), 10000)]
+
+def _drone_jpeg(path, latitude, longitude, height=None, yaw=0.0):
+    buf = io.BytesIO()
+    buf.write(b'II*\0\0\0\0\0')
+    gps_offset, _ = _write_ifd(buf, [(0, BYTE, [2, 3, 0, 0]), (1, ASCII, "S" if latitude < 0 else "N"),
+                                     (2, RATIONAL, _dms(latitude)), (3, ASCII, "W" if longitude < 0 else "E"),
+                                     (4, RATIONAL, _dms(longitude)), (6, RATIONAL, [(15000, 100)])])
+    ifd0, _ = _write_ifd(buf, [(271, ASCII, "Autel Robotics"), (GPS_IFD, LONG, gps_offset)])
+    buf.seek(4)
+    buf.write(struct.pack('<I', ifd0))
+    xmp = b''
+    if height is not None:
+        xmp = (f'<rdf:Description drone:RelativeAltitude="+{height:.2f}" drone:GimbalYawDegree="{yaw:.1f}"/>').encode()
+
+    def segment(payload):
+        return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xd8' + segment(b'Exif\0\0' + buf.getvalue())
+                + segment(b'http://ns.adobe.com/xap/1.0/\0' + xmp) + b'\xff\xda\0\x02\xff\xd9')
+
+def test_index_lookups_match_a_linear_scan():
+    rng = np.random.default_rng(1)
+    entries = [(f"f{i}.jpg", {"latitude": -33.86 + rng.random() * 0.01, "longitude": 151.2 + rng.random() * 0.01,
+                              "relative_altitude": 60.0 if i % 3 else None, "yaw": rng.random() * 360})
+               for i in range(2000)]
+    entries.append(("no_gps.jpg", None))
+    index = SpatialIndex.build(entries, root="/flight")
+    assert len(index) == 2000
+    f = index.frames
+
+    south, west, north, east = -33.857, 151.203, -33.855, 151.206
+    expected = np.flatnonzero((f["south"] <= north) & (f["north"] >= south) & (f["west"] <= east) & (f["east"] >= west))
+    np.testing.assert_array_equal(index.within(south, west, north, east), expected)
+
+    near = index.near(-33.855, 151.205, 40)
+    distances = index.distances(-33.855, 151.205)
+    assert set(near) == set(np.flatnonzero(distances <= 40)) and np.all(np.diff(distances[near]) >= 0)
+    assert str(index.paths(near[:1])[0]).startswith("/flight/")
+
+def test_spatial_index_from_conversion_feeds_query(tmp_path, capsys):
+    flight, output = tmp_path / "flight", tmp_path / "out"
+    flight.mkdir()
+    temps = np.full((512, 640), 20.0, dtype=np.float32)
+    for i, latitude in enumerate((-33.8600, -33.8595, -33.8500)):
+        _drone_jpeg(flight / f"IRX_{i}.jpg", latitude, 151.2100, height=150.0, yaw=90.0)
+        save_fixture(flight / f"IRX_{i}.npz", temps + i, np.zeros((512, 640, 3), dtype=np.uint8))
+    position = read_position(flight / "IRX_0.jpg")
+    assert abs(position["latitude"] + 33.86) < 1e-6
+    assert position["relative_altitude"] == 150.0 and position["yaw"] == 90.0
+
+    main([str(flight), str(output), "--backend", "fixture", "--include", "*.jpg", "--spatial-index"])
+    index = SpatialIndex.load(output)
+    assert sorted(index.frames["name"]) == ["IRX_0.jpg", "IRX_1.jpg", "IRX_2.jpg"]
+
+    capsys.readouterr()
+    hits = tmp_path / "hits.txt"
+    assert main(["locate", str(output), "--point=-33.8598,151.2100", "-o", str(hits)]) == 0
+    assert sorted(hits.read_text().split()) == [str((flight / f"IRX_{i}.jpg").resolve()) for i in (0, 1)]
+
+    capsys.readouterr()
+    main(["query", str(flight), "--backend", "fixture", "--paths-from", str(hits), "--point", "0,0"])
+    rows = capsys.readouterr().out.strip().splitlines()[1:]
+    assert [row.split(",")[4] for row in rows] == ["20.0", "21.0"]
@@ -0,0 +1,52 @@
+import functools
+
+import numpy as np
+
+from autel_thermal_converter import encoding, stack
+from autel_thermal_converter.backends import create_converter, save_fixture
+from autel_thermal_converter.stack import StackReader, StackWriter
+
+def test_stack_roundtrip_with_workers(tmp_path):
+    files = []
+    for i in range(5):
+        temps = np.full((512, 640), 20.0 + i, dtype=np.float32)
+        rgb = np.full((512, 640, 3), i, dtype=np.uint8)
+        save_fixture(tmp_path / f"IRX_{i}.npz", temps, rgb)
+        files.append(tmp_path / f"IRX_{i}.npz")
+    files.append(tmp_path / "missing.npz")
+
+    factory = functools.partial(create_converter, "fixture")
+    with StackWriter(tmp_path / "stack", files, include_rgb=True) as writer:
+        results = list(writer.write_frames(jobs=2, converter_factory=factory))
+    assert [r.success for r in results] == [True] * 5 + [False]
+
+    reader = StackReader(tmp_path / "stack")
+    assert len(reader) == 6
+    assert isinstance(reader[1:3], np.memmap)
+    assert reader[3][0, 0] == encoding.encode_temperature(np.float32(23.0))
+    assert reader.temperature(reader.frame_of("IRX_2.npz"))[5, 5] == 22.0
+    assert reader.rgb_frame(4)[0, 0].tolist() == [4, 4, 4]
+    assert reader.index["valid"].tolist() == [True] * 5 + [False]
+    assert reader.index["max"][1] == 21.0
+
+def test_recursive_stack_names_frames_by_relative_path(tmp_path):
+    from autel_thermal_converter.__main__ import main
+
+    for folder, value in (("a", 20.0), ("b", 30.0)):
+        (tmp_path / "flight" / folder).mkdir(parents=True)
+        save_fixture(tmp_path / "flight" / folder / "IRX_0.npz", np.full((512, 640), value, dtype=np.float32),
+                     np.zeros((512, 640, 3), dtype=np.uint8))
+    main([str(tmp_path / "flight"), str(tmp_path / "out"), "--backend", "fixture", "--stack", "-r"])
+    reader = StackReader(tmp_path / "out" / "stack")
+    assert sorted(reader.names.tolist()) == ["a/IRX_0.npz", "b/IRX_0.npz"]
+    assert reader.temperature(reader.frame_of("b/IRX_0.npz"))[0, 0] == 30.0
+
+def test_in_process_writer_releases_its_maps(tmp_path):
+    factory = functools.partial(create_converter, "fixture")
+    for value in (20.0, 25.0):  # the second run rewrites the stack at the same paths
+        save_fixture(tmp_path / "IRX_0.npz", np.full((512, 640), value, dtype=np.float32),
+                     np.zeros((512, 640, 3), np.uint8))
+        with StackWriter(tmp_path / "stack", [tmp_path / "IRX_0.npz"]) as writer:
+            assert [r.success for r in writer.write_frames(jobs=1, converter_factory=factory)] == [True]
+        assert stack._open_maps == {}
+        assert StackReader(tmp_path / "stack").temperature(0)[0, 0] == value
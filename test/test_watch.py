@@ -0,0 +1,72 @@
+import functools
+import json
+import os
+
+import numpy as np
+
+from autel_thermal_converter.__main__ import main
+from autel_thermal_converter.backends import create_converter, save_fixture
+from autel_thermal_converter.manifest import Manifest
+from autel_thermal_converter.metadata_writer import MetadataWriter
+from autel_thermal_converter.watch import ArrivalScanner, FolderIngest
+
+def _fixture(path, value):
+    save_fixture(path, np.full((512, 640), value, dtype=np.float32), np.zeros((512, 640, 3), dtype=np.uint8))
+
+def test_scanner_waits_for_files_to_stop_changing(tmp_path):
+    scanner = ArrivalScanner(tmp_path, settle=0, include=("*.jpg",))
+    (tmp_path / "a.jpg").write_bytes(b"part")
+    (tmp_path / "empty.jpg").write_bytes(b"")
+    assert scanner.scan() == []  # first sighting
+
+    with open(tmp_path / "a.jpg", "ab") as f:
+        f.write(b"ial")  # still copying
+    assert scanner.scan() == []
+    ready = scanner.scan()
+    assert [relative for _, relative, _ in ready] == ["a.jpg"]
+    assert scanner.scan() == [] and list(scanner.pending) == ["empty.jpg"]
+
+    os.remove(tmp_path / "empty.jpg")
+    scanner.scan()
+    assert not scanner.pending
+
+def test_ingest_converts_arrivals_and_resumes(tmp_path):
+    landing, output = tmp_path / "landing", tmp_path / "out"
+    (landing / "card1").mkdir(parents=True)
+    output.mkdir()
+    _fixture(landing / "card1" / "IRX_0.npz", 20.0)
+    factory = functools.partial(create_converter, "fixture")
+
+    def ingest_once(names):
+        scanner = ArrivalScanner(landing, settle=0, recursive=True, include=("*.npz",))
+        with Manifest(output) as manifest, MetadataWriter(output, tag="watch") as writer:
+            with FolderIngest(landing, output, factory, scanner=scanner, manifest=manifest, writer=writer) as ingest:
+                finished = ingest.poll() + ingest.poll()
+                for name, value in names:
+                    _fixture(landing / name, value)
+                finished += ingest.poll() + ingest.poll()
+        return ingest.stats, [relative for relative, result in finished if result.success]
+
+    stats, converted = ingest_once([("IRX_1.npz", 25.0)])
+    assert converted == ["card1/IRX_0.npz", "IRX_1.npz"]
+    assert (output / "card1" / "IRX_0.tif").exists() and stats.converted == 2 and stats.queued == 0
+    assert len(stats.latencies) == 2 and stats.latency()["max"] >= 0
+
+    # A restarted watcher skips what the manifest already has
+    stats, converted = ingest_once([("IRX_2.npz", 30.0)])
+    assert converted == ["IRX_2.npz"] and stats.skipped == 2
+    records = [json.loads(line) for line in (output / "dataset_metadata.watch.jsonl").read_text().splitlines()]
+    assert [r["name"] for r in records] == ["card1/IRX_0.npz", "IRX_1.npz", "IRX_2.npz"]
+    assert 'autel_convert_watch_queue_depth 0' in stats.metrics_text()
+
+def test_watch_command_with_workers(tmp_path, capsys):
+    landing, output = tmp_path / "landing", tmp_path / "out"
+    landing.mkdir()
+    for i in range(4):
+        _fixture(landing / f"IRX_{i}.npz", 20.0 + i)
+    metrics = tmp_path / "watch.prom"
+    assert main(["watch", str(landing), str(output), "--backend", "fixture", "-j", "2", "--settle", "0",
+                 "--interval", "0.05", "--idle-exit", "0.3", "--metrics-file", str(metrics)]) == 0
+    assert sorted(p.name for p in output.glob("*.tif")) == [f"IRX_{i}.tif" for i in range(4)]
+    assert "autel_convert_watch_converted_total 4" in metrics.read_text()
+    assert len((output / "dataset_metadata.jsonl").read_text().splitlines()) == 4